@@ -1 +1,8 @@
-from ghettoblaster.main import main
+def __getattr__(name):
+    # the ui pulls in Qt and maya, only import it when the tool is opened
+    if name == "main":
+        from ghettoblaster.main import main
+
+        globals()["main"] = main
+        return main
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,98 @@
+"""Burn-in cost per frame: glyph atlas blits against cv2.putText.
+
+Usage:
+    python benchmarks/bench_burnin.py [--resolution HD_2160] [--frames 240]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+
+import fake_maya
+import numpy as np
+from harness import (
+    baseline_path,
+    bootstrap_package,
+    compare,
+    load_baseline,
+    print_table,
+    save_baseline,
+)
+
+METRICS = {"atlas_ms": False, "puttext_ms": False}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resolution", default="HD_2160")
+    parser.add_argument("--frames", type=int, default=240)
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    fake_maya.install(fake_maya.FakeScene())
+    bootstrap_package()
+
+    from ghettoblaster.controller.burnin import BURN_INS, BurnIn, draw_text, timecode
+    from ghettoblaster.controller.playblast import RESOLUTIONS
+
+    res = next(r for r in RESOLUTIONS if r.name == args.resolution)
+    width, height = res.res
+    values = {
+        "scene": "sh010_anim",
+        "layer": "defaultRenderLayer",
+        "camera": "shotCam",
+        "user": "artist",
+        "date": "2024-01-01",
+    }
+    frame = np.full((height, width, 3), 90, np.uint8)
+
+    start = time.perf_counter()
+    burn_in = BurnIn(BURN_INS, width, height, 24, values)
+    setup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(args.frames):
+        burn_in.apply(frame, 1001 + i)
+    atlas = time.perf_counter() - start
+
+    # the same layout drawn with cv2.putText on every frame
+    band = burn_in.band
+    start = time.perf_counter()
+    for i in range(args.frames):
+        frame[:band] = 0
+        frame[height - band :] = 0
+        draw_text(frame[:band], "sh010_anim | defaultRenderLayer", band // 2)
+        draw_text(frame[:band], "shotCam", band // 2, align_right=True)
+        bottom = frame[height - band :]
+        draw_text(bottom, "artist  2024-01-01", band // 2)
+        draw_text(bottom, f"{timecode(1001 + i, 24)}  {1001 + i:04d}", band // 2, True)
+    puttext = time.perf_counter() - start
+
+    results = {
+        args.resolution: {
+            "resolution": args.resolution,
+            "frames": args.frames,
+            "setup_ms": setup * 1000,
+            "atlas_ms": atlas / args.frames * 1000,
+            "puttext_ms": puttext / args.frames * 1000,
+        }
+    }
+    print_table(list(results.values()), list(results[args.resolution]))
+
+    path = baseline_path("burnin")
+    if args.save_baseline:
+        save_baseline(path, results)
+        print(f"\nBaseline saved to {path}")
+        return 0
+
+    regressions = compare(results, load_baseline(path), METRICS, args.tolerance)
+    for r in regressions:
+        print(f"REGRESSION {r}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""Capture + encode time per intermediate frame format.
+
+Usage:
+    python benchmarks/bench_formats.py [--frames 24] [--resolutions HD_1080]
+"""
+
+from __future__ import annotations
+
+import argparse
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import fake_maya
+from harness import (
+    PhaseTimer,
+    baseline_path,
+    bootstrap_package,
+    compare,
+    load_baseline,
+    print_table,
+    save_baseline,
+)
+
+RESOLUTIONS = ("HD_540", "HD_720", "HD_1080", "HD_2160")
+METRICS = {"total_s": False}
+COLUMNS = ["case", "capture_s", "encode_s", "total_s", "mb_per_frame", "fastest"]
+
+
+def run_case(resolution: str, image_format: str, frames: int, quality: int) -> dict:
+    from ghettoblaster.controller.playblast import Playblast, PlayblastRenderer
+
+    tmp = Path(tempfile.mkdtemp(prefix="gb_formats_"))
+    try:
+        pb = Playblast(0)
+        pb.width, pb.height = pb.get_resolution_by_name(resolution).res
+        pb.start_frame, pb.end_frame = 1, frames
+        pb.filename = str(tmp / "sh010_persp")
+        pb.image_format = image_format
+        pb.image_quality = quality
+
+        renderer = PlayblastRenderer([pb], lambda _: None)
+        timer = PhaseTimer()
+        with timer.phase("capture"):
+            renderer.maya_render(pb)
+        size = sum(f.stat().st_size for f in tmp.glob(f"*.{image_format}"))
+        with timer.phase("encode"):
+            renderer.video_render(pb)
+
+        return {
+            "case": f"{resolution}/{image_format}",
+            "capture_s": timer.phases["capture"],
+            "encode_s": timer.phases["encode"],
+            "total_s": timer.phases["capture"] + timer.phases["encode"],
+            "mb_per_frame": size / frames / (1024 * 1024),
+        }
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resolutions", nargs="+", default=list(RESOLUTIONS))
+    parser.add_argument("--frames", type=int, default=24)
+    parser.add_argument("--quality", type=int, default=100)
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    fake_maya.install(fake_maya.FakeScene(end_frame=args.frames))
+    bootstrap_package()
+
+    from ghettoblaster.controller.frame_io import FRAME_FORMATS
+
+    results = {}
+    for resolution in args.resolutions:
+        cases = [
+            run_case(resolution, fmt, args.frames, args.quality)
+            for fmt in FRAME_FORMATS
+        ]
+        best = min(cases, key=lambda c: c["total_s"])
+        for case in cases:
+            case["fastest"] = "*" if case is best else ""
+            results[case["case"]] = case
+
+    print_table(list(results.values()), COLUMNS)
+
+    path = baseline_path("formats")
+    if args.save_baseline:
+        save_baseline(path, results)
+        print(f"\nBaseline saved to {path}")
+        return 0
+
+    regressions = compare(results, load_baseline(path), METRICS, args.tolerance)
+    for r in regressions:
+        print(f"REGRESSION {r}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
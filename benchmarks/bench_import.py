@@ -0,0 +1,141 @@
+"""Startup import time of the package, measured with python -X importtime.
+
+Usage:
+    python benchmarks/bench_import.py [--repeat 7]
+    python benchmarks/bench_import.py --save-baseline
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from harness import (
+    ROOT_PATH,
+    baseline_path,
+    compare,
+    load_baseline,
+    print_table,
+    save_baseline,
+)
+
+TARGETS = (
+    "ghettoblaster",
+    "ghettoblaster.controller.playblast",
+    "ghettoblaster.ui.settings_widget",
+    "ghettoblaster.ui.main_window",
+)
+# loaded lazily, showing up in the import log means something imports them eagerly
+HEAVY = ("cv2", "numpy", "ghettoblaster.resources.resources")
+METRICS = {"import_ms": False}
+COLUMNS = ["target", "import_ms", "modules", "eager_heavy"]
+MARKER = "--- ghettoblaster import ---"
+
+# maya.cmds only has to exist for the controller to import, ui targets need a
+# real maya (mayapy) and Qt and are skipped without them
+PRELUDE = f"""
+import importlib.util, sys, types
+if importlib.util.find_spec("maya") is None:
+    maya = types.ModuleType("maya")
+    maya.__path__ = []
+    maya.cmds = types.ModuleType("maya.cmds")
+    sys.modules["maya"] = maya
+    sys.modules["maya.cmds"] = maya.cmds
+sys.stderr.write({MARKER!r} + "\\n")
+sys.stderr.flush()
+# __import__ goes through the import statement path that -X importtime logs
+__import__(sys.argv[1])
+"""
+
+
+def package_path() -> tuple[str, tempfile.TemporaryDirectory | None]:
+    # the checkout has to be importable as "ghettoblaster"
+    if ROOT_PATH.name == "ghettoblaster":
+        return str(ROOT_PATH.parent), None
+
+    tmp = tempfile.TemporaryDirectory(prefix="gb_import_")
+    os.symlink(ROOT_PATH, Path(tmp.name) / "ghettoblaster", target_is_directory=True)
+    return tmp.name, tmp
+
+
+def measure(target: str, python_path: str) -> tuple[float, list[str]] | None:
+    env = dict(os.environ, PYTHONPATH=python_path)
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PRELUDE, target],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if out.returncode:
+        return None
+
+    lines = out.stderr.split(MARKER, 1)[-1].splitlines()
+    total_us, modules = 0, []
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue
+
+        modules.append(name.strip())
+        # top level entries are indented by one space, nested ones by more
+        if not name.startswith("  "):
+            total_us += int(cumulative)
+
+    return total_us / 1000, modules
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--targets", nargs="+", default=list(TARGETS))
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    python_path, tmp = package_path()
+    results, eager = {}, []
+    try:
+        for target in args.targets:
+            # the first run warms the bytecode cache, the median hides noise
+            runs = [measure(target, python_path) for _ in range(args.repeat + 1)][1:]
+            if not all(runs):
+                print(f"skipping {target}, it does not import in this interpreter")
+                continue
+
+            heavy = sorted({m for _, mods in runs for m in mods if m in HEAVY})
+            eager += [f"{target} imports {m} eagerly" for m in heavy]
+            results[target] = {
+                "target": target,
+                "import_ms": statistics.median(ms for ms, _ in runs),
+                "modules": len(runs[0][1]),
+                "eager_heavy": ", ".join(heavy) or None,
+            }
+    finally:
+        if tmp:
+            tmp.cleanup()
+
+    print_table(list(results.values()), COLUMNS)
+
+    path = baseline_path("import")
+    if args.save_baseline:
+        save_baseline(path, results)
+        print(f"\nBaseline saved to {path}")
+        return 0
+
+    regressions = compare(results, load_baseline(path), METRICS, args.tolerance)
+    for r in eager + regressions:
+        print(f"REGRESSION {r}")
+
+    return 1 if eager or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
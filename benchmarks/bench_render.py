@@ -0,0 +1,162 @@
+"""End-to-end playblast benchmark against a stand-in maya module.
+
+Usage:
+    python benchmarks/bench_render.py [--frames 48] [--latency 0.005]
+    python benchmarks/bench_render.py --save-baseline
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from harness import (
+    PhaseTimer,
+    baseline_path,
+    bootstrap_package,
+    compare,
+    load_baseline,
+    peak_rss_mb,
+    print_table,
+    save_baseline,
+)
+
+RESOLUTIONS = ("HD_540", "HD_720", "HD_1080", "HD_2160")
+METRICS = {
+    "capture_fps": True,
+    "encode_fps": True,
+    "batch_fps": True,
+    "peak_rss_mb": False,
+}
+COLUMNS = [
+    "resolution",
+    "frames",
+    "capture_s",
+    "encode_s",
+    "batch_s",
+    "capture_fps",
+    "encode_fps",
+    "batch_fps",
+    "peak_rss_mb",
+]
+
+
+def run_case(resolution: str, frames: int, latency: float, layers: int) -> dict:
+    import fake_maya
+
+    fake_maya.install(
+        fake_maya.FakeScene(start_frame=1, end_frame=frames, capture_latency=latency)
+    )
+    bootstrap_package()
+
+    from ghettoblaster.controller.playblast import Playblast, PlayblastRenderer
+
+    tmp = Path(tempfile.mkdtemp(prefix="gb_bench_"))
+    try:
+        pb = Playblast(0)
+        res = pb.get_resolution_by_name(resolution)
+        pb.width, pb.height = res.res
+        pb.resolution = resolution
+        pb.frame_range_name = "Custom"
+        pb.start_frame, pb.end_frame = 1, frames
+        pb.output_field = str(tmp)
+        pb.filename = str(tmp / "single" / "sh010_persp")
+
+        renderer = PlayblastRenderer([pb], lambda _: None)
+        timer = PhaseTimer()
+        with timer.phase("capture"):
+            renderer.maya_render(pb)
+        with timer.phase("encode"):
+            renderer.video_render(pb)
+
+        batch = []
+        for i in range(layers):
+            layer = pb.replace(id=i + 1, name=f"Layer {i + 1}", delete_images=True)
+            layer.filename = str(tmp / f"layer{i + 1}" / "sh010_persp")
+            batch.append(layer)
+
+        with timer.phase("batch"):
+            PlayblastRenderer(batch, lambda _: None).batch_maya_render()
+
+        capture, encode, total = (
+            timer.phases[k] for k in ("capture", "encode", "batch")
+        )
+        return {
+            "resolution": resolution,
+            "frames": frames,
+            "capture_s": capture,
+            "encode_s": encode,
+            "batch_s": total,
+            "capture_fps": frames / capture,
+            "encode_fps": frames / encode,
+            "batch_fps": frames * layers / total,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resolutions", nargs="+", default=list(RESOLUTIONS))
+    parser.add_argument("--frames", type=int, default=48)
+    parser.add_argument("--layers", type=int, default=2)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="simulated capture seconds/frame"
+    )
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_case(args.worker, args.frames, args.latency, args.layers)
+        print(json.dumps(result))
+        return 0
+
+    # every resolution runs in its own process so peak RSS is not cumulative
+    results = {}
+    for resolution in args.resolutions:
+        out = subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                "--worker",
+                resolution,
+                "--frames",
+                str(args.frames),
+                "--layers",
+                str(args.layers),
+                "--latency",
+                str(args.latency),
+            ],
+            capture_output=True,
+            text=True,
+        )
+        if out.returncode:
+            sys.stderr.write(out.stderr)
+            return out.returncode
+        results[resolution] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    print_table(list(results.values()), COLUMNS)
+
+    path = baseline_path("render")
+    if args.save_baseline:
+        save_baseline(path, results)
+        print(f"\nBaseline saved to {path}")
+        return 0
+
+    regressions = compare(results, load_baseline(path), METRICS, args.tolerance)
+    for r in regressions:
+        print(f"REGRESSION {r}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
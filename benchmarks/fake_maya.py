@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import sys
+import time
+import types
+from pathlib import Path
+from typing import Any
+
+import cv2
+import numpy as np
+
+
+class FakeScene:
+    def __init__(
+        self,
+        scene_path: str = "/projects/bench/scenes/sh010_anim.ma",
+        start_frame: int = 1,
+        end_frame: int = 48,
+        time_unit: str = "film",
+        capture_latency: float = 0.0,
+    ) -> None:
+        self.scene_path = scene_path
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.time_unit = time_unit
+        self.capture_latency = capture_latency
+        self.cameras = ["persp", "top", "front", "side", "shotCam"]
+        self.render_layers = ["defaultRenderLayer", "bg", "chars"]
+        self.current_camera = "persp"
+        self.current_layer = "defaultRenderLayer"
+        self.attrs: dict[str, Any] = {}
+        self.workspace = str(Path(scene_path).parent.parent)
+        self._base_frames: dict[tuple[int, int], np.ndarray] = {}
+
+    def base_frame(self, width: int, height: int) -> np.ndarray:
+        key = (width, height)
+        if key not in self._base_frames:
+            x = np.linspace(0, 255, width, dtype=np.float32)
+            y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+            rng = np.random.default_rng(width * height)
+            noise = rng.integers(0, 24, (height, width), dtype=np.uint8)
+            frame = np.empty((height, width, 3), dtype=np.uint8)
+            frame[..., 0] = np.broadcast_to(x, (height, width)).astype(np.uint8)
+            frame[..., 1] = np.broadcast_to(y, (height, width)).astype(np.uint8)
+            frame[..., 2] = ((x + y) / 2).astype(np.uint8) | noise
+            self._base_frames[key] = frame
+
+        return self._base_frames[key]
+
+    def synth_frame(self, width: int, height: int, frame: int) -> np.ndarray:
+        img = np.roll(self.base_frame(width, height), frame * 8, axis=1)
+        size = max(8, height // 6)
+        y = (frame * 13) % max(1, height - size)
+        img[y : y + size, width // 3 : width // 3 + size] = (40, 180, 240)
+        return img
+
+    def playblast(self, **kwargs: Any) -> Any:
+        if kwargs.get("activeEditor"):
+            return "modelPanel4"
+
+        start = int(kwargs.get("startTime", self.start_frame))
+        end = int(kwargs.get("endTime", self.end_frame))
+        width, height = kwargs["widthHeight"]
+        filename = kwargs["filename"]
+        compression = kwargs.get("compression", "jpg")
+        quality = int(kwargs.get("quality", 100))
+
+        Path(filename).parent.mkdir(parents=True, exist_ok=True)
+        params = []
+        if compression in ("jpg", "jpeg"):
+            params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        elif compression == "tif":
+            # maya writes uncompressed tiffs
+            params = [cv2.IMWRITE_TIFF_COMPRESSION, 1]
+
+        for frame in range(start, end + 1):
+            if self.capture_latency:
+                time.sleep(self.capture_latency)
+
+            img = self.synth_frame(width, height, frame)
+            cv2.imwrite(f"{filename}.{frame:04d}.{compression}", img, params)
+
+        return filename
+
+
+def _build_cmds(scene: FakeScene) -> types.ModuleType:
+    cmds = types.ModuleType("maya.cmds")
+
+    def file(*args: Any, **kwargs: Any) -> Any:
+        if kwargs.get("query") and kwargs.get("sceneName"):
+            return scene.scene_path
+        return None
+
+    def modelEditor(panel: str, **kwargs: Any) -> Any:
+        if kwargs.get("query") and kwargs.get("camera"):
+            return f"|{scene.current_camera}|{scene.current_camera}Shape"
+        if kwargs.get("edit") and "camera" in kwargs:
+            scene.current_camera = kwargs["camera"]
+        return None
+
+    def editRenderLayerGlobals(**kwargs: Any) -> Any:
+        if kwargs.get("query"):
+            return scene.current_layer
+        if "currentRenderLayer" in kwargs:
+            scene.current_layer = kwargs["currentRenderLayer"]
+        return None
+
+    def ls(*args: Any, **kwargs: Any) -> list[str]:
+        if kwargs.get("cameras"):
+            return [f"{c}Shape" for c in scene.cameras]
+        if kwargs.get("type") == "renderLayer":
+            return list(scene.render_layers)
+        return []
+
+    def listRelatives(node: str, **kwargs: Any) -> list[str]:
+        return [node[: -len("Shape")] if node.endswith("Shape") else node]
+
+    def playbackOptions(**kwargs: Any) -> float:
+        if kwargs.get("minTime"):
+            return float(scene.start_frame)
+        return float(scene.end_frame)
+
+    def currentUnit(**kwargs: Any) -> str:
+        return scene.time_unit
+
+    def setAttr(attr: str, value: Any, **kwargs: Any) -> None:
+        scene.attrs[attr] = value
+
+    def getAttr(attr: str, **kwargs: Any) -> Any:
+        return scene.attrs.get(attr)
+
+    def workspace(**kwargs: Any) -> str:
+        return scene.workspace
+
+    def refresh(**kwargs: Any) -> None:
+        return None
+
+    for fn in (
+        file,
+        modelEditor,
+        editRenderLayerGlobals,
+        ls,
+        listRelatives,
+        playbackOptions,
+        currentUnit,
+        setAttr,
+        getAttr,
+        workspace,
+        refresh,
+    ):
+        setattr(cmds, fn.__name__, fn)
+
+    cmds.playblast = scene.playblast
+    return cmds
+
+
+def _build_open_maya_ui() -> types.ModuleType:
+    omui = types.ModuleType("maya.OpenMayaUI")
+
+    class MQtUtil:
+        @staticmethod
+        def mainWindow() -> int:
+            return 0
+
+    omui.MQtUtil = MQtUtil
+    return omui
+
+
+def install(scene: FakeScene) -> FakeScene:
+    maya = types.ModuleType("maya")
+    maya.__path__ = []
+    maya.cmds = _build_cmds(scene)
+    maya.OpenMayaUI = _build_open_maya_ui()
+
+    sys.modules["maya"] = maya
+    sys.modules["maya.cmds"] = maya.cmds
+    sys.modules["maya.OpenMayaUI"] = maya.OpenMayaUI
+    return scene
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import json
+import os
+import socket
+import sys
+import time
+import types
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+BASELINES = Path(__file__).resolve().parent / "baselines"
+
+
+def bootstrap_package() -> None:
+    # import the controller without pulling in the Qt UI from ghettoblaster/__init__
+    if "ghettoblaster" in sys.modules:
+        return
+
+    pkg = types.ModuleType("ghettoblaster")
+    pkg.__path__ = [str(ROOT_PATH)]
+    sys.modules["ghettoblaster"] = pkg
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+class PhaseTimer:
+    def __init__(self) -> None:
+        self.phases: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + (
+                time.perf_counter() - start
+            )
+
+
+def baseline_path(name: str) -> Path:
+    return BASELINES / f"{name}_{socket.gethostname()}.json"
+
+
+def load_baseline(path: Path) -> dict[str, Any]:
+    if not path.exists():
+        return {}
+
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_baseline(path: Path, results: dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "host": socket.gethostname(),
+        "python": sys.version.split()[0],
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def compare(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, Any],
+    metrics: dict[str, bool],
+    tolerance: float,
+) -> list[str]:
+    """metrics maps a metric name to True if higher is better."""
+    regressions = []
+    base_results = baseline.get("results", {})
+    for case, values in results.items():
+        base = base_results.get(case)
+        if not base:
+            continue
+
+        for metric, higher_is_better in metrics.items():
+            new, old = values.get(metric), base.get(metric)
+            if not new or not old:
+                continue
+
+            change = (new - old) / old
+            if higher_is_better:
+                change = -change
+
+            if change > tolerance:
+                regressions.append(
+                    f"{case}: {metric} regressed {change:.1%} ({old:.3f} -> {new:.3f})"
+                )
+
+    return regressions
+
+
+def print_table(rows: list[dict[str, Any]], columns: list[str]) -> None:
+    widths = {
+        c: max(len(c), *(len(_fmt(r.get(c))) for r in rows)) if rows else len(c)
+        for c in columns
+    }
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for r in rows:
+        print("  ".join(_fmt(r.get(c)).ljust(widths[c]) for c in columns))
+
+
+def _fmt(value: Any) -> str:
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    if value is None:
+        return "-"
+    return str(value)
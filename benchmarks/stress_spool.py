@@ -0,0 +1,147 @@
+"""Spool claims under contention: every job runs to completion exactly once.
+
+Usage:
+    python benchmarks/stress_spool.py [--workers 4] [--jobs 40] [--crash 1]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from harness import bootstrap_package, print_table
+
+HEARTBEAT = 0.5
+STALE_AFTER = 2.0
+
+
+def log(path: Path, line: str) -> None:
+    # appends of a single short line are atomic, the workers share the file
+    with open(path, "a") as f:
+        f.write(line + "\n")
+
+
+def run_worker(root: Path, name: str, crash: bool, fail_every: int) -> int:
+    bootstrap_package()
+    from ghettoblaster.controller.spool import Spool, run_spool_worker
+
+    spool = Spool(root)
+    spool.HEARTBEAT = HEARTBEAT
+    spool.STALE_AFTER = STALE_AFTER
+    runs = root / "runs.log"
+
+    def handler(job) -> int:
+        log(runs, f"start {job.name} {name}")
+        if crash:
+            # dies holding the claim, another worker picks the job up once
+            # it goes stale
+            os._exit(1)
+        time.sleep(random.uniform(0.05, 0.2))
+        if fail_every and job.data["attempts"] == 1:
+            if int(job.data["scene"][-6:-3]) % fail_every == 0:
+                # back to incoming, free for any worker to claim again
+                log(runs, f"fail {job.name} {name}")
+                raise RuntimeError("first attempt fails")
+        log(runs, f"end {job.name} {name}")
+        return 1
+
+    run_spool_worker(spool, name, handler, poll=0.1)
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--crash", type=int, default=1, help="workers that crash")
+    parser.add_argument(
+        "--fail-every", type=int, default=4, help="jobs whose first attempt fails"
+    )
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--root", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--crashes", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(args.root, args.worker, args.crashes, args.fail_every)
+
+    bootstrap_package()
+    from ghettoblaster.controller.spool import Spool
+
+    root = Path(tempfile.mkdtemp(prefix="gb_spool_"))
+    procs: list[subprocess.Popen] = []
+    try:
+        spool = Spool(root)
+        names = [
+            spool.submit(f"/shots/sh{i:03d}.ma", {"playblasts": []})
+            for i in range(args.jobs)
+        ]
+        # jobs that waited in the queue for longer than a claim may go stale
+        for path in spool.jobs("incoming"):
+            os.utime(path, (0, 0))
+
+        start = time.perf_counter()
+        for i in range(args.workers):
+            command = [sys.executable, __file__, "--worker", f"worker{i}"]
+            command += ["--root", str(root), "--fail-every", str(args.fail_every)]
+            if i < args.crash:
+                command.append("--crashes")
+            procs.append(subprocess.Popen(command))
+
+        while spool.counts()["done"] < args.jobs:
+            if time.perf_counter() - start > args.timeout:
+                print(f"Timed out after {args.timeout:.0f}s: {spool.counts()}")
+                return 1
+            time.sleep(0.2)
+        wall = time.perf_counter() - start
+
+        events: dict[str, Counter[str]] = {
+            e: Counter() for e in ("start", "fail", "end")
+        }
+        for line in (root / "runs.log").read_text().splitlines():
+            event, name, _ = line.split()
+            events[event][name] += 1
+        starts, fails, ends = events.values()
+
+        problems = [f"{n} finished {ends[n]} times" for n in names if ends[n] != 1]
+        crashed = sum(starts.values()) - sum(ends.values()) - sum(fails.values())
+        if crashed != args.crash:
+            problems.append(f"{crashed} runs didn't finish, expected {args.crash}")
+        counts = spool.counts()
+        if counts != {"incoming": 0, "claimed": 0, "done": args.jobs, "failed": 0}:
+            problems.append(f"spool ended as {counts}")
+
+        print_table(
+            [
+                {
+                    "workers": args.workers,
+                    "jobs": args.jobs,
+                    "runs": sum(starts.values()),
+                    "failed": sum(fails.values()),
+                    "crashed": crashed,
+                    "wall_s": wall,
+                }
+            ],
+            ["workers", "jobs", "runs", "failed", "crashed", "wall_s"],
+        )
+        for problem in problems:
+            print(f"FAILED {problem}")
+        return 1 if problems else 0
+    finally:
+        for proc in procs:
+            proc.kill()
+            proc.wait()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, NamedTuple, Optional
+
+from ghettoblaster.controller.logger import Logger
+
+if TYPE_CHECKING:
+    from ghettoblaster.controller.playblast import Playblast
+
+
+class LayerResult(NamedTuple):
+    pb: Playblast
+    folder: Path
+    video: Path
+
+
+def detach(args: list[str]) -> subprocess.Popen:
+    # never waited on: no pipes, own session/process group
+    kwargs = {
+        "stdin": subprocess.DEVNULL,
+        "stdout": subprocess.DEVNULL,
+        "stderr": subprocess.DEVNULL,
+        "close_fds": True,
+    }
+    if sys.platform == "win32":
+        kwargs["creationflags"] = (
+            subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+        )
+    else:
+        kwargs["start_new_session"] = True
+
+    return subprocess.Popen(args, **kwargs)
+
+
+def open_folder(folder: Path) -> None:
+    if sys.platform == "darwin":
+        detach(["open", str(folder)])
+    elif sys.platform == "win32":
+        detach(["explorer", str(folder)])
+    else:
+        detach(["xdg-open", str(folder)])
+
+
+def applescript_string(text: str) -> str:
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def powershell_string(text: str) -> str:
+    # single quoted strings expand nothing, quotes are doubled. powershell
+    # also takes the typographic single quotes as quotes
+    for quote in "'\u2018\u2019\u201a\u201b":
+        text = text.replace(quote, quote * 2)
+    return "'" + text + "'"
+
+
+class PostAction:
+    name = "action"
+
+    def run(self, result: LayerResult) -> None:
+        raise NotImplementedError
+
+
+class OpenFolderAction(PostAction):
+    name = "open_folder"
+
+    def run(self, result: LayerResult) -> None:
+        open_folder(result.folder)
+
+
+class NotifyAction(PostAction):
+    name = "notify"
+
+    def run(self, result: LayerResult) -> None:
+        title = "Ghettoblaster"
+        message = f"{result.pb.name} finished"
+        if sys.platform == "darwin":
+            script = (
+                f"display notification {applescript_string(message)} "
+                f"with title {applescript_string(title)}"
+            )
+            detach(["osascript", "-e", script])
+        elif sys.platform == "win32":
+            # a tray balloon, shown as a toast on windows 10 and later
+            script = (
+                "Add-Type -AssemblyName System.Windows.Forms, System.Drawing; "
+                "$icon = New-Object System.Windows.Forms.NotifyIcon; "
+                "$icon.Icon = [System.Drawing.SystemIcons]::Information; "
+                "$icon.Visible = $true; "
+                f"$icon.ShowBalloonTip(5000, {powershell_string(title)}, "
+                f"{powershell_string(message)}, 'Info'); "
+                "Start-Sleep -Seconds 6; $icon.Dispose()"
+            )
+            detach(["powershell", "-NoProfile", "-NonInteractive", "-Command", script])
+        elif sys.platform.startswith("linux") and shutil.which("notify-send"):
+            detach(["notify-send", title, message])
+        else:
+            Logger.info(f"{title}: {message}")
+
+
+class CopyAction(PostAction):
+    name = "copy"
+
+    def __init__(self, destination: Path, name: str = "copy") -> None:
+        self.destination = Path(destination)
+        self.name = name
+
+    def run(self, result: LayerResult) -> None:
+        if not result.video.exists():
+            return
+        self.destination.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(result.video, self.destination / result.video.name)
+
+
+class CommandAction(PostAction):
+    # args may use {video}, {folder} and {name}, e.g. for a publish tool
+    def __init__(self, name: str, args: list[str]) -> None:
+        self.name = name
+        self.args = args
+
+    def run(self, result: LayerResult) -> None:
+        values = {
+            "video": str(result.video),
+            "folder": str(result.folder),
+            "name": result.pb.name,
+        }
+        detach([a.format(**values) for a in self.args])
+
+
+class CallableAction(PostAction):
+    def __init__(self, name: str, func: Callable[[LayerResult], None]) -> None:
+        self.name = name
+        self.func = func
+
+    def run(self, result: LayerResult) -> None:
+        self.func(result)
+
+
+ACTIONS: dict[str, PostAction] = {}
+
+
+def register_action(action: PostAction) -> None:
+    ACTIONS[action.name] = action
+
+
+for _action in (OpenFolderAction(), NotifyAction()):
+    register_action(_action)
+
+
+class ActionRunner:
+    MAX_WORKERS = 2
+
+    def __init__(self) -> None:
+        self.executor = ThreadPoolExecutor(
+            self.MAX_WORKERS, thread_name_prefix="ghettoblaster-action"
+        )
+        self.futures: list[Future] = []
+
+    def submit(self, names: tuple[str, ...], result: LayerResult) -> None:
+        for name in names:
+            action = ACTIONS.get(name)
+            if not action:
+                Logger.warning(f"Unknown post action '{name}' for {result.pb.name}")
+                continue
+            self.futures.append(self.executor.submit(self._run, action, result))
+
+    def _run(self, action: PostAction, result: LayerResult) -> None:
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            action.run(result)
+        except Exception as e:
+            status = "error"
+            Logger.error(f"Post action {action.name} for {result.pb.name} failed: {e}")
+        finally:
+            duration = time.perf_counter() - start
+            Logger.record_span(
+                "post_action",
+                duration,
+                action=action.name,
+                layer=result.pb.name,
+                status=status,
+            )
+            Logger.info(
+                f"Post action {action.name} for {result.pb.name} took {duration:.2f}s"
+            )
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        for future in self.futures:
+            future.result(timeout)
+
+    def shutdown(self, wait: bool = False) -> None:
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import getpass
+from datetime import date
+from typing import TYPE_CHECKING, Optional
+
+from ghettoblaster.controller import maya_cmds
+from ghettoblaster.controller.lazy import lazy_import
+
+if TYPE_CHECKING:
+    from ghettoblaster.controller.playblast import Playblast
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+BURN_INS = ("scene", "layer", "camera", "user", "date", "frame", "timecode")
+# cv2.FONT_HERSHEY_SIMPLEX, spelled out so importing this module does not load cv2
+FONT = 0
+TEXT_COLOR = (255, 255, 255)
+BAND_COLOR = (0, 0, 0)
+
+
+def timecode(frame: int, fps: float) -> str:
+    # fractional rates count frames at the nominal rate, 23.976 as 24. 29.97
+    # and 59.94 use drop frame so the timecode keeps up with the clock
+    nominal = round(fps)
+    separator = ":"
+    if nominal != fps and nominal % 30 == 0:
+        # skips the first frame numbers of every minute but each tenth
+        drop = nominal // 15
+        per_minute = nominal * 60 - drop
+        per_ten = nominal * 600 - drop * 9
+        tens, rest = divmod(frame, per_ten)
+        frame += drop * 9 * tens + drop * max(0, (rest - drop) // per_minute)
+        separator = ";"
+
+    frames = frame % nominal
+    seconds = frame // nominal
+    hours, minutes = seconds // 3600, seconds // 60 % 60
+    return f"{hours:02d}:{minutes:02d}:{seconds % 60:02d}{separator}{frames:02d}"
+
+
+class GlyphAtlas:
+    CHARS = "0123456789:; "
+
+    def __init__(self, height: int, color=TEXT_COLOR, background=BAND_COLOR) -> None:
+        self.scale = font_scale(height)
+        self.thickness = max(1, round(self.scale * 1.5))
+
+        sizes = [
+            cv2.getTextSize(c, FONT, self.scale, self.thickness) for c in self.CHARS
+        ]
+        self.width = max(w for (w, _), _ in sizes) + 2
+        self.height = height
+
+        # every glyph is rendered once into a fixed size, opaque cell
+        self.glyphs: dict[str, np.ndarray] = {}
+        for char, ((w, h), _) in zip(self.CHARS, sizes):
+            cell = np.full((self.height, self.width, 3), background, np.uint8)
+            org = ((self.width - w) // 2, (self.height + h) // 2)
+            cv2.putText(
+                cell, char, org, FONT, self.scale, color, self.thickness, cv2.LINE_AA
+            )
+            self.glyphs[char] = cell
+
+    def text_width(self, text: str) -> int:
+        return len(text) * self.width
+
+    def draw(self, frame: np.ndarray, text: str, x: int, y: int) -> None:
+        w, h = self.width, self.height
+        for char in text:
+            frame[y : y + h, x : x + w] = self.glyphs[char]
+            x += w
+
+
+def font_scale(band_height: int) -> float:
+    # Hershey simplex digits are ~22px tall at scale 1.0
+    return band_height * 0.55 / 22
+
+
+def draw_text(band: np.ndarray, text: str, x: int, align_right: bool = False) -> None:
+    height = band.shape[0]
+    scale = font_scale(height)
+    thickness = max(1, round(scale * 1.5))
+    (w, h), _ = cv2.getTextSize(text, FONT, scale, thickness)
+    if align_right:
+        x = band.shape[1] - x - w
+    org = (x, (height + h) // 2)
+    cv2.putText(band, text, org, FONT, scale, TEXT_COLOR, thickness, cv2.LINE_AA)
+
+
+class BurnIn:
+    def __init__(
+        self,
+        elements: tuple[str, ...],
+        width: int,
+        height: int,
+        fps: float,
+        values: dict[str, str],
+    ) -> None:
+        self.elements = elements
+        self.fps = fps
+        self.band = max(16, round(height * 0.035))
+        self.margin = self.band // 2
+
+        top_left = " | ".join(values[e] for e in ("scene", "layer") if e in elements)
+        top_right = values["camera"] if "camera" in elements else ""
+        bottom_left = "  ".join(values[e] for e in ("user", "date") if e in elements)
+
+        # static text is rasterized once into the top and bottom bands
+        self.top: Optional[np.ndarray] = None
+        if top_left or top_right:
+            self.top = np.full((self.band, width, 3), BAND_COLOR, np.uint8)
+            draw_text(self.top, top_left, self.margin)
+            draw_text(self.top, top_right, self.margin, align_right=True)
+
+        self.dynamic = "frame" in elements or "timecode" in elements
+        self.bottom: Optional[np.ndarray] = None
+        if bottom_left or self.dynamic:
+            self.bottom = np.full((self.band, width, 3), BAND_COLOR, np.uint8)
+            draw_text(self.bottom, bottom_left, self.margin)
+
+        self.atlas = GlyphAtlas(self.band) if self.dynamic else None
+
+    @classmethod
+    def from_playblast(cls, pb: Playblast) -> Optional[BurnIn]:
+        if not pb.burn_ins:
+            return None
+
+        values = {
+            "scene": pb.scene_name or maya_cmds.get_scene_name(),
+            "layer": pb.render_layer,
+            "camera": pb.camera,
+            "user": getpass.getuser(),
+            "date": str(date.today()),
+        }
+        return cls(pb.burn_ins, pb.width, pb.height, pb.frame_rate, values)
+
+    def dynamic_text(self, frame_number: int) -> str:
+        parts = []
+        if "timecode" in self.elements:
+            parts.append(timecode(frame_number, self.fps))
+        if "frame" in self.elements:
+            parts.append(f"{frame_number:04d}")
+        return "  ".join(parts)
+
+    def apply(self, frame: np.ndarray, frame_number: int) -> np.ndarray:
+        height, width = frame.shape[:2]
+        if self.top is not None and self.top.shape[1] == width:
+            frame[: self.band] = self.top
+        if self.bottom is not None and self.bottom.shape[1] == width:
+            frame[height - self.band :] = self.bottom
+
+        if self.atlas:
+            text = self.dynamic_text(max(0, frame_number))
+            x = width - self.margin - self.atlas.text_width(text)
+            self.atlas.draw(frame, text, x, height - self.band)
+
+        return frame
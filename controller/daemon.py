@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import argparse
+import hmac
+import json
+import os
+import secrets
+import socket
+import socketserver
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from ghettoblaster.controller.encoder import encode_with_events
+from ghettoblaster.controller.lazy import preload
+from ghettoblaster.controller.logger import Logger
+from ghettoblaster.controller.paths import user_data_dir
+from ghettoblaster.controller.pipeline import Cancelled
+from ghettoblaster.controller.playblast import Playblast, PlayblastRenderer
+
+HOST = "127.0.0.1"
+DEFAULT_PORT = 47410
+
+
+class DaemonError(Exception):
+    pass
+
+
+def default_port() -> int:
+    return int(os.environ.get("GHETTOBLASTER_DAEMON_PORT", DEFAULT_PORT))
+
+
+def token_path() -> Path:
+    return user_data_dir() / "daemon.token"
+
+
+def read_token() -> Optional[str]:
+    try:
+        return token_path().read_text().strip() or None
+    except OSError:
+        return None
+
+
+def daemon_token() -> str:
+    # any process can connect to the port, only the sessions of the user who
+    # started the daemon can read the token and encode with it
+    token = read_token()
+    if token:
+        return token
+
+    path = token_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    token = secrets.token_hex(16)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        return read_token() or token
+    with os.fdopen(fd, "w") as f:
+        f.write(token)
+    return token
+
+
+def send_message(sock: socket.socket, message: dict[str, Any]) -> None:
+    # one json object per line in both directions
+    sock.sendall(json.dumps(message).encode() + b"\n")
+
+
+class EncodeHandler(socketserver.BaseRequestHandler):
+    server: EncodeDaemon
+
+    def handle(self) -> None:
+        line = self.request.makefile("rb").readline()
+        try:
+            request = json.loads(line)
+        except ValueError:
+            self.send({"event": "error", "message": "invalid request"})
+            return
+        if not hmac.compare_digest(str(request.get("token")), self.server.token):
+            self.send({"event": "error", "message": "invalid token"})
+            return
+
+        op = request.get("op")
+        if op == "status":
+            self.send({"event": "status", **self.server.status()})
+        elif op == "encode":
+            self.server.encode(Playblast.deserialize(request["playblast"]), self.send)
+        else:
+            self.send({"event": "error", "message": f"unknown op {op!r}"})
+
+    def send(self, message: dict[str, Any]) -> None:
+        send_message(self.request, message)
+
+
+class EncodeDaemon(socketserver.ThreadingTCPServer):
+    # every maya session on this machine submits its encodes here, so only
+    # max_encodes run at once no matter how many batches are going
+    daemon_threads = True
+    # on windows SO_REUSEADDR lets a second process bind the port as well and
+    # take over connections, the port is claimed exclusively there instead
+    allow_reuse_address = sys.platform != "win32"
+
+    def __init__(self, port: Optional[int] = None, max_encodes: int = 2) -> None:
+        self.token = daemon_token()
+        super().__init__((HOST, port or default_port()), EncodeHandler)
+        self.max_encodes = max(1, max_encodes)
+        self.slots = threading.BoundedSemaphore(self.max_encodes)
+        self.lock = threading.Lock()
+        self.running = 0
+        self.waiting = 0
+        self.finished = 0
+
+    def status(self) -> dict[str, int]:
+        with self.lock:
+            return {
+                "running": self.running,
+                "waiting": self.waiting,
+                "finished": self.finished,
+                "max_encodes": self.max_encodes,
+            }
+
+    def server_bind(self) -> None:
+        if sys.platform == "win32":
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+        super().server_bind()
+
+    def encode(self, pb: Playblast, send: Callable[[dict[str, Any]], None]) -> None:
+        with self.lock:
+            self.waiting += 1
+            position = self.waiting
+        send({"event": "queued", "position": position})
+
+        with self.slots:
+            with self.lock:
+                self.waiting -= 1
+                self.running += 1
+            try:
+                self.run_encode(pb, send)
+            finally:
+                with self.lock:
+                    self.running -= 1
+                    self.finished += 1
+
+    def run_encode(self, pb: Playblast, send: Callable[[dict[str, Any]], None]) -> None:
+        # the playblast arrives resolved, nothing here needs an open scene
+        encode_with_events(PlayblastRenderer([pb], lambda _: None), pb, send)
+
+
+class DaemonClient:
+    TIMEOUT = 1.0
+    # how often a waiting encode checks for cancellation
+    POLL_INTERVAL = 0.25
+
+    def __init__(self, port: Optional[int] = None, token: Optional[str] = None) -> None:
+        self.port = port or default_port()
+        self.token = token or read_token()
+
+    @classmethod
+    def find(cls, port: Optional[int] = None) -> Optional[DaemonClient]:
+        # None when no daemon of this user is running, callers encode in
+        # process instead
+        client = cls(port)
+        return client if client.token and client.ping() else None
+
+    def ping(self) -> bool:
+        try:
+            self.status()
+        except (OSError, DaemonError):
+            return False
+        return True
+
+    def status(self) -> dict[str, Any]:
+        for event in self.request({"op": "status"}):
+            if event.get("event") == "error":
+                raise DaemonError(event["message"])
+            return event
+        raise DaemonError("no status from the encode daemon")
+
+    def request(
+        self, message: dict[str, Any], cancelled: Optional[threading.Event] = None
+    ) -> Iterator[dict[str, Any]]:
+        with socket.create_connection((HOST, self.port), self.TIMEOUT) as sock:
+            send_message(sock, {**message, "token": self.token})
+            sock.settimeout(self.POLL_INTERVAL)
+            buffer = b""
+            while True:
+                # closing the connection cancels the encode in the daemon
+                if cancelled is not None and cancelled.is_set():
+                    raise Cancelled()
+                try:
+                    chunk = sock.recv(65536)
+                except socket.timeout:
+                    continue
+                if not chunk:
+                    return
+
+                *lines, buffer = (buffer + chunk).split(b"\n")
+                for line in lines:
+                    yield json.loads(line)
+
+    def encode(
+        self,
+        pb: Playblast,
+        on_progress: Optional[Callable[[int], None]] = None,
+        cancelled: Optional[threading.Event] = None,
+    ) -> int:
+        # blocks until the daemon encoded pb, returns the encoded frame count
+        message = {"op": "encode", "playblast": pb.serialize()}
+        try:
+            for event in self.request(message, cancelled):
+                kind = event.get("event")
+                if kind == "progress" and on_progress:
+                    on_progress(event["percent"])
+                elif kind == "done":
+                    return event["frames"]
+                elif kind == "error":
+                    raise DaemonError(event["message"])
+        except OSError as e:
+            raise DaemonError(f"lost the encode daemon: {e}") from e
+        raise DaemonError("the encode daemon closed the connection")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="ghettoblaster.controller.daemon")
+    parser.add_argument("--port", type=int, default=default_port())
+    parser.add_argument("--max-encodes", type=int, default=2)
+    parser.add_argument("--status", action="store_true", help="query a running daemon")
+    args = parser.parse_args()
+
+    if args.status:
+        try:
+            status = DaemonClient(args.port).status()
+        except (OSError, DaemonError) as e:
+            Logger.error(f"No encode daemon on port {args.port}: {e}")
+            return 1
+        print(", ".join(f"{k}: {v}" for k, v in status.items() if k != "event"))
+        return 0
+
+    # every connection encodes on its own thread
+    preload("cv2", "numpy")
+    with EncodeDaemon(args.port, args.max_encodes) as daemon:
+        Logger.info(
+            f"Encode daemon on {HOST}:{args.port}, "
+            f"{daemon.max_encodes} encode(s) at once"
+        )
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,539 @@
+from __future__ import annotations
+
+import argparse
+import atexit
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from pathlib import Path
+from typing import Any, Callable, NamedTuple, Optional
+
+from ghettoblaster.controller.frame_ring import FrameRing, RingReader
+from ghettoblaster.controller.lazy import lazy_import
+from ghettoblaster.controller.logger import Logger
+from ghettoblaster.controller.pipeline import Cancelled
+from ghettoblaster.controller.playblast import (
+    QUALITIES,
+    Playblast,
+    PlayblastRenderer,
+    frame_count,
+)
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+
+class EncoderError(Exception):
+    pass
+
+
+class PendingEncode(NamedTuple):
+    future: Future
+    on_progress: Optional[Callable[[int], None]]
+    # the encoder process the request was sent to
+    proc: subprocess.Popen
+    stream: Optional[FrameStream] = None
+
+
+class FrameStream:
+    # frames of one layer on their way to the encoder process through a
+    # FrameRing, encoding runs while the layer is still capturing
+    def __init__(
+        self,
+        client: EncoderClient,
+        proc: subprocess.Popen,
+        encode_id: int,
+        future: Future,
+        ring: FrameRing,
+    ) -> None:
+        self.client = client
+        self.proc = proc
+        self.encode_id = encode_id
+        self.future = future
+        self.ring = ring
+        # seconds the producer waited for the encoder to hand back a slot
+        self.waited = 0.0
+        self.handoff: dict[str, float] = {}
+
+    def put(
+        self,
+        frame_number: int,
+        frame: np.ndarray,
+        cancelled: Optional[threading.Event] = None,
+    ) -> None:
+        start = time.perf_counter()
+        while True:
+            if cancelled is not None and cancelled.is_set():
+                raise Cancelled()
+            slot = self.ring.acquire(self.client.POLL_INTERVAL)
+            if slot is not None:
+                break
+            if self.future.done():
+                # the encoder failed or went away, slots never come back
+                self.future.result()
+                raise EncoderError("the encoder stopped reading frames")
+        self.waited += time.perf_counter() - start
+
+        if frame.shape != self.ring.shape:
+            height, width = self.ring.shape[:2]
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        self.ring.frames[slot] = frame
+        message = {
+            "op": "frame",
+            "id": self.encode_id,
+            "slot": slot,
+            "frame": frame_number,
+            "sent": time.perf_counter(),
+        }
+        try:
+            self.client._send(self.proc, message)
+        except (OSError, ValueError) as e:
+            raise EncoderError(f"encoder process is gone: {e}") from e
+
+    def end(self) -> None:
+        try:
+            self.client._send(self.proc, {"op": "end", "id": self.encode_id})
+        except (OSError, ValueError):
+            pass
+
+    def wait(self, cancelled: Optional[threading.Event] = None) -> int:
+        try:
+            frames = self.client.wait(self.future, cancelled)
+        finally:
+            self.close()
+
+        if self.handoff:
+            Logger.info(
+                f"Frame handoff: {self.handoff['mean_ms']:.3f} ms mean, "
+                f"{self.handoff['max_ms']:.3f} ms max, waited {self.waited:.2f}s "
+                f"for free slots"
+            )
+            Logger.record_span(
+                "frame_handoff",
+                self.handoff["mean_ms"] * self.handoff["frames"] / 1000,
+                frames=self.handoff["frames"],
+                max_ms=self.handoff["max_ms"],
+                slot_wait=self.waited,
+            )
+        return frames
+
+    def close(self) -> None:
+        if not self.future.done():
+            self.future.cancel()
+        self.ring.close()
+
+
+def encode_with_events(
+    renderer: PlayblastRenderer,
+    pb: Playblast,
+    send: Callable[[dict[str, Any]], None],
+    reader: Optional[RingReader] = None,
+) -> None:
+    # runs one encode and reports it as started/progress/done/error events,
+    # from the captured sequence or from frames handed over through a ring.
+    # a send that fails means the submitter is gone and cancels the encode
+    total = max(1, frame_count(pb))
+    encoded = 0
+    percent = -1
+
+    def on_frame(source: Any) -> None:
+        nonlocal encoded, percent
+        encoded += 1
+        events = []
+        if reader is not None:
+            # the frame is written, its slot can be refilled
+            events.append({"event": "slot", "slot": source})
+        current = encoded * 100 // total
+        if current != percent:
+            percent = current
+            events.append({"event": "progress", "percent": percent})
+        try:
+            for event in events:
+                send(event)
+        except OSError:
+            renderer.cancel()
+
+    Logger.info(f"Encoding {pb.name} ({pb.scene_name})")
+    try:
+        send({"event": "started"})
+    except OSError:
+        return
+
+    event: dict[str, Any]
+    try:
+        if reader is not None:
+            frames = renderer.stream_video_render(pb, reader, on_frame)
+        else:
+            frames = renderer.video_render(pb, on_frame)
+    except Cancelled:
+        Logger.warning(f"Cancelled encode of {pb.name}")
+        event = {"event": "cancelled"}
+    except Exception as e:
+        Logger.exception(f"Encode of {pb.name} failed: {e}")
+        event = {"event": "error", "message": f"{type(e).__name__}: {e}"}
+    else:
+        Logger.info(f"Encoded {frames} frames of {pb.name}")
+        event = {"event": "done", "frames": frames}
+        if reader is not None:
+            event["handoff"] = reader.stats()
+
+    try:
+        send(event)
+    except OSError:
+        # the submitter is gone
+        pass
+
+
+def warm_up() -> None:
+    # load opencv, numpy and every video codec before the first layer arrives
+    frame = np.zeros((16, 16, 3), np.uint8)
+    with tempfile.TemporaryDirectory(prefix="ghettoblaster_warm_") as tmp:
+        for codec in QUALITIES.values():
+            path = Path(tmp) / f"{codec}.mp4"
+            fourcc = cv2.VideoWriter_fourcc(*codec)
+            video = cv2.VideoWriter(str(path), fourcc, 24.0, (16, 16))
+            video.write(frame)
+            video.release()
+
+
+def serve(workers: int) -> None:
+    # requests arrive on stdin, events leave on the original stdout. anything
+    # else printing to stdout, opencv and ffmpeg included, goes to stderr
+    out = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    lock = threading.Lock()
+
+    def send(message: dict[str, Any]) -> None:
+        with lock:
+            out.write(json.dumps(message) + "\n")
+            out.flush()
+
+    renderers: dict[int, PlayblastRenderer] = {}
+    readers: dict[int, RingReader] = {}
+
+    def run(encode_id: int, pb: Playblast) -> None:
+        reader = readers.get(encode_id)
+        try:
+            encode_with_events(
+                renderers[encode_id],
+                pb,
+                lambda m: send({"id": encode_id, **m}),
+                reader,
+            )
+        finally:
+            renderers.pop(encode_id, None)
+            if reader is not None:
+                readers.pop(encode_id, None)
+                reader.ring.close()
+
+    def handle(request: dict[str, Any]) -> None:
+        # ops for encodes that already finished or failed are dropped, a late
+        # frame or end can always arrive after the encode gave up
+        encode_id = request.get("id")
+        op = request.get("op")
+        reader = readers.get(encode_id)
+        if op == "frame":
+            if reader is not None:
+                reader.put(request["slot"], request["frame"], request["sent"])
+        elif op == "end":
+            if reader is not None:
+                reader.end()
+        elif op == "cancel":
+            renderer = renderers.get(encode_id)
+            if renderer:
+                renderer.cancel()
+            if reader is not None:
+                reader.end()
+        elif op in ("encode", "stream"):
+            pb = Playblast.deserialize(request["playblast"])
+            renderer = PlayblastRenderer([pb], lambda _: None)
+            if op == "stream":
+                ring = FrameRing.attach(
+                    request["ring"], tuple(request["shape"]), request["slots"]
+                )
+                readers[encode_id] = RingReader(ring, renderer.cancelled)
+            renderers[encode_id] = renderer
+            pool.submit(run, encode_id, pb)
+        else:
+            raise ValueError(f"unknown op {op!r}")
+
+    warm_up()
+    pool = ThreadPoolExecutor(workers, thread_name_prefix="ghettoblaster-encoder")
+    send({"event": "ready", "pid": os.getpid()})
+    try:
+        for line in sys.stdin:
+            # one bad request must not take down the other encodes
+            request: dict[str, Any] = {}
+            try:
+                request = json.loads(line)
+                handle(request)
+            except Exception as e:
+                Logger.exception(f"Encoder request failed: {e}")
+                if isinstance(request, dict) and request.get("op") in (
+                    "encode",
+                    "stream",
+                ):
+                    send(
+                        {
+                            "id": request.get("id"),
+                            "event": "error",
+                            "message": f"{type(e).__name__}: {e}",
+                        }
+                    )
+    finally:
+        # stdin closes when the session stops the encoder or exits
+        for renderer in list(renderers.values()):
+            renderer.cancel()
+        for reader in list(readers.values()):
+            reader.end()
+        pool.shutdown(wait=True)
+
+
+class EncoderClient:
+    # one warm encoder process per session, encodes go to it over a pipe and
+    # complete asynchronously as futures
+    POLL_INTERVAL = 0.25
+    STOP_TIMEOUT = 5.0
+    _shared: Optional[EncoderClient] = None
+
+    def __init__(self, mayapy: Optional[str] = None, workers: int = 2) -> None:
+        from ghettoblaster.controller.queue_worker import default_mayapy
+
+        self.mayapy = mayapy or default_mayapy()
+        self.workers = max(1, workers)
+        self.proc: Optional[subprocess.Popen] = None
+        self.pending: dict[int, PendingEncode] = {}
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    @classmethod
+    def shared(cls) -> EncoderClient:
+        if cls._shared is None:
+            cls._shared = cls()
+            atexit.register(cls._shared.stop)
+        cls._shared.start()
+        return cls._shared
+
+    @property
+    def running(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def start(self) -> None:
+        from ghettoblaster.controller.queue_worker import worker_env
+
+        with self.lock:
+            if self.running:
+                return
+
+            self.proc = subprocess.Popen(
+                [
+                    self.mayapy,
+                    "-m",
+                    "ghettoblaster.controller.encoder",
+                    "--workers",
+                    str(self.workers),
+                ],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                env=worker_env(),
+                text=True,
+                errors="replace",
+                bufsize=1,
+            )
+            threading.Thread(
+                target=self._read,
+                args=(self.proc,),
+                name="ghettoblaster-encoder-reader",
+                daemon=True,
+            ).start()
+        Logger.info(f"Started encoder process {self.proc.pid}")
+
+    def stop(self) -> None:
+        with self.lock:
+            proc, self.proc = self.proc, None
+        if proc is None or proc.poll() is not None:
+            return
+
+        # closing stdin lets running encodes cancel and the process exit
+        proc.stdin.close()
+        try:
+            proc.wait(self.STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    def submit(
+        self, pb: Playblast, on_progress: Optional[Callable[[int], None]] = None
+    ) -> Future:
+        # resolves to the encoded frame count, cancelling the future cancels
+        # the encode in the encoder process
+        encode_id, future, proc = self._register(on_progress)
+        self._request(proc, encode_id, {"op": "encode", "playblast": pb.serialize()})
+        return future
+
+    def stream(
+        self,
+        pb: Playblast,
+        on_progress: Optional[Callable[[int], None]] = None,
+        slots: int = 8,
+    ) -> FrameStream:
+        # frames are put into the stream as they are captured, end() it when
+        # the layer is done and wait() for the encode
+        ring = FrameRing.create((pb.height, pb.width, 3), slots)
+        encode_id, future, proc = self._register(on_progress)
+        stream = FrameStream(self, proc, encode_id, future, ring)
+        with self.lock:
+            pending = self.pending.get(encode_id)
+            if pending:
+                self.pending[encode_id] = pending._replace(stream=stream)
+        self._request(
+            proc,
+            encode_id,
+            {
+                "op": "stream",
+                "playblast": pb.serialize(),
+                "ring": ring.name,
+                "shape": list(ring.shape),
+                "slots": slots,
+            },
+        )
+        return stream
+
+    def encode(
+        self,
+        pb: Playblast,
+        on_progress: Optional[Callable[[int], None]] = None,
+        cancelled: Optional[threading.Event] = None,
+    ) -> int:
+        # blocks like DaemonClient.encode, a crashed encoder is restarted once
+        for attempt in range(2):
+            try:
+                return self.wait(self.submit(pb, on_progress), cancelled)
+            except EncoderError as e:
+                if attempt:
+                    raise
+                Logger.warning(f"Restarting the encoder for {pb.name}: {e}")
+        raise EncoderError("unreachable")
+
+    def wait(self, future: Future, cancelled: Optional[threading.Event] = None) -> int:
+        while True:
+            if cancelled is not None and cancelled.is_set():
+                future.cancel()
+                raise Cancelled()
+            try:
+                return future.result(self.POLL_INTERVAL)
+            except FutureTimeout:
+                continue
+            except CancelledError:
+                raise Cancelled()
+
+    def _register(
+        self, on_progress: Optional[Callable[[int], None]]
+    ) -> tuple[int, Future, subprocess.Popen]:
+        self.start()
+        future: Future = Future()
+        with self.lock:
+            encode_id = next(self._ids)
+            proc = self.proc
+            self.pending[encode_id] = PendingEncode(future, on_progress, proc)
+        future.add_done_callback(lambda f: self._on_done(proc, encode_id, f))
+        return encode_id, future, proc
+
+    def _request(
+        self, proc: subprocess.Popen, encode_id: int, message: dict[str, Any]
+    ) -> None:
+        try:
+            self._send(proc, {"id": encode_id, **message})
+        except OSError as e:
+            self._resolve(encode_id, EncoderError(f"encoder process is gone: {e}"))
+
+    def _send(self, proc: subprocess.Popen, message: dict[str, Any]) -> None:
+        with self.lock:
+            proc.stdin.write(json.dumps(message) + "\n")
+            proc.stdin.flush()
+
+    def _on_done(self, proc: subprocess.Popen, encode_id: int, future: Future) -> None:
+        if not future.cancelled():
+            return
+        with self.lock:
+            self.pending.pop(encode_id, None)
+        try:
+            self._send(proc, {"op": "cancel", "id": encode_id})
+        except (OSError, ValueError):
+            pass
+
+    def _resolve(self, encode_id: int, result: Any) -> None:
+        with self.lock:
+            pending = self.pending.pop(encode_id, None)
+        if pending is None or pending.future.done():
+            return
+        future = pending.future
+        if isinstance(result, BaseException):
+            future.set_exception(result)
+        else:
+            future.set_result(result)
+
+    def _read(self, proc: subprocess.Popen) -> None:
+        try:
+            for line in proc.stdout:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # maya and plugins print to stdout too
+                    Logger.warning(f"Encoder process: {line.rstrip()}")
+                    continue
+                if not isinstance(event, dict):
+                    continue
+                try:
+                    self._handle(event)
+                except Exception:
+                    Logger.exception(f"Failed to handle encoder event {event}")
+        finally:
+            # nothing resolves the pending encodes once the reader is gone
+            code = proc.wait()
+            Logger.warning(f"Encoder process {proc.pid} exited with {code}")
+            with self.lock:
+                lost = [i for i, p in self.pending.items() if p.proc is proc]
+            for encode_id in lost:
+                self._resolve(encode_id, EncoderError(f"encoder exited with {code}"))
+
+    def _handle(self, event: dict[str, Any]) -> None:
+        encode_id = event.get("id")
+        kind = event.get("event")
+        pending = self.pending.get(encode_id)
+        if kind == "slot":
+            if pending and pending.stream:
+                pending.stream.ring.release(event["slot"])
+        elif kind == "progress":
+            if pending and pending.on_progress:
+                pending.on_progress(event["percent"])
+        elif kind == "done":
+            if pending and pending.stream:
+                pending.stream.handoff = event.get("handoff") or {}
+            self._resolve(encode_id, event["frames"])
+        elif kind == "error":
+            # the encode itself failed, running it again would fail the same
+            self._resolve(encode_id, RuntimeError(event["message"]))
+        elif kind == "cancelled":
+            self._resolve(encode_id, CancelledError())
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="ghettoblaster.controller.encoder")
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    serve(max(1, args.workers))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from ghettoblaster.controller.lazy import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+
+class FrameFormat(NamedTuple):
+    name: str
+    ext: str
+    lossy: bool
+
+
+# intermediate formats maya writes during capture, keyed by playblast compression
+FRAME_FORMATS = {
+    "jpg": FrameFormat("JPEG", "jpg", True),
+    "png": FrameFormat("PNG", "png", False),
+    "tif": FrameFormat("TIFF", "tif", False),
+    "bmp": FrameFormat("BMP (uncompressed)", "bmp", False),
+}
+
+
+def frame_number(file: Path) -> int:
+    # maya names sequence frames <name>.<frame>.<ext>
+    try:
+        return int(file.stem.rsplit(".", 1)[-1])
+    except ValueError:
+        return 0
+
+
+BMP_HEADER_FIELDS = [
+    ("magic", "S2"),
+    ("size", "<u4"),
+    ("reserved", "<u4"),
+    ("offset", "<u4"),
+    ("header_size", "<u4"),
+    ("width", "<i4"),
+    ("height", "<i4"),
+    ("planes", "<u2"),
+    ("bpp", "<u2"),
+    ("compression", "<u4"),
+]
+
+
+@lru_cache(maxsize=None)
+def bmp_header() -> np.dtype:
+    return np.dtype(BMP_HEADER_FIELDS)
+
+
+def read_bmp(path: Path) -> Optional[np.ndarray]:
+    # uncompressed 24 bit bitmaps are raw BGR rows, no decode needed
+    with open(path, "rb") as f:
+        dtype = bmp_header()
+        header = np.frombuffer(f.read(dtype.itemsize), dtype)[0]
+        if header["magic"] != b"BM" or header["bpp"] != 24 or header["compression"]:
+            return None
+
+        width, height = int(header["width"]), int(header["height"])
+        stride = (width * 3 + 3) & ~3
+        f.seek(int(header["offset"]))
+        data = np.fromfile(f, np.uint8, stride * abs(height))
+
+    if data.size != stride * abs(height):
+        return None
+
+    frame = data.reshape(abs(height), stride)[:, : width * 3].reshape(
+        abs(height), width, 3
+    )
+    # positive heights are stored bottom-up
+    if height > 0:
+        frame = frame[::-1]
+    return np.ascontiguousarray(frame)
+
+
+def read_frame(path: Path) -> Optional[np.ndarray]:
+    if path.suffix == ".bmp":
+        frame = read_bmp(path)
+        if frame is not None:
+            return frame
+
+    return cv2.imread(str(path), cv2.IMREAD_COLOR)
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+from typing import Any, Iterator, Optional
+
+from ghettoblaster.controller.lazy import lazy_import
+from ghettoblaster.controller.pipeline import Cancelled
+
+np = lazy_import("numpy")
+
+
+def attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name == "posix":
+        # the creator unlinks the block, keep the resource tracker of this
+        # process from unlinking it again when it exits
+        from multiprocessing import resource_tracker
+
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+def create_shared_memory(size: int) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        # the creator unlinks the block itself
+        return shared_memory.SharedMemory(create=True, size=size, track=False)
+
+    if os.name != "posix":
+        return shared_memory.SharedMemory(create=True, size=size)
+
+    # registering the block starts the resource tracker, a child of the
+    # multiprocessing executable, which is maya itself inside a session. the
+    # executable is process wide, other multiprocessing users in maya keep theirs
+    from multiprocessing import spawn
+
+    from ghettoblaster.controller.queue_worker import default_mayapy
+
+    previous = spawn.get_executable()
+    spawn.set_executable(default_mayapy())
+    try:
+        return shared_memory.SharedMemory(create=True, size=size)
+    finally:
+        spawn.set_executable(previous)
+
+
+class FrameRing:
+    # fixed slots of one frame each in shared memory. the producer fills a free
+    # slot and hands its index to the consumer, which hands it back once the
+    # frame is encoded. only slot indices cross the pipe, never pixels
+    def __init__(
+        self,
+        shm: shared_memory.SharedMemory,
+        shape: tuple[int, ...],
+        slots: int,
+        owner: bool,
+    ) -> None:
+        self.shm = shm
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.owner = owner
+        self.closed = False
+        self.frames = np.ndarray((slots, *self.shape), np.uint8, buffer=shm.buf)
+
+        # producer side, the semaphore counts the slots in free
+        self._free = deque(range(slots))
+        self._available = threading.Semaphore(slots)
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @classmethod
+    def create(cls, shape: tuple[int, ...], slots: int) -> FrameRing:
+        size = slots * int(np.prod(shape))
+        return cls(create_shared_memory(size), shape, slots, True)
+
+    @classmethod
+    def attach(cls, name: str, shape: tuple[int, ...], slots: int) -> FrameRing:
+        return cls(attach_shared_memory(name), shape, slots, False)
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[int]:
+        # None when no slot was handed back within timeout
+        if not self._available.acquire(timeout=timeout):
+            return None
+        with self._lock:
+            return self._free.popleft()
+
+    def release(self, slot: int) -> None:
+        with self._lock:
+            self._free.append(slot)
+        self._available.release()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        # the views have to go before the mapping can be closed
+        del self.frames
+        try:
+            self.shm.close()
+        except BufferError:
+            # a frame is still referenced, the mapping goes with it
+            pass
+        if self.owner:
+            self.shm.unlink()
+
+
+class RingReader:
+    # consumer side of a FrameRing, yields frames in the order they were handed
+    # over and measures how long each handoff took
+    def __init__(self, ring: FrameRing, cancelled: threading.Event) -> None:
+        self.ring = ring
+        self.cancelled = cancelled
+        self.queue: queue.Queue = queue.Queue()
+        self.handoff: list[float] = []
+
+    def put(self, slot: int, frame_number: int, sent: float) -> None:
+        self.queue.put((slot, frame_number, sent))
+
+    def end(self) -> None:
+        self.queue.put(None)
+
+    def __iter__(self) -> Iterator[tuple[int, np.ndarray, Any]]:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                if self.cancelled.is_set():
+                    raise Cancelled()
+                return
+
+            slot, frame_number, sent = item
+            # perf_counter is system wide on every platform maya runs on
+            self.handoff.append(time.perf_counter() - sent)
+            yield frame_number, self.ring.frames[slot], slot
+
+    def stats(self) -> dict[str, float]:
+        if not self.handoff:
+            return {"frames": 0, "mean_ms": 0.0, "max_ms": 0.0}
+        return {
+            "frames": len(self.handoff),
+            "mean_ms": sum(self.handoff) * 1000 / len(self.handoff),
+            "max_ms": max(self.handoff) * 1000,
+        }
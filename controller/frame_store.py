@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import os
+import struct
+from pathlib import Path
+from typing import Iterator, Optional
+
+from ghettoblaster.controller.frame_io import frame_number, read_frame
+from ghettoblaster.controller.lazy import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+STORE_SUFFIX = ".gbfs"
+
+
+class FrameStoreError(Exception):
+    pass
+
+
+class FrameStore:
+    # <magic><version><width><height><channels><first frame><capacity>
+    MAGIC = b"GBFS"
+    VERSION = 1
+    HEADER = struct.Struct("<4sIIIIqI")
+    HEADER_SIZE = 64
+    # per slot: 1 if the frame has been written
+    INDEX_DTYPE = "u1"
+    ALIGN = 4096
+
+    def __init__(
+        self,
+        path: Path,
+        width: int,
+        height: int,
+        first_frame: int,
+        capacity: int,
+        channels: int = 3,
+        mode: str = "r",
+    ) -> None:
+        self.path = Path(path)
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.first_frame = first_frame
+        self.capacity = capacity
+        self.frame_shape = (height, width, channels)
+        self.frame_bytes = height * width * channels
+
+        index_end = self.HEADER_SIZE + capacity
+        self.data_offset = (index_end + self.ALIGN - 1) // self.ALIGN * self.ALIGN
+
+        self.index = np.memmap(
+            self.path,
+            self.INDEX_DTYPE,
+            "r" if mode == "r" else "r+",
+            offset=self.HEADER_SIZE,
+            shape=(capacity,),
+        )
+        # readers open "r", every page they touch stays shared with the page
+        # cache. burn-ins are drawn into a copy, see iter_frames
+        self.data = np.memmap(
+            self.path,
+            np.uint8,
+            mode,
+            offset=self.data_offset,
+            shape=(capacity, *self.frame_shape),
+        )
+
+    @classmethod
+    def create(
+        cls,
+        path: Path,
+        width: int,
+        height: int,
+        first_frame: int,
+        last_frame: int,
+        channels: int = 3,
+    ) -> FrameStore:
+        path = Path(path)
+        capacity = last_frame - first_frame + 1
+        if capacity <= 0:
+            raise FrameStoreError(f"Invalid frame range {first_frame}-{last_frame}")
+
+        header = cls.HEADER.pack(
+            cls.MAGIC, cls.VERSION, width, height, channels, first_frame, capacity
+        )
+        index_end = cls.HEADER_SIZE + capacity
+        data_offset = (index_end + cls.ALIGN - 1) // cls.ALIGN * cls.ALIGN
+        size = data_offset + capacity * width * height * channels
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(header.ljust(cls.HEADER_SIZE, b"\0"))
+            # sparse on most filesystems, frame pages are allocated when written
+            f.truncate(size)
+
+        return cls(path, width, height, first_frame, capacity, channels, "r+")
+
+    @classmethod
+    def open(cls, path: Path, mode: str = "r") -> FrameStore:
+        with open(path, "rb") as f:
+            raw = f.read(cls.HEADER.size)
+        if len(raw) < cls.HEADER.size:
+            raise FrameStoreError(f"{path} is too small to be a frame store")
+
+        magic, version, width, height, channels, first, capacity = cls.HEADER.unpack(
+            raw
+        )
+        if magic != cls.MAGIC:
+            raise FrameStoreError(f"{path} is not a frame store")
+        if version != cls.VERSION:
+            raise FrameStoreError(f"Unsupported frame store version {version}")
+
+        return cls(path, width, height, first, capacity, channels, mode)
+
+    @property
+    def last_frame(self) -> int:
+        return self.first_frame + self.capacity - 1
+
+    def slot(self, frame_number: int) -> int:
+        slot = frame_number - self.first_frame
+        if not 0 <= slot < self.capacity:
+            raise FrameStoreError(
+                f"Frame {frame_number} is outside {self.first_frame}-{self.last_frame}"
+            )
+        return slot
+
+    def write(self, frame_number: int, frame: np.ndarray) -> None:
+        if frame.shape != self.frame_shape:
+            raise FrameStoreError(
+                f"Frame {frame_number} has shape {frame.shape}, "
+                f"expected {self.frame_shape}"
+            )
+        slot = self.slot(frame_number)
+        self.data[slot] = frame
+        self.index[slot] = 1
+
+    def discard(self, frame_number: int) -> None:
+        # the frame is captured again the next time the store is filled
+        self.index[self.slot(frame_number)] = 0
+
+    def has(self, frame_number: int) -> bool:
+        return bool(self.index[self.slot(frame_number)])
+
+    def read(self, frame_number: int) -> Optional[np.ndarray]:
+        # a view into the mapping, pages are only read when touched
+        slot = self.slot(frame_number)
+        if not self.index[slot]:
+            return None
+        return self.data[slot]
+
+    def frames(self) -> list[int]:
+        return [int(i) + self.first_frame for i in np.flatnonzero(self.index)]
+
+    def missing(self) -> list[int]:
+        return [int(i) + self.first_frame for i in np.flatnonzero(self.index == 0)]
+
+    def iter_frames(
+        self,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        copy: bool = False,
+    ) -> Iterator[tuple[int, np.ndarray]]:
+        # copies go into one reused buffer that may be drawn on, memory stays
+        # at one frame however many frames are read
+        buffer = np.empty(self.frame_shape, np.uint8) if copy else None
+        start = self.first_frame if start is None else max(start, self.first_frame)
+        end = self.last_frame if end is None else min(end, self.last_frame)
+        for number in range(start, end + 1):
+            frame = self.read(number)
+            if frame is None:
+                continue
+            if buffer is not None:
+                np.copyto(buffer, frame)
+                frame = buffer
+            yield number, frame
+
+    def flush(self) -> None:
+        if self.data.mode == "r+":
+            self.data.flush()
+            self.index.flush()
+
+    def close(self) -> None:
+        self.flush()
+        # drop the mappings so the file can be deleted on windows
+        del self.data
+        del self.index
+
+    def unlink(self) -> None:
+        self.close()
+        os.remove(self.path)
+
+
+def store_path(filename: str) -> Path:
+    return Path(f"{filename}{STORE_SUFFIX}")
+
+
+def ingest_frames(store: FrameStore, files: list[Path]) -> int:
+    # packs a captured sequence into the store and removes the loose files
+    count = 0
+    size = (store.width, store.height)
+    for file in files:
+        frame = read_frame(file)
+        if frame is None:
+            continue
+        if frame.shape[:2] != (store.height, store.width):
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+        store.write(frame_number(file), frame)
+        file.unlink()
+        count += 1
+
+    return count
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import os
+import socket
+import sqlite3
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple, Optional
+
+from ghettoblaster.controller.lazy import lazy_import
+from ghettoblaster.controller.logger import Logger
+from ghettoblaster.controller.paths import user_data_dir
+
+if TYPE_CHECKING:
+    from ghettoblaster.controller.playblast import Playblast
+
+np = lazy_import("numpy")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS layers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    time REAL NOT NULL,
+    host TEXT NOT NULL,
+    scene TEXT NOT NULL,
+    scene_mb REAL NOT NULL,
+    layer TEXT NOT NULL,
+    render_layer TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    frames INTEGER NOT NULL,
+    image_format TEXT NOT NULL,
+    frame_store INTEGER NOT NULL,
+    outputs INTEGER NOT NULL,
+    burn_ins INTEGER NOT NULL,
+    capture_s REAL NOT NULL,
+    encode_s REAL NOT NULL,
+    total_s REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS layers_time ON layers (time);
+"""
+
+
+def default_history_path() -> Path:
+    env = os.environ.get("GHETTOBLASTER_HISTORY")
+    if env:
+        return Path(env)
+    return user_data_dir() / "history.sqlite"
+
+
+class LayerMetrics(NamedTuple):
+    time: float
+    host: str
+    scene: str
+    scene_mb: float
+    layer: str
+    render_layer: str
+    width: int
+    height: int
+    frames: int
+    image_format: str
+    frame_store: bool
+    outputs: int
+    burn_ins: int
+    capture_s: float
+    encode_s: float
+    total_s: float
+
+    @classmethod
+    def from_playblast(
+        cls,
+        pb: Playblast,
+        scene: str,
+        scene_mb: float,
+        capture_s: float,
+        encode_s: float,
+        total_s: float,
+    ) -> LayerMetrics:
+        return cls(
+            time.time(),
+            socket.gethostname(),
+            scene,
+            scene_mb,
+            pb.name,
+            pb.render_layer,
+            pb.width,
+            pb.height,
+            max(0, pb.end_frame - pb.start_frame + 1),
+            pb.image_format,
+            pb.frame_store,
+            output_count(pb),
+            len(pb.burn_ins),
+            capture_s,
+            encode_s,
+            total_s,
+        )
+
+
+def output_count(pb: Playblast) -> int:
+    return int(pb.create_video) + len(pb.outputs)
+
+
+class HistoryStore:
+    TIMEOUT = 30.0
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = Path(path or default_history_path())
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(
+            str(self.path), timeout=self.TIMEOUT, isolation_level=None
+        )
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        # fitted once and refitted after new timings, a store lives for the
+        # whole ui session and every batch asks for the model
+        self.fitted: Optional[CostModel] = None
+
+    def record(self, metrics: list[LayerMetrics]) -> None:
+        columns = ", ".join(LayerMetrics._fields)
+        values = ", ".join("?" for _ in LayerMetrics._fields)
+        with self.db:
+            self.db.executemany(
+                f"INSERT INTO layers ({columns}) VALUES ({values})", metrics
+            )
+        self.fitted = None
+
+    def model(self) -> CostModel:
+        if self.fitted is None:
+            self.fitted = CostModel.from_history(self)
+        return self.fitted
+
+    def recent(self, limit: int = 500) -> list[LayerMetrics]:
+        columns = ", ".join(LayerMetrics._fields)
+        rows = self.db.execute(
+            f"SELECT {columns} FROM layers ORDER BY time DESC LIMIT ?", (limit,)
+        )
+        return [LayerMetrics(*row) for row in rows]
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class Estimate(NamedTuple):
+    capture_s: float
+    encode_s: float
+
+    @property
+    def total_s(self) -> float:
+        return self.capture_s + self.encode_s
+
+
+class CostModel:
+    # seconds per frame, fitted as a linear function of the features below.
+    # the defaults are rough HD numbers used until there is history to fit
+    DEFAULT_CAPTURE = (0.02, 0.02, 0.0)
+    DEFAULT_ENCODE = (0.005, 0.01, 0.005)
+    # fewer samples than this per group falls back to the wider fit
+    MIN_SAMPLES = 5
+
+    def __init__(self, history: list[LayerMetrics]) -> None:
+        history = [m for m in history if m.frames > 0]
+        self.samples = len(history)
+        self.capture = self.fit(
+            history, capture_features, "capture_s", self.DEFAULT_CAPTURE
+        )
+        self.encode = self.fit(
+            history, encode_features, "encode_s", self.DEFAULT_ENCODE
+        )
+        # capture cost differs a lot between intermediate formats
+        self.capture_by_format = {
+            fmt: self.fit(
+                [m for m in history if m.image_format == fmt],
+                capture_features,
+                "capture_s",
+                self.capture,
+            )
+            for fmt in {m.image_format for m in history}
+        }
+
+    @classmethod
+    def from_history(cls, store: HistoryStore, limit: int = 500) -> CostModel:
+        try:
+            return cls(store.recent(limit))
+        except sqlite3.Error as e:
+            Logger.warning(f"Could not read playblast history {store.path}: {e}")
+            return cls([])
+
+    @classmethod
+    def fit(
+        cls,
+        history: list[LayerMetrics],
+        features,
+        target: str,
+        fallback: tuple[float, ...],
+    ) -> tuple[float, ...]:
+        if len(history) < cls.MIN_SAMPLES:
+            return tuple(fallback)
+
+        x = np.array([features(m) for m in history], dtype=np.float64)
+        y = np.array([getattr(m, target) / m.frames for m in history])
+        coefficients, *_ = np.linalg.lstsq(x, y, rcond=None)
+        # negative coefficients only come from noise, never predict below zero
+        return tuple(float(c) for c in np.maximum(coefficients, 0.0))
+
+    def predict(self, pb: Playblast, scene_mb: float = 0.0) -> Estimate:
+        frames = max(0, pb.end_frame - pb.start_frame + 1)
+        capture = self.capture_by_format.get(pb.image_format, self.capture)
+        encode = self.encode if pb.create_video or pb.outputs else (0.0,) * 3
+        metrics = LayerMetrics.from_playblast(pb, "", scene_mb, 0.0, 0.0, 0.0)
+        return Estimate(
+            frames * _dot(capture, capture_features(metrics)),
+            frames * _dot(encode, encode_features(metrics)),
+        )
+
+
+def megapixels(m: LayerMetrics) -> float:
+    return m.width * m.height / 1e6
+
+
+def capture_features(m: LayerMetrics) -> tuple[float, float, float]:
+    # per frame: fixed viewport cost, pixels written, scene complexity
+    return 1.0, megapixels(m), m.scene_mb / 100
+
+
+def encode_features(m: LayerMetrics) -> tuple[float, float, float]:
+    # per frame: fixed cost, decode, every extra output and burn-in pass
+    mp = megapixels(m)
+    return 1.0, mp, mp * (max(0, m.outputs - 1) + m.burn_ins)
+
+
+def _dot(a: tuple[float, ...], b: tuple[float, ...]) -> float:
+    return sum(x * y for x, y in zip(a, b))
@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator, NamedTuple, Optional
+
+from ghettoblaster.controller.history import CostModel, HistoryStore
+from ghettoblaster.controller.logger import Logger
+from ghettoblaster.controller.playblast import Playblast
+from ghettoblaster.controller.scheduler import pick_job, predict_job
+
+JOB_STATES = ("queued", "running", "done", "failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scene TEXT NOT NULL,
+    config TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    worker TEXT,
+    error TEXT,
+    frames INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    deadline REAL,
+    predicted REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id);
+"""
+# columns added after the first release, appended to older queue files
+ADDED_COLUMNS = {
+    "priority": "INTEGER NOT NULL DEFAULT 0",
+    "deadline": "REAL",
+    "predicted": "REAL NOT NULL DEFAULT 0",
+}
+
+
+class Job(NamedTuple):
+    id: int
+    scene: str
+    config: str
+    state: str
+    attempts: int
+    max_attempts: int
+    worker: Optional[str]
+    error: Optional[str]
+    frames: int
+    created: float
+    started: Optional[float]
+    finished: Optional[float]
+    priority: int = 0
+    # unix time, None for no deadline
+    deadline: Optional[float] = None
+    # seconds predicted by the cost model when the job was queued
+    predicted: float = 0.0
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+    def playblasts(self) -> list[Playblast]:
+        # same layout as the config files saved from the ui
+        data = json.loads(self.config)
+        return [Playblast.deserialize(p) for p in data["playblasts"]]
+
+
+class JobQueue:
+    # every call is its own transaction, several worker processes share the file
+    TIMEOUT = 30.0
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(
+            str(self.path), timeout=self.TIMEOUT, isolation_level=None
+        )
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.migrate()
+
+    def migrate(self) -> None:
+        columns = {row["name"] for row in self.db.execute("PRAGMA table_info(jobs)")}
+        for name, declaration in ADDED_COLUMNS.items():
+            if name not in columns:
+                self.db.execute(f"ALTER TABLE jobs ADD COLUMN {name} {declaration}")
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        # IMMEDIATE takes the write lock up front so two workers can never
+        # claim the same job
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.db
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    def add(
+        self,
+        scene: str,
+        playblasts: list[Playblast],
+        max_attempts: int = 3,
+        priority: int = 0,
+        deadline: Optional[float] = None,
+        predicted: float = 0.0,
+    ) -> int:
+        config = json.dumps({"playblasts": [p.serialize() for p in playblasts]})
+        with self.transaction() as db:
+            cursor = db.execute(
+                "INSERT INTO jobs (scene, config, max_attempts, created, priority, "
+                "deadline, predicted) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    str(scene),
+                    config,
+                    max_attempts,
+                    time.time(),
+                    priority,
+                    deadline,
+                    predicted,
+                ),
+            )
+        return cursor.lastrowid
+
+    def claim(self, worker: str, workers: int = 1) -> Optional[Job]:
+        # workers is the size of the pool, see scheduler.pick_job
+        with self.transaction() as db:
+            queued = [
+                Job(*row)
+                for row in db.execute("SELECT * FROM jobs WHERE state = 'queued'")
+            ]
+            if not queued:
+                return None
+
+            job = pick_job(queued, workers, time.time())
+            db.execute(
+                "UPDATE jobs SET state = 'running', worker = ?, started = ?, "
+                "finished = NULL, attempts = attempts + 1 WHERE id = ?",
+                (worker, time.time(), job.id),
+            )
+        return self.get(job.id)
+
+    def complete(self, job_id: int, frames: int) -> None:
+        with self.transaction() as db:
+            db.execute(
+                "UPDATE jobs SET state = 'done', frames = ?, error = NULL, "
+                "finished = ? WHERE id = ?",
+                (frames, time.time(), job_id),
+            )
+
+    def fail(self, job_id: int, error: str) -> str:
+        # failed jobs go back to the queue until they run out of attempts
+        with self.transaction() as db:
+            db.execute(
+                "UPDATE jobs SET error = ?, finished = ?, state = CASE "
+                "WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END "
+                "WHERE id = ?",
+                (error, time.time(), job_id),
+            )
+        return self.get(job_id).state
+
+    def release(self, worker: Optional[str] = None) -> int:
+        # jobs left running by a worker that died, all of them without a worker
+        query = "SELECT id FROM jobs WHERE state = 'running'"
+        params: tuple[Any, ...] = ()
+        if worker is not None:
+            query += " AND worker = ?"
+            params = (worker,)
+
+        ids = [row["id"] for row in self.db.execute(query, params)]
+        for job_id in ids:
+            self.fail(job_id, f"worker {worker or 'unknown'} exited")
+        return len(ids)
+
+    def retry_failed(self) -> int:
+        with self.transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET state = 'queued', attempts = 0 "
+                "WHERE state = 'failed'"
+            )
+        return cursor.rowcount
+
+    def get(self, job_id: int) -> Job:
+        row = self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job(*row)
+
+    def jobs(self, state: Optional[str] = None) -> list[Job]:
+        if state is None:
+            rows = self.db.execute("SELECT * FROM jobs ORDER BY id")
+        else:
+            rows = self.db.execute(
+                "SELECT * FROM jobs WHERE state = ? ORDER BY id", (state,)
+            )
+        return [Job(*row) for row in rows]
+
+    def counts(self) -> dict[str, int]:
+        counts = dict.fromkeys(JOB_STATES, 0)
+        for row in self.db.execute(
+            "SELECT state, COUNT(*) AS n FROM jobs GROUP BY state"
+        ):
+            counts[row["state"]] = row["n"]
+        return counts
+
+    def report(self, since: float = 0.0) -> dict[str, Any]:
+        # throughput across every shot that finished after since
+        finished = [
+            j
+            for j in self.jobs()
+            if j.finished is not None and j.finished >= since and j.state != "queued"
+        ]
+        done = [j for j in finished if j.state == "done"]
+        frames = sum(j.frames for j in done)
+        wall = (
+            max(j.finished for j in finished) - min(j.started for j in finished)
+            if finished
+            else 0.0
+        )
+        return {
+            "shots": len(done),
+            "failed": len(finished) - len(done),
+            "frames": frames,
+            "wall_s": wall,
+            "shots_per_min": len(done) * 60 / wall if wall else 0.0,
+            "frames_per_s": frames / wall if wall else 0.0,
+        }
+
+    def close(self) -> None:
+        self.db.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="ghettoblaster.controller.job_queue")
+    parser.add_argument("--db", type=Path, required=True)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="queue a saved config for scenes")
+    add.add_argument("--config", type=Path, required=True)
+    add.add_argument("--max-attempts", type=int, default=3)
+    add.add_argument("--priority", type=int, default=0, help="higher runs first")
+    add.add_argument(
+        "--deadline", type=datetime.fromisoformat, help="e.g. 2024-05-17T18:00"
+    )
+    add.add_argument("scenes", nargs="+")
+
+    run = commands.add_parser("run", help="work the queue with mayapy workers")
+    run.add_argument("--workers", type=int, default=2)
+    run.add_argument("--mayapy")
+
+    commands.add_parser("status")
+    commands.add_parser("retry", help="requeue failed jobs")
+    args = parser.parse_args()
+
+    queue = JobQueue(args.db)
+    if args.command == "add":
+        with open(args.config, "r") as f:
+            data = json.load(f)
+        playblasts = [Playblast.deserialize(p) for p in data["playblasts"]]
+        deadline = args.deadline.timestamp() if args.deadline else None
+        model = CostModel.from_history(HistoryStore())
+        for scene in args.scenes:
+            predicted = predict_job(model, scene, playblasts)
+            job_id = queue.add(
+                scene,
+                playblasts,
+                args.max_attempts,
+                args.priority,
+                deadline,
+                predicted,
+            )
+            Logger.info(f"Queued job {job_id} for {scene}, predicted {predicted:.0f}s")
+
+    elif args.command == "run":
+        from ghettoblaster.controller.queue_worker import WorkerPool
+
+        pool = WorkerPool(args.db, args.workers, args.mayapy)
+        report = pool.run()
+        return 1 if report["failed"] else 0
+
+    elif args.command == "retry":
+        Logger.info(f"Requeued {queue.retry_failed()} failed job(s)")
+
+    for job in queue.jobs():
+        duration = f"{job.duration:.1f}s" if job.duration is not None else "-"
+        print(
+            f"{job.id:>5}  {job.state:<8} {job.attempts}/{job.max_attempts}  "
+            f"p{job.priority:<3} {job.predicted:>7.0f}s {duration:>8}  "
+            f"{job.scene}  {job.error or ''}"
+        )
+    print(", ".join(f"{k}: {v}" for k, v in queue.counts().items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
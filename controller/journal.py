@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional
+
+from ghettoblaster.controller.logger import Logger
+from ghettoblaster.controller.paths import user_data_dir
+
+if TYPE_CHECKING:
+    from ghettoblaster.controller.playblast import Playblast
+
+
+def default_journal_dir() -> Path:
+    env = os.environ.get("GHETTOBLASTER_JOURNALS")
+    if env:
+        return Path(env)
+    return user_data_dir() / "journals"
+
+
+def layer_key(pb: Playblast) -> str:
+    # a layer whose settings changed since the interrupted batch starts over
+    data = json.dumps(pb.serialize(), sort_keys=True)
+    return hashlib.sha1(data.encode()).hexdigest()[:16]
+
+
+def frame_ranges(frames: list[int], chunk: int) -> list[tuple[int, int]]:
+    # consecutive runs of frames, split so no range is longer than chunk
+    ranges: list[tuple[int, int]] = []
+    for frame in sorted(frames):
+        if ranges:
+            start, end = ranges[-1]
+            if frame == end + 1 and frame - start < chunk:
+                ranges[-1] = (start, frame)
+                continue
+        ranges.append((frame, frame))
+    return ranges
+
+
+@dataclass
+class LayerState:
+    # capture target, differs from the layer for scratch layers
+    target: Optional[str] = None
+    captured: set[int] = field(default_factory=set)
+    encoded: Optional[int] = None
+    done: bool = False
+
+
+class BatchJournal:
+    # append only, one json record per line, synced after every record so a
+    # crash loses at most the record being written
+    def __init__(self, path: Path, scene: str, scene_mtime: float) -> None:
+        self.path = Path(path)
+        self.scene = scene
+        self.scene_mtime = scene_mtime
+        self.layers: dict[str, LayerState] = {}
+        self._file = None
+        # capture records come from the main thread, encodes from the encode thread
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, folder: Path, scene: str, modified: bool = False) -> BatchJournal:
+        # one journal per scene, resumed while the scene file is unchanged and
+        # has no unsaved edits the interrupted batch may not have seen
+        digest = hashlib.sha1(os.path.abspath(scene).encode()).hexdigest()[:16]
+        path = Path(folder) / f"{Path(scene).stem}_{digest}.jsonl"
+        mtime = os.path.getmtime(scene) if os.path.isfile(scene) else 0.0
+        journal = cls(path, scene, mtime)
+
+        records = journal.read()
+        if records and records[0].get("scene_mtime") == mtime and not modified:
+            for record in records[1:]:
+                journal.apply(record)
+            return journal
+
+        if records and modified:
+            Logger.info(f"{scene} has unsaved changes, starting the batch over")
+        elif records:
+            Logger.info(f"{scene} changed since the interrupted batch, starting over")
+        path.unlink(missing_ok=True)
+        journal.write({"event": "batch", "scene": scene, "scene_mtime": mtime})
+        return journal
+
+    @property
+    def resumed(self) -> bool:
+        return bool(self.layers)
+
+    def read(self) -> list[dict[str, Any]]:
+        records = []
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # the last line of a crashed batch can be cut off
+                        break
+        except FileNotFoundError:
+            pass
+        return records
+
+    def apply(self, record: dict[str, Any]) -> None:
+        state = self.layer(record["layer"])
+        event = record["event"]
+        if event == "started":
+            if state.target != record["target"]:
+                # a new scratch folder, nothing captured so far is in it
+                state.captured = set()
+                state.encoded = None
+            state.target = record["target"]
+        elif event == "captured":
+            state.captured.update(range(record["start"], record["end"] + 1))
+        elif event == "encoded":
+            state.encoded = record["frames"]
+        elif event == "done":
+            state.done = True
+
+    def layer(self, key: str) -> LayerState:
+        return self.layers.setdefault(key, LayerState())
+
+    def write(self, record: dict[str, Any]) -> None:
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a")
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def record(self, event: str, key: str, **data: Any) -> None:
+        record = {"event": event, "layer": key, **data}
+        with self._lock:
+            self.apply(record)
+            self.write(record)
+
+    def started(self, key: str, target: str) -> None:
+        self.record("started", key, target=target)
+
+    def captured(self, key: str, start: int, end: int) -> None:
+        self.record("captured", key, start=start, end=end)
+
+    def encoded(self, key: str, frames: int) -> None:
+        self.record("encoded", key, frames=frames)
+
+    def done(self, key: str) -> None:
+        self.record("done", key)
+
+    def complete(self, keys: list[str]) -> bool:
+        return all(key in self.layers and self.layers[key].done for key in keys)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def finish(self) -> None:
+        # a completed batch is rendered from scratch next time
+        self.close()
+        self.path.unlink(missing_ok=True)
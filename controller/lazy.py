@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import importlib.util
+import sys
+import threading
+from types import ModuleType
+
+_lock = threading.Lock()
+
+
+def lazy_import(name: str) -> ModuleType:
+    # the module is executed on first attribute access, which keeps cv2 and
+    # numpy off the startup path of the ui until something is encoded
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def preload(*names: str) -> None:
+    # LazyLoader isn't thread safe before python 3.12, a module first touched
+    # by two threads at once can be executed twice or seen half loaded. load
+    # on one thread before work is handed to others
+    with _lock:
+        for name in names:
+            getattr(lazy_import(name), "__file__", None)
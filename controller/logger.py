@@ -1,17 +1,144 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
 import socket
 import sys
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+FRAME = 5
+logging.addLevelName(FRAME, "FRAME")
+
+
+class DailyRotatingFileHandler(logging.handlers.BaseRotatingHandler):
+    """Writes to <folder>/<date><suffix>, switching file at midnight and
+    rolling over to <date>.<n><suffix> once a file exceeds max_bytes."""
+
+    def __init__(
+        self,
+        folder,
+        suffix: str = ".log",
+        max_bytes: int = 0,
+        backup_days: int = 0,
+    ) -> None:
+        self.folder = Path(folder)
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self.backup_days = backup_days
+        self.day = date.today()
+        self.folder.mkdir(parents=True, exist_ok=True)
+        super().__init__(str(self._day_path(self.day)), "a", "utf-8", delay=True)
+
+    def _day_path(self, day: date, index: int = 0) -> Path:
+        if index:
+            return self.folder / f"{day}.{index}{self.suffix}"
+        return self.folder / f"{day}{self.suffix}"
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if date.fromtimestamp(record.created) != self.day:
+            return True
+        if not self.max_bytes:
+            return False
+
+        if self.stream is None:
+            self.stream = self._open()
+        msg = f"{self.format(record)}\n"
+        return self.stream.tell() + len(msg) >= self.max_bytes
+
+    def doRollover(self) -> None:
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        today = date.today()
+        if today != self.day:
+            self.day = today
+            self.baseFilename = os.path.abspath(self._day_path(today))
+            self.prune()
+            return
+
+        index = 1
+        while self._day_path(today, index).exists():
+            index += 1
+        os.replace(self.baseFilename, self._day_path(today, index))
+
+    def prune(self) -> None:
+        if not self.backup_days:
+            return
+
+        cutoff = datetime.now() - timedelta(days=self.backup_days)
+        for file in self.folder.glob(f"*{self.suffix}"):
+            try:
+                if datetime.fromtimestamp(file.stat().st_mtime) < cutoff:
+                    file.unlink()
+            except OSError:
+                continue
+
+
+class Span:
+    __slots__ = ("name", "id", "parent", "attrs", "start", "duration", "status")
+
+    def __init__(self, name: str, parent: Optional[str], attrs: dict) -> None:
+        self.name = name
+        self.id = uuid.uuid4().hex[:12]
+        self.parent = parent
+        self.attrs = attrs
+        self.start = time.time()
+        self.duration = 0.0
+        self.status = "ok"
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def to_json(self) -> str:
+        data = {
+            "span": self.name,
+            "id": self.id,
+            "parent": self.parent,
+            "start": round(self.start, 6),
+            "duration": round(self.duration, 6),
+            "status": self.status,
+            "host": Logger.HOSTNAME,
+        }
+        data.update(self.attrs)
+        return json.dumps(data, default=str)
+
+
+_span_stack: ContextVar[tuple[Span, ...]] = ContextVar("_span_stack", default=())
 
 
 class Logger:
     LOGGER_NAME = "ghettoblaster"
+    SPAN_LOGGER_NAME = "ghettoblaster.spans"
+    SPAN_SUFFIX = ".spans.jsonl"
+    HOSTNAME = socket.gethostname()
 
     FORMAT_DEFAULT = "[%(name)s][%(levelname)s] %(message)s"
 
     LEVEL_DEFAULT = logging.DEBUG
     PROPAGATE_DEFAULT = True
 
+    MAX_BYTES_DEFAULT = 10 * 1024 * 1024
+    BACKUP_DAYS_DEFAULT = 30
+
+    # checked by hot loops before building per-frame messages
+    FRAME_ENABLED = False
+
     _logger_obj = None
+    _span_logger_obj = None
+    _span_observers: list[Callable[[str, Span], None]] = []
+
+    # handler I/O happens on one QueueListener thread per logger
+    _listeners: dict[str, logging.handlers.QueueListener] = {}
+    _handlers: dict[str, list[logging.Handler]] = {}
 
     @classmethod
     def logger_obj(cls):
@@ -28,18 +155,70 @@ class Logger:
 
                 stream_handler = logging.StreamHandler(sys.stdout)
                 stream_handler.setFormatter(fmt)
-                cls._logger_obj.addHandler(stream_handler)
+                cls.add_handler(cls._logger_obj, stream_handler)
 
         return cls._logger_obj
 
+    @classmethod
+    def span_logger_obj(cls):
+        if not cls._span_logger_obj:
+            cls._span_logger_obj = logging.getLogger(cls.SPAN_LOGGER_NAME)
+            cls._span_logger_obj.setLevel(logging.INFO)
+            cls._span_logger_obj.propagate = False
+
+        return cls._span_logger_obj
+
     @classmethod
     def logger_exists(cls):
-        return cls.LOGGER_NAME in logging.Logger.manager.loggerDict.keys()
+        # creating the span logger first leaves a PlaceHolder under our name
+        existing = logging.Logger.manager.loggerDict.get(cls.LOGGER_NAME)
+        return isinstance(existing, logging.Logger)
+
+    @classmethod
+    def add_handler(cls, lg: logging.Logger, handler: logging.Handler) -> None:
+        handlers = cls._handlers.setdefault(lg.name, [])
+        handlers.append(handler)
+
+        listener = cls._listeners.get(lg.name)
+        if listener:
+            # QueueListener handlers are fixed, restart with the new set
+            listener.stop()
+            log_queue = listener.queue
+        else:
+            log_queue = queue.SimpleQueue()
+            lg.addHandler(logging.handlers.QueueHandler(log_queue))
+
+        listener = logging.handlers.QueueListener(
+            log_queue, *handlers, respect_handler_level=True
+        )
+        listener.start()
+        cls._listeners[lg.name] = listener
+
+    @classmethod
+    def handlers(cls, lg: logging.Logger) -> list[logging.Handler]:
+        return list(cls._handlers.get(lg.name, ()))
+
+    @classmethod
+    def flush(cls) -> None:
+        for listener in cls._listeners.values():
+            listener.stop()
+            listener.start()
+
+    @classmethod
+    def shutdown(cls) -> None:
+        for listener in cls._listeners.values():
+            listener.stop()
+        for handlers in cls._handlers.values():
+            for handler in handlers:
+                handler.close()
+
+        cls._listeners.clear()
 
     @classmethod
     def set_level(cls, level):
         lg = cls.logger_obj()
         lg.setLevel(level)
+        cls.FRAME_ENABLED = lg.isEnabledFor(FRAME)
 
     @classmethod
     def set_propagate(cls, propagate):
@@ -51,6 +230,13 @@ class Logger:
         lg = cls.logger_obj()
         lg.debug(msg, *args, **kwargs)
 
+    @classmethod
+    def frame(cls, msg, *args, **kwargs):
+        if not cls.FRAME_ENABLED:
+            return
+        lg = cls.logger_obj()
+        lg.log(FRAME, msg, *args, **kwargs)
+
     @classmethod
     def info(cls, msg, *args, **kwargs):
         lg = cls.logger_obj()
@@ -82,11 +268,60 @@ class Logger:
         lg.exception(msg, *args, **kwargs)
 
     @classmethod
-    def write_to_file(cls, path, level=logging.INFO):
+    @contextmanager
+    def span(cls, name: str, **attrs: Any) -> Iterator[Span]:
+        stack = _span_stack.get()
+        span = Span(name, stack[-1].id if stack else None, attrs)
+        token = _span_stack.set(stack + (span,))
+        for observer in cls._span_observers:
+            observer("start", span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException:
+            span.status = "error"
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            _span_stack.reset(token)
+            for observer in cls._span_observers:
+                observer("end", span)
+            cls._emit_span(span)
+
+    @classmethod
+    def add_span_observer(cls, observer: Callable[[str, Span], None]) -> None:
+        cls._span_observers.append(observer)
+
+    @classmethod
+    def remove_span_observer(cls, observer: Callable[[str, Span], None]) -> None:
+        if observer in cls._span_observers:
+            cls._span_observers.remove(observer)
+
+    @classmethod
+    def record_span(cls, name: str, duration: float, **attrs: Any) -> Span:
+        # for phases accumulated over many short intervals, e.g. per frame decode
+        stack = _span_stack.get()
+        span = Span(name, stack[-1].id if stack else None, attrs)
+        span.start -= duration
+        span.duration = duration
+        cls._emit_span(span)
+        return span
+
+    @classmethod
+    def _emit_span(cls, span: Span) -> None:
+        lg = cls.span_logger_obj()
+        if lg.handlers:
+            lg.info(span.to_json())
+
+    @classmethod
+    def write_to_file(
+        cls, path, level=logging.INFO, max_bytes=MAX_BYTES_DEFAULT, backup_count=5
+    ):
         lg = cls.logger_obj()
+        path = os.path.abspath(path)
 
         # Check if there is already a FileHandler with the same path
-        for handler in lg.handlers:
+        for handler in cls.handlers(lg):
             if (
                 isinstance(handler, logging.FileHandler)
                 and handler.baseFilename == path
@@ -94,13 +329,60 @@ class Logger:
                 return  # If the FileHandler already exists, exit the method
 
         # If no matching FileHandler is found, create and add one
-        file_handler = logging.FileHandler(path)
+        file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, delay=True
+        )
+        file_handler.setLevel(level)
+        file_handler.setFormatter(cls.file_formatter())
+        cls.add_handler(lg, file_handler)
+
+        # spans go to a JSON lines file next to the log
+        span_handler = logging.handlers.RotatingFileHandler(
+            str(Path(path).with_suffix(cls.SPAN_SUFFIX)),
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            delay=True,
+        )
+        span_handler.setFormatter(logging.Formatter("%(message)s"))
+        cls.add_handler(cls.span_logger_obj(), span_handler)
+
+    @classmethod
+    def write_to_folder(
+        cls,
+        folder,
+        level=logging.INFO,
+        max_bytes=MAX_BYTES_DEFAULT,
+        backup_days=BACKUP_DAYS_DEFAULT,
+    ):
+        lg = cls.logger_obj()
+        folder = Path(folder).resolve()
+
+        for handler in cls.handlers(lg):
+            if (
+                isinstance(handler, DailyRotatingFileHandler)
+                and handler.folder == folder
+            ):
+                return
+
+        file_handler = DailyRotatingFileHandler(folder, ".log", max_bytes, backup_days)
         file_handler.setLevel(level)
+        file_handler.setFormatter(cls.file_formatter())
+        file_handler.prune()
+        cls.add_handler(lg, file_handler)
+
+        span_handler = DailyRotatingFileHandler(
+            folder, cls.SPAN_SUFFIX, max_bytes, backup_days
+        )
+        span_handler.setFormatter(logging.Formatter("%(message)s"))
+        span_handler.prune()
+        cls.add_handler(cls.span_logger_obj(), span_handler)
 
-        hostname = socket.gethostname()
-        fmt = logging.Formatter(
-            fmt=f"[%(asctime)s][{hostname}][%(levelname)s] %(message)s",
+    @classmethod
+    def file_formatter(cls) -> logging.Formatter:
+        return logging.Formatter(
+            fmt=f"[%(asctime)s][{cls.HOSTNAME}][%(levelname)s] %(message)s",
             datefmt="%Y-%m-%d %H:%M",
         )
-        file_handler.setFormatter(fmt)
-        lg.addHandler(file_handler)
+
+
+atexit.register(Logger.shutdown)
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Callable, NamedTuple
 
 from maya import cmds
 
@@ -18,6 +19,20 @@ def get_scene_name() -> str:
     return path.stem
 
 
+def get_scene_path() -> str:
+    return cmds.file(query=True, sceneName=True)
+
+
+def is_scene_modified() -> bool:
+    return bool(cmds.file(query=True, modified=True))
+
+
+def get_scene_size() -> int:
+    # unsaved scenes have no file yet
+    path = Path(get_scene_path() or "")
+    return path.stat().st_size if path.is_file() else 0
+
+
 def get_active_camera() -> str:
     active_Editor = cmds.playblast(activeEditor=True)
     camera = cmds.modelEditor(active_Editor, query=True, camera=True)
@@ -50,7 +65,10 @@ def set_active_camera(camera_name: str):
 
 def get_frame_rate() -> float:
     frame_rate = cmds.currentUnit(query=True, time=True)
-    return TIME_CONVERSION[frame_rate]
+    if frame_rate in TIME_CONVERSION:
+        return TIME_CONVERSION[frame_rate]
+    # the other units spell the rate out, like 23.976fps or 29.97df
+    return float(frame_rate.rstrip("dfps"))
 
 
 def get_render_layers() -> list[str]:
@@ -65,30 +83,96 @@ def set_camera_overscan(camera: str, value: bool) -> None:
     cmds.setAttr(f"{camera}.displayResolution", value)
 
 
-def render_playblast(pb) -> None:
+def isolate_viewport() -> str:
     actView = cmds.playblast(activeEditor=True)
     cmds.modelEditor(actView, e=1, allObjects=False)
     cmds.modelEditor(actView, e=1, polymeshes=True)
     cmds.modelEditor(actView, e=1, particleInstancers=True)
-    cmds.modelEditor(actView, e=1, particleInstancers=True)
     cmds.modelEditor(actView, e=1, pluginShapes=True)
 
+    return actView
+
+
+def restore_viewport(actView: str) -> None:
+    cmds.modelEditor(actView, e=1, allObjects=True)
+
+
+class ViewState(NamedTuple):
+    panel: str
+    camera: str
+    render_layer: str
+    # mel that restores every display setting of the panel
+    display: str
+    overscan: dict[str, bool]
+    modified: bool
+
+
+def save_view_state(cameras: list[str]) -> ViewState:
+    panel = cmds.playblast(activeEditor=True)
+    return ViewState(
+        panel,
+        cmds.modelEditor(panel, query=True, camera=True),
+        get_activte_render_layer(),
+        cmds.modelEditor(panel, query=True, stateString=True) or "",
+        {c: bool(cmds.getAttr(f"{c}.displayResolution")) for c in cameras},
+        is_scene_modified(),
+    )
+
+
+def restore_view_state(state: ViewState) -> None:
+    cmds.modelEditor(state.panel, edit=True, camera=state.camera)
+    set_render_layer(state.render_layer)
+    if state.display:
+        from maya import mel
+
+        mel.eval(f'{{string $editorName = "{state.panel}"; {state.display}}}')
+    for camera, value in state.overscan.items():
+        set_camera_overscan(camera, value)
+    # switching layers and cameras doesn't change anything worth saving
+    if not state.modified:
+        cmds.file(modified=False)
+
+
+def capture_playblast(pb) -> None:
     cmds.playblast(
         startTime=pb.start_frame,
         endTime=pb.end_frame,
         filename=pb.filename,
         widthHeight=(pb.width, pb.height),
         format=pb.format,
-        compression="jpg",
+        compression=pb.image_format,
         offScreen=pb.offscreen,
         showOrnaments=pb.show_ornaments,
         viewer=False,
-        quality=100,
+        quality=pb.image_quality,
         percent=100,
         forceOverwrite=True,
     )
-    cmds.modelEditor(actView, e=1, allObjects=True)
+
+
+def render_playblast(pb) -> None:
+    actView = isolate_viewport()
+    capture_playblast(pb)
+    restore_viewport(actView)
+
+
+def open_scene(path: str) -> None:
+    cmds.file(path, open=True, force=True)
 
 
 def get_project_dir() -> str:
     return cmds.workspace(q=True, rootDirectory=True)
+
+
+def add_after_save_callback(callback: Callable[[], None]) -> int:
+    from maya.api import OpenMaya
+
+    return OpenMaya.MSceneMessage.addCallback(
+        OpenMaya.MSceneMessage.kAfterSave, lambda *_: callback()
+    )
+
+
+def remove_callback(callback_id: int) -> None:
+    from maya.api import OpenMaya
+
+    OpenMaya.MMessage.removeCallback(callback_id)
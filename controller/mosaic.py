@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import math
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from ghettoblaster.controller.burnin import draw_text
+from ghettoblaster.controller.frame_io import read_frame
+from ghettoblaster.controller.frame_store import FrameStore, store_path
+from ghettoblaster.controller.lazy import lazy_import
+from ghettoblaster.controller.logger import Logger
+from ghettoblaster.controller.pipeline import find_frames
+
+if TYPE_CHECKING:
+    from ghettoblaster.controller.playblast import Playblast
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+
+def read_sequence(files: list[Path]) -> Iterator[np.ndarray]:
+    for file in files:
+        frame = read_frame(file)
+        if frame is not None:
+            yield frame
+
+
+def read_video(path: Path) -> Iterator[np.ndarray]:
+    capture = cv2.VideoCapture(str(path))
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                return
+            yield frame
+    finally:
+        capture.release()
+
+
+def read_store(path: Path) -> Iterator[np.ndarray]:
+    # the mapping is closed once the frames ran out or the reader is closed,
+    # windows can't delete a store that is still mapped
+    store = FrameStore.open(path, "r")
+    try:
+        for _, frame in store.iter_frames():
+            yield frame
+    finally:
+        store.close()
+
+
+def layer_frames(pb: Playblast) -> Optional[Iterator[np.ndarray]]:
+    # prefer the frame store or image sequence, fall back to the encoded
+    # video once those have been deleted
+    store = store_path(pb.filename)
+    if pb.frame_store and store.exists():
+        return read_store(store)
+
+    files = find_frames(pb)
+    if files:
+        return read_sequence(files)
+
+    video = Path(f"{pb.filename}.mp4")
+    if video.exists():
+        return read_video(video)
+
+    return None
+
+
+def grid_shape(count: int, columns: int = 0) -> tuple[int, int]:
+    if columns <= 0:
+        columns = math.ceil(math.sqrt(count))
+    rows = math.ceil(count / columns)
+    return columns, rows
+
+
+class Mosaic:
+    LABEL_HEIGHT = 24
+
+    def __init__(
+        self,
+        playblasts: list[Playblast],
+        output: Path,
+        columns: int = 0,
+        labels: bool = True,
+    ) -> None:
+        self.playblasts = playblasts
+        self.output = Path(output)
+        self.columns, self.rows = grid_shape(len(playblasts), columns)
+
+        # the canvas keeps the first layer's width, tiles keep its aspect ratio
+        first = playblasts[0]
+        tw = first.width // self.columns // 2 * 2
+        th = round(tw * first.height / max(1, first.width)) // 2 * 2
+        self.tile_size = (tw, th)
+        self.size = (tw * self.columns, th * self.rows)
+
+        self.labels: list[Optional[np.ndarray]] = []
+        for pb in playblasts:
+            label = None
+            if labels:
+                label = np.zeros((min(self.LABEL_HEIGHT, th), tw, 3), np.uint8)
+                draw_text(label, pb.name, label.shape[0] // 2)
+            self.labels.append(label)
+
+    def tile_origin(self, index: int) -> tuple[int, int]:
+        tw, th = self.tile_size
+        return (index % self.columns) * tw, (index // self.columns) * th
+
+    def render(self) -> int:
+        sources = [layer_frames(pb) for pb in self.playblasts]
+        readers = [source for source in sources if source is not None]
+        for pb, source in zip(self.playblasts, sources):
+            if source is None:
+                Logger.warning(f"No frames found for {pb.name}, leaving its tile empty")
+
+        first = self.playblasts[0]
+        from ghettoblaster.controller.playblast import QUALITIES
+
+        fourcc = cv2.VideoWriter_fourcc(*QUALITIES[first.quality])
+        video = cv2.VideoWriter(str(self.output), fourcc, first.frame_rate, self.size)
+
+        # one reused canvas; a source that runs out keeps showing its last tile
+        canvas = np.zeros((self.size[1], self.size[0], 3), np.uint8)
+        tile = np.empty((self.tile_size[1], self.tile_size[0], 3), np.uint8)
+        tw, th = self.tile_size
+        frames = 0
+        start = time.perf_counter()
+        try:
+            while True:
+                advanced = False
+                for i, source in enumerate(sources):
+                    if source is None:
+                        continue
+
+                    frame = next(source, None)
+                    if frame is None:
+                        sources[i] = None
+                        continue
+
+                    advanced = True
+                    x, y = self.tile_origin(i)
+                    cv2.resize(
+                        frame, self.tile_size, dst=tile, interpolation=cv2.INTER_AREA
+                    )
+                    canvas[y : y + th, x : x + tw] = tile
+
+                    label = self.labels[i]
+                    if label is not None:
+                        canvas[y : y + label.shape[0], x : x + tw] = label
+
+                if not advanced:
+                    break
+
+                video.write(canvas)
+                frames += 1
+        finally:
+            video.release()
+            for reader in readers:
+                reader.close()
+
+        Logger.record_span(
+            "mosaic",
+            time.perf_counter() - start,
+            frames=frames,
+            layers=len(self.playblasts),
+        )
+        Logger.info(f"Wrote {len(self.playblasts)} layer mosaic to {self.output}")
+        return frames
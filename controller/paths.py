@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+
+def user_data_dir() -> Path:
+    # per user, the tool is often run from a shared checkout on the network
+    env = os.environ.get("GHETTOBLASTER_DATA")
+    if env:
+        return Path(env)
+
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local"
+    elif sys.platform == "darwin":
+        base = Path.home() / "Library" / "Application Support"
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or Path.home() / ".local" / "share"
+    return Path(base) / "ghettoblaster"
@@ -0,0 +1,378 @@
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, Optional
+
+from ghettoblaster.controller.frame_io import frame_number, read_frame
+from ghettoblaster.controller.lazy import lazy_import
+from ghettoblaster.controller.logger import Logger
+from ghettoblaster.controller.verify import conform_frame
+
+if TYPE_CHECKING:
+    from ghettoblaster.controller.playblast import Playblast
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+
+def find_frames(pb: Playblast) -> list[Path]:
+    # only maya's <name>.<frame>.<ext>, sinks write posters and contact sheets
+    # with the same prefix next to the sequence
+    path = Path(pb.filename)
+    pattern = re.compile(rf"{re.escape(path.name)}\.-?\d+")
+
+    files = [
+        file
+        for file in path.parent.glob(f"*.{pb.image_format}")
+        if pattern.fullmatch(file.stem)
+    ]
+    files.sort(key=frame_number)
+    return files
+
+
+class Cancelled(Exception):
+    pass
+
+
+class FrameSink:
+    name = "sink"
+
+    def __init__(self, pb: Playblast) -> None:
+        self.pb = pb
+        path = Path(pb.filename)
+        self.folder = path.parent
+        self.stem = path.stem
+
+    def write(self, frame: np.ndarray, frame_number: int) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class VideoSink(FrameSink):
+    name = "video"
+
+    def __init__(self, pb: Playblast, scale: float = 1.0, suffix: str = "") -> None:
+        super().__init__(pb)
+        from ghettoblaster.controller.playblast import QUALITIES
+
+        self.size = (
+            int(pb.width * scale) // 2 * 2,
+            int(pb.height * scale) // 2 * 2,
+        )
+        self.resize = scale != 1.0
+        self.path = self.folder / f"{self.stem}{suffix}.mp4"
+
+        fourcc = cv2.VideoWriter_fourcc(*QUALITIES[pb.quality])
+        self.video = cv2.VideoWriter(str(self.path), fourcc, pb.frame_rate, self.size)
+
+    def write(self, frame: np.ndarray, frame_number: int) -> None:
+        if self.resize:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        self.video.write(frame)
+
+    def close(self) -> None:
+        self.video.release()
+
+
+class ProxySink(VideoSink):
+    name = "proxy"
+
+    def __init__(self, pb: Playblast) -> None:
+        super().__init__(pb, scale=0.5, suffix="_proxy")
+
+
+class ImageSequenceSink(FrameSink):
+    name = "archive"
+
+    def __init__(self, pb: Playblast, ext: str = "jpg", quality: int = 90) -> None:
+        super().__init__(pb)
+        self.ext = ext
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, quality] if ext == "jpg" else []
+        self.archive = self.folder / f"{self.stem}_archive"
+        self.archive.mkdir(parents=True, exist_ok=True)
+
+    def write(self, frame: np.ndarray, frame_number: int) -> None:
+        file = self.archive / f"{self.stem}.{frame_number:04d}.{self.ext}"
+        cv2.imwrite(str(file), frame, self.params)
+
+
+class ThumbnailSink(FrameSink):
+    name = "thumbnails"
+
+    def __init__(self, pb: Playblast, width: int = 320, every: int = 24) -> None:
+        super().__init__(pb)
+        self.size = (width, max(1, round(width * pb.height / max(1, pb.width))))
+        self.every = every
+        self.thumbs = self.folder / f"{self.stem}_thumbs"
+        self.thumbs.mkdir(parents=True, exist_ok=True)
+        self._count = 0
+
+    def write(self, frame: np.ndarray, frame_number: int) -> None:
+        if self._count % self.every == 0:
+            thumb = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+            file = self.thumbs / f"{self.stem}.{frame_number:04d}.jpg"
+            cv2.imwrite(str(file), thumb)
+        self._count += 1
+
+
+class QualityCheckSink(FrameSink):
+    name = "qc"
+
+    BLACK_LEVEL = 2.0
+    FROZEN_LEVEL = 0.1
+
+    def __init__(self, pb: Playblast) -> None:
+        super().__init__(pb)
+        self.report = self.folder / f"{self.stem}_qc.json"
+        self.black: list[int] = []
+        self.frozen: list[int] = []
+        self.frames = 0
+        self._previous: Optional[np.ndarray] = None
+
+    def write(self, frame: np.ndarray, frame_number: int) -> None:
+        # analyse a small grayscale copy, enough to catch black or frozen frames
+        small = cv2.resize(frame, (64, 36), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        if gray.mean() < self.BLACK_LEVEL:
+            self.black.append(frame_number)
+        if self._previous is not None:
+            diff = cv2.absdiff(gray, self._previous).mean()
+            if diff < self.FROZEN_LEVEL:
+                self.frozen.append(frame_number)
+
+        self._previous = gray
+        self.frames += 1
+
+    def close(self) -> None:
+        data = {"frames": self.frames, "black": self.black, "frozen": self.frozen}
+        with open(self.report, "w") as f:
+            json.dump(data, f, indent=2)
+
+        if self.black or self.frozen:
+            Logger.warning(
+                f"QC for {self.pb.name}: {len(self.black)} black and "
+                f"{len(self.frozen)} frozen frames, see {self.report}"
+            )
+
+
+class ContactSheetSink(FrameSink):
+    name = "contact_sheet"
+
+    TILE_WIDTH = 480
+    LABEL_HEIGHT = 28
+
+    def __init__(self, pb: Playblast) -> None:
+        super().__init__(pb)
+        self.path = self.folder / f"{self.stem}_contact_sheet.jpg"
+        self.cols = max(1, pb.contact_sheet_columns)
+        self.rows = max(1, pb.contact_sheet_rows)
+
+        tw = min(self.TILE_WIDTH, pb.width)
+        th = max(1, round(tw * pb.height / max(1, pb.width)))
+        self.tile_size = (tw, th)
+        self.cell = (tw, th + self.LABEL_HEIGHT)
+
+        # evenly spaced samples across the layer's frame range
+        count = self.cols * self.rows
+        frames = np.linspace(pb.start_frame, pb.end_frame, count).round().astype(int)
+        self.slots = {int(f): i for i, f in enumerate(frames)}
+
+        self.canvas = np.zeros((self.rows * self.cell[1], self.cols * tw, 3), np.uint8)
+        self.tile = np.empty((th, tw, 3), np.uint8)
+        self.filled = 0
+
+    def write(self, frame: np.ndarray, frame_number: int) -> None:
+        slot = self.slots.get(frame_number)
+        if slot is None:
+            return
+
+        tw, th = self.tile_size
+        x = (slot % self.cols) * tw
+        y = (slot // self.cols) * self.cell[1]
+        cv2.resize(frame, self.tile_size, dst=self.tile, interpolation=cv2.INTER_AREA)
+        self.canvas[y : y + th, x : x + tw] = self.tile
+        cv2.putText(
+            self.canvas,
+            str(frame_number),
+            (x + 6, y + th + self.LABEL_HEIGHT - 8),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.6,
+            (255, 255, 255),
+            1,
+            cv2.LINE_AA,
+        )
+        self.filled += 1
+
+    def close(self) -> None:
+        if self.filled:
+            cv2.imwrite(str(self.path), self.canvas, [cv2.IMWRITE_JPEG_QUALITY, 90])
+
+
+class PosterFrameSink(FrameSink):
+    name = "poster"
+
+    def __init__(self, pb: Playblast) -> None:
+        super().__init__(pb)
+        self.path = self.folder / f"{self.stem}_poster.jpg"
+        if pb.start_frame <= pb.poster_frame <= pb.end_frame:
+            self.frame = pb.poster_frame
+        else:
+            self.frame = (pb.start_frame + pb.end_frame) // 2
+
+    def write(self, frame: np.ndarray, frame_number: int) -> None:
+        if frame_number == self.frame:
+            cv2.imwrite(str(self.path), frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
+
+
+class PreviewSink(FrameSink):
+    name = "preview"
+
+    WIDTH = 320
+    INTERVAL = 0.25
+
+    def __init__(self, pb: Playblast, callback: Callable[[np.ndarray], None]) -> None:
+        super().__init__(pb)
+        self.callback = callback
+        self.size = (
+            self.WIDTH,
+            max(1, round(self.WIDTH * pb.height / max(1, pb.width))),
+        )
+        self._last = 0.0
+
+    def write(self, frame: np.ndarray, frame_number: int) -> None:
+        # throttled, the ui only needs a few thumbnails per second
+        now = time.perf_counter()
+        if now - self._last < self.INTERVAL:
+            return
+        self._last = now
+        self.callback(cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA))
+
+
+SINKS: dict[str, Callable[[Playblast], FrameSink]] = {}
+
+
+def register_sink(name: str, factory: Callable[[Playblast], FrameSink]) -> None:
+    SINKS[name] = factory
+
+
+for _sink in (
+    ProxySink,
+    ImageSequenceSink,
+    ThumbnailSink,
+    QualityCheckSink,
+    ContactSheetSink,
+    PosterFrameSink,
+):
+    register_sink(_sink.name, _sink)
+
+
+def build_sinks(pb: Playblast) -> list[FrameSink]:
+    sinks: list[FrameSink] = []
+    if pb.create_video:
+        sinks.append(VideoSink(pb))
+
+    for name in pb.outputs:
+        factory = SINKS.get(name)
+        if not factory:
+            Logger.warning(f"Unknown output '{name}' for {pb.name}, skipping")
+            continue
+        sinks.append(factory(pb))
+
+    return sinks
+
+
+class FanoutPipeline:
+    # every frame is decoded once and handed to each sink in turn
+    def __init__(
+        self,
+        sinks: list[FrameSink],
+        filters: Optional[list] = None,
+        size: Optional[tuple[int, int]] = None,
+        size_mismatch: str = "resize",
+        cancel: Optional[threading.Event] = None,
+    ) -> None:
+        self.sinks = sinks
+        self.cancel = cancel
+        # frames are conformed to size before filters and sinks see them
+        self.size = size
+        self.size_mismatch = size_mismatch
+        self.mismatched = 0
+        # filters modify frames in place before the sinks see them, e.g. BurnIn
+        self.filters = filters or []
+        self.timings = {id(s): 0.0 for s in sinks}
+        self.decode = 0.0
+        self.filtering = 0.0
+        self.frames = 0
+
+    def decoded(self, files: Iterable[Path]) -> Iterator[tuple[int, np.ndarray, Path]]:
+        clock = time.perf_counter
+        for file in files:
+            t0 = clock()
+            frame = read_frame(file)
+            self.decode += clock() - t0
+            if frame is None:
+                Logger.warning(f"Could not read frame {file}")
+                continue
+
+            yield frame_number(file), frame, file
+
+    def run(
+        self,
+        files: Iterable[Path],
+        on_frame: Optional[Callable[[Path], None]] = None,
+    ) -> None:
+        self.run_frames(self.decoded(files), on_frame)
+
+    def run_frames(
+        self,
+        frames: Iterable[tuple[int, np.ndarray, Any]],
+        on_frame: Optional[Callable[[Any], None]] = None,
+    ) -> None:
+        clock = time.perf_counter
+        try:
+            for number, frame, source in frames:
+                if self.cancel is not None and self.cancel.is_set():
+                    raise Cancelled()
+
+                if self.size and frame.shape[1::-1] != self.size:
+                    self.mismatched += 1
+                    frame = conform_frame(frame, self.size, number, self.size_mismatch)
+
+                if self.filters:
+                    t0 = clock()
+                    for f in self.filters:
+                        frame = f.apply(frame, number)
+                    self.filtering += clock() - t0
+
+                for sink in self.sinks:
+                    t0 = clock()
+                    sink.write(frame, number)
+                    self.timings[id(sink)] += clock() - t0
+
+                self.frames += 1
+                if on_frame:
+                    on_frame(source)
+        finally:
+            for sink in self.sinks:
+                t0 = clock()
+                sink.close()
+                self.timings[id(sink)] += clock() - t0
+
+    def record_spans(self) -> None:
+        Logger.record_span("decode", self.decode, frames=self.frames)
+        if self.filters:
+            Logger.record_span("filters", self.filtering, frames=self.frames)
+        Logger.record_span(
+            "encode",
+            sum(self.timings.values()),
+            frames=self.frames,
+            sinks=[s.name for s in self.sinks],
+        )
+        for sink in self.sinks:
+            Logger.record_span("sink", self.timings[id(sink)], sink=sink.name)
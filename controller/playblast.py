@@ -1,15 +1,65 @@
 from __future__ import annotations
 
-import sys
+import contextvars
+import shutil
+import tempfile
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import partial
 from pathlib import Path
-from subprocess import Popen
-from typing import Any, Callable, Optional
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Generator,
+    Iterable,
+    Iterator,
+    Optional,
+)
 
-import cv2
 from ghettoblaster.controller import maya_cmds
 from ghettoblaster.controller.data_classes import Resolution
+from ghettoblaster.controller.frame_io import frame_number, read_frame
+from ghettoblaster.controller.frame_store import (
+    FrameStore,
+    FrameStoreError,
+    ingest_frames,
+    store_path,
+)
+from ghettoblaster.controller.lazy import preload
 from ghettoblaster.controller.logger import Logger
+from ghettoblaster.controller.pipeline import (
+    Cancelled,
+    FanoutPipeline,
+    PreviewSink,
+    VideoSink,
+    build_sinks,
+    find_frames,
+)
+from ghettoblaster.controller.scheduler import order_layers
+from ghettoblaster.controller.verify import (
+    VerificationError,
+    verify_video,
+    write_manifest,
+)
+
+# the batch-only helpers are imported where they're used, playblast is
+# imported on the ui's startup path
+if TYPE_CHECKING:
+    import numpy as np
+
+    from ghettoblaster.controller.actions import ActionRunner, LayerResult
+    from ghettoblaster.controller.daemon import DaemonClient
+    from ghettoblaster.controller.encoder import EncoderClient, FrameStream
+    from ghettoblaster.controller.history import (
+        Estimate,
+        HistoryStore,
+        LayerMetrics,
+    )
+    from ghettoblaster.controller.journal import BatchJournal, LayerState
+    from ghettoblaster.controller.profiler import BatchProfiler
+    from ghettoblaster.controller.transfer import TransferWorker
 
 RESOLUTIONS = (
     Resolution("HD_2160", 3840, 2160),
@@ -23,34 +73,142 @@ QUALITIES = {"High": "mp4v", "Medium": "X264"}
 FRAME_RANGES = ("Time Slider", "Custom")
 
 
+PLAYBLAST_FIELDS: dict[str, type] = {
+    "id": int,
+    "frame_range_name": str,
+    "start_frame": int,
+    "end_frame": int,
+    "filename": str,
+    "filename_field": str,
+    "output_field": str,
+    "format": str,
+    "resolution": str,
+    "width": int,
+    "height": int,
+    "show_ornaments": bool,
+    "offscreen": bool,
+    "overscan": bool,
+    "camera": str,
+    "name": str,
+    "render_layer": str,
+    "quality": str,
+    "delete_images": bool,
+    "create_video": bool,
+    "open_explorer": bool,
+    "outputs": tuple,
+    "contact_sheet_columns": int,
+    "contact_sheet_rows": int,
+    "poster_frame": int,
+    "burn_ins": tuple,
+    "image_format": str,
+    "image_quality": int,
+    "frame_store": bool,
+    "verify_output": bool,
+    "size_mismatch": str,
+    "scratch": bool,
+    "post_actions": tuple,
+    "priority": int,
+    "scene_name": str,
+    "fps": float,
+}
+
+
+def _migrate_v0(pb_data: dict[str, Any]) -> dict[str, Any]:
+    # unversioned configs were a raw dump of Playblast.__dict__
+    pb_data = dict(pb_data)
+    pb_data["schema"] = 1
+    return pb_data
+
+
+MIGRATIONS: dict[int, Callable[[dict[str, Any]], dict[str, Any]]] = {
+    0: _migrate_v0,
+}
+
+
+def _validate_field(key: str, value: Any) -> Any:
+    expected = PLAYBLAST_FIELDS[key]
+    if type(value) is expected:
+        return value
+
+    if expected is bool and value in (0, 1):
+        return bool(value)
+    if expected is int and isinstance(value, float) and value.is_integer():
+        return int(value)
+    if expected is float and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if expected is str and isinstance(value, (int, float)):
+        return str(value)
+    if expected is tuple and isinstance(value, list):
+        return tuple(value)
+
+    raise ValueError(
+        f"Invalid value for Playblast field '{key}': expected {expected.__name__}, "
+        f"got {type(value).__name__} ({value!r})"
+    )
+
+
 class Playblast:
+    __slots__ = tuple(PLAYBLAST_FIELDS)
+
+    SCHEMA_VERSION = 1
+
     resolutions = RESOLUTIONS
     keywords = KEYWORDS
     qualities = QUALITIES
     frame_ranges = FRAME_RANGES
 
     def __init__(self, id: int) -> None:
-        self.id = id
-        self.frame_range_name = "Time Slider"
-        self.start_frame = 0
-        self.end_frame = 0
-        self.filename = ""
-        self.filename_field = "<Scene>/<Scene>_<Camera>"
-        self.output_field = ""
-        self.format = "image"
-        self.resolution = "HD_1080"
-        self.width = 1920
-        self.height = 1080
-        self.show_ornaments = False
-        self.offscreen = False
-        self.overscan = False
-        self.camera = "persp"
-        self.name = f"Playblast {self.id}"
-        self.render_layer = "defaultRenderLayer"
-        self.quality = "High"
-        self.delete_images = False
-        self.create_video = True
-        self.open_explorer = False
+        self.id: int = id
+        self.frame_range_name: str = "Time Slider"
+        self.start_frame: int = 0
+        self.end_frame: int = 0
+        self.filename: str = ""
+        self.filename_field: str = "<Scene>/<Scene>_<Camera>"
+        self.output_field: str = ""
+        self.format: str = "image"
+        self.resolution: str = "HD_1080"
+        self.width: int = 1920
+        self.height: int = 1080
+        self.show_ornaments: bool = False
+        self.offscreen: bool = False
+        self.overscan: bool = False
+        self.camera: str = "persp"
+        self.name: str = f"Playblast {self.id}"
+        self.render_layer: str = "defaultRenderLayer"
+        self.quality: str = "High"
+        self.delete_images: bool = False
+        self.create_video: bool = True
+        self.open_explorer: bool = False
+        # extra outputs built from the same decode pass, see pipeline.SINKS
+        self.outputs: tuple[str, ...] = ()
+        self.contact_sheet_columns: int = 4
+        self.contact_sheet_rows: int = 4
+        # -1 picks the middle of the frame range
+        self.poster_frame: int = -1
+        # see burnin.BURN_INS
+        self.burn_ins: tuple[str, ...] = ()
+        # intermediate sequence format, see frame_io.FRAME_FORMATS
+        self.image_format: str = "jpg"
+        self.image_quality: int = 100
+        # pack the captured sequence into one memory-mapped file per layer
+        self.frame_store: bool = False
+        self.verify_output: bool = True
+        # "resize" or "fail", see verify.SIZE_MISMATCH_POLICIES
+        self.size_mismatch: str = "resize"
+        # capture and encode on local scratch, then copy to output_field
+        self.scratch: bool = False
+        # names registered in actions.ACTIONS, run off the render loop
+        self.post_actions: tuple[str, ...] = ()
+        # higher renders first, see scheduler.order_layers
+        self.priority: int = 0
+        # resolved from the open scene before encoding, which runs off the main
+        # thread or in the encode daemon where maya commands are not available.
+        # empty asks maya
+        self.scene_name: str = ""
+        self.fps: float = 0.0
+
+    def __repr__(self) -> str:
+        return f"Playblast(id={self.id!r}, name={self.name!r})"
 
     @property
     def cameras(self) -> list[str]:
@@ -58,7 +216,7 @@ class Playblast:
 
     @property
     def frame_rate(self) -> float:
-        return maya_cmds.get_frame_rate()
+        return self.fps or maya_cmds.get_frame_rate()
 
     @property
     def render_layers(self) -> list[str]:
@@ -87,85 +245,926 @@ class Playblast:
 
         return 0, 0
 
+    def evaluate_filename(self) -> str:
+        name = (
+            self.filename_field.replace("<Scene>", maya_cmds.get_scene_name())
+            .replace("<Layer>", self.render_layer)
+            .replace("<Camera>", self.camera)
+        )
+        return f"{self.output_field}/{name}"
+
+    def for_current_scene(self) -> Playblast:
+        # saved configs are reused across shots, re-resolve everything that
+        # came from the scene that was open when the config was saved
+        pb = self.replace(filename=self.evaluate_filename(), scene_name="", fps=0.0)
+        if pb.frame_range_name != "Custom":
+            pb.start_frame, pb.end_frame = pb.get_frame_range_by_name(
+                pb.frame_range_name
+            )
+        return pb
+
     def clone(self) -> Playblast:
-        pb = Playblast(self.id)
+        # every field is an immutable scalar, so a shallow slot copy is a snapshot
+        pb = Playblast.__new__(Playblast)
+        for k in self.__slots__:
+            object.__setattr__(pb, k, getattr(self, k))
 
-        for k, v in self.__dict__.items():
-            setattr(pb, k, v)
+        return pb
+
+    def replace(self, **changes: Any) -> Playblast:
+        pb = self.clone()
+        for k, v in changes.items():
+            if k not in PLAYBLAST_FIELDS:
+                raise ValueError(f"Unknown Playblast field '{k}'")
+            setattr(pb, k, _validate_field(k, v))
 
         return pb
 
     def serialize(self) -> dict[str, Any]:
-        return self.__dict__
+        data: dict[str, Any] = {k: getattr(self, k) for k in self.__slots__}
+        data["schema"] = self.SCHEMA_VERSION
+        return data
+
+    @classmethod
+    def migrate(cls, pb_data: dict[str, Any]) -> dict[str, Any]:
+        version = pb_data.get("schema", 0)
+        if version > cls.SCHEMA_VERSION:
+            raise ValueError(
+                f"Playblast schema {version} is newer than the supported "
+                f"schema {cls.SCHEMA_VERSION}"
+            )
+
+        while version < cls.SCHEMA_VERSION:
+            pb_data = MIGRATIONS[version](pb_data)
+            version = pb_data["schema"]
+
+        return pb_data
 
     @classmethod
     def deserialize(cls, pb_data: dict[str, Any]) -> Playblast:
-        pb = Playblast(pb_data["id"])
+        pb_data = cls.migrate(pb_data)
+        if "id" not in pb_data:
+            raise ValueError("Playblast data is missing the 'id' field")
+
+        pb = Playblast(_validate_field("id", pb_data["id"]))
         for k, v in pb_data.items():
-            setattr(pb, k, v)
+            if k == "schema":
+                continue
+            if k not in PLAYBLAST_FIELDS:
+                Logger.warning(f"Ignoring unknown Playblast field '{k}'")
+                continue
+
+            setattr(pb, k, _validate_field(k, v))
 
         return pb
 
 
+def frame_count(pb: Playblast) -> int:
+    return max(0, pb.end_frame - pb.start_frame + 1)
+
+
 class PlayblastRenderer:
-    def __init__(self, playblasts: list[Playblast], update_progress: Callable) -> None:
-        self.playblasts = playblasts
+    POLL_INTERVAL = 0.05
+    STORE_CHUNK = 50
+    PREFLIGHT_FRAMES = 5
+    # frames captured between two journal records
+    CHECKPOINT_FRAMES = 100
+    # frames in flight between capture and the encoder process
+    RING_SLOTS = 8
+    # conservative encoded video size relative to the captured sequence
+    VIDEO_SIZE_RATIO = 0.25
+
+    def __init__(
+        self,
+        playblasts: list[Playblast],
+        update_progress: Callable,
+        profile: bool = False,
+        profile_dir: Optional[Path] = None,
+        mosaic: bool = False,
+        scratch_dir: Optional[Path] = None,
+        on_preview: Optional[Callable[[np.ndarray], None]] = None,
+        history: Optional[HistoryStore] = None,
+        budget: Optional[float] = None,
+        schedule: bool = True,
+        daemon: Optional[DaemonClient] = None,
+        find_daemon: bool = False,
+        encoder: Optional[EncoderClient] = None,
+        journal_dir: Optional[Path] = None,
+        reuse: Optional[dict[str, list[int]]] = None,
+        keep_view: bool = False,
+    ) -> None:
+        from ghettoblaster.controller.history import CostModel
+
+        # ids come from the ui and can repeat, the per layer state below is
+        # keyed by id so every layer of the batch gets its own
+        self.playblasts = [p.replace(id=i) for i, p in enumerate(playblasts)]
         self.update_progress = update_progress
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.profiler: Optional[BatchProfiler] = None
+        self.mosaic = mosaic
+        self.scratch_dir = scratch_dir
+        self.transfers: Optional[TransferWorker] = None
+        self.actions: Optional[ActionRunner] = None
+
+        # update_progress and on_preview are called from the encode thread
+        self.on_preview = on_preview
+        self.cancelled = threading.Event()
+        self.work_total = 0.0
+        self.work_done = 0.0
+        self._percent = -1
+        self._progress_lock = threading.Lock()
+
+        # layer timings feed the cost model that weights progress and the ETA
+        self.history = history
+        self.budget = budget
+        self.model = history.model() if history else CostModel([])
+        self.estimates: dict[int, Estimate] = {}
+        # render order, by priority and predicted time unless schedule is off
+        self.schedule = schedule
+        self.order = list(self.playblasts)
+        self.predicted = 0.0
+        self.scene = ""
+        self.scene_mb = 0.0
+        self.metrics: list[LayerMetrics] = []
+        # encodes go to the shared daemon when one is running, see daemon.py,
+        # otherwise to the session's encoder process, see encoder.py
+        self.daemon = daemon
+        # looked up off the calling thread once the batch starts, a daemon
+        # that hangs would otherwise freeze the ui before anything shows
+        self.find_daemon = find_daemon and daemon is None
+        self.encoder = encoder
+        # layers streaming to the encoder process, by playblast id
+        self.streams: dict[int, FrameStream] = {}
+        # finished layers and captured frames of saved scenes are journaled so
+        # an interrupted batch resumes where it stopped, see journal.py
+        self.journal_dir = journal_dir
+        self.journal: Optional[BatchJournal] = None
+        self.keys: dict[int, str] = {}
+        # frames an earlier batch captured that are still valid, by layer key
+        self.reuse = reuse or {}
+        # layers that picked up frames or videos of an earlier batch, their
+        # timings don't describe the whole layer
+        self.partial: set[int] = set()
+        # batches the artist didn't start leave camera, layer and panel as they were
+        self.keep_view = keep_view
 
     def batch_maya_render(self):
-        self.update_progress(0)
-        for i, p in enumerate(self.playblasts, start=1):
-            start = time.perf_counter()
-            Logger.info(f"Starting Playblast for {p.name}")
-            self.maya_render(p)
-
-            self.update_progress((i // len(self.playblasts) // 2) * 100)
-            if p.create_video:
-                self.video_render(p)
-
-            if p.open_explorer:
-                folder = Path(p.filename).parent
-                self.open_folder(folder)
-
-            stop = time.perf_counter()
-            Logger.info(f"Finished Playblast for {p.name} in {stop - start:.2f}s")
-            self.update_progress((i // len(self.playblasts) * 100))
-
-    def maya_render(self, pb: Playblast):
-        maya_cmds.set_active_camera(pb.camera)
-        maya_cmds.set_render_layer(pb.render_layer)
-        maya_cmds.set_camera_overscan(pb.camera, pb.overscan)
-        maya_cmds.render_playblast(pb)
-
-    def video_render(self, pb: Playblast):
-        path = Path(pb.filename)
-        folder = path.parent
-        filename = path.stem
-        videoname = f"{folder / filename}.mp4"
-
-        all_files = [
-            file for file in folder.glob("*.jpg") if file.stem.startswith(filename)
+        for _ in self.iter_batch():
+            pass
+
+    def iter_batch(self) -> Iterator[None]:
+        from ghettoblaster.controller.profiler import BatchProfiler
+
+        # yields between main thread steps so a UI can keep processing events
+        # while layers encode in the background
+        if not self.profile:
+            yield from self._iter_batch()
+            return
+
+        folder = self.profile_dir or Path(tempfile.gettempdir())
+        with BatchProfiler(folder).profile() as profiler:
+            self.profiler = profiler
+            batch = self._iter_batch()
+            try:
+                while True:
+                    with profiler.step():
+                        step = next(batch, StopIteration)
+                    if step is StopIteration:
+                        return
+                    yield
+            finally:
+                batch.close()
+                self.profiler = None
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+
+    def estimate(self) -> float:
+        # predicted seconds for the whole batch, needs the scene that will render
+        self.scene = maya_cmds.get_scene_name()
+        self.scene_mb = maya_cmds.get_scene_size() / 1024**2
+        self.estimates = {
+            p.id: self.model.predict(p, self.scene_mb) for p in self.playblasts
+        }
+        # capture runs on this thread while the previous layer encodes, so the
+        # batch takes as long as the capture/encode pipeline, not the sum
+        if self.schedule:
+            self.order = order_layers(self.playblasts, self.estimates)
+
+        captured = encoded = 0.0
+        for p in self.order:
+            estimate = self.estimates[p.id]
+            captured += estimate.capture_s
+            encoded = max(captured, encoded) + estimate.encode_s
+
+        self.predicted = max(captured, encoded)
+        return self.predicted
+
+    def over_budget(self) -> bool:
+        return bool(self.budget) and self.estimate() > self.budget
+
+    def encode_step(self, pb: Playblast) -> float:
+        # progress for one encoded frame of pb, nothing outside of a batch
+        estimate = self.estimates.get(pb.id)
+        if not estimate:
+            return 0.0
+        return estimate.encode_s / max(1, frame_count(pb))
+
+    def frame_progress(self, pb: Playblast) -> Callable[[Any], None]:
+        step = self.encode_step(pb)
+        return lambda _: self.advance(step)
+
+    def advance(self, work: float) -> None:
+        with self._progress_lock:
+            self.work_done += work
+            percent = int(self.work_done * 100 / max(1e-9, self.work_total))
+            if percent == self._percent:
+                return
+            self._percent = percent
+        self.update_progress(min(percent, 100))
+
+    def wait_for_daemon(self, executor: ThreadPoolExecutor) -> Iterator[None]:
+        from ghettoblaster.controller.daemon import DaemonClient
+
+        future = executor.submit(DaemonClient.find)
+        while not wait([future], self.POLL_INTERVAL).done:
+            yield
+        self.daemon = future.result()
+
+    def _iter_batch(self) -> Iterator[None]:
+        from ghettoblaster.controller.transfer import default_scratch_dir
+
+        # progress is weighted by the predicted capture and encode time
+        self.estimate()
+        self.work_total = sum(e.total_s for e in self.estimates.values())
+        self.order = [
+            p.replace(scene_name=self.scene, fps=float(p.frame_rate))
+            for p in self.order
         ]
-        all_files.sort(key=lambda x: x.stem)
+        if [p.id for p in self.order] != [p.id for p in self.playblasts]:
+            Logger.info(f"Render order: {', '.join(p.name for p in self.order)}")
+        self.work_done = 0.0
+        self._percent = -1
+        self.advance(0)
+        self.journal = self.open_journal()
+        Logger.info(
+            f"Predicted batch time {self.predicted:.0f}s "
+            f"(cost model from {self.model.samples} layers)"
+        )
+        if self.budget and self.predicted > self.budget:
+            Logger.warning(
+                f"Batch is predicted to take {self.predicted:.0f}s, "
+                f"over the budget of {self.budget:.0f}s"
+            )
 
-        fourcc = cv2.VideoWriter_fourcc(*QUALITIES[pb.quality])
-        video = cv2.VideoWriter(videoname, fourcc, pb.frame_rate, (pb.width, pb.height))
+        # maya commands stay on this thread, encoding runs one layer behind
+        preload("cv2", "numpy")
+        encoder = ThreadPoolExecutor(1, thread_name_prefix="ghettoblaster-encode")
+        pending: list[Future] = []
+        try:
+            if self.find_daemon:
+                yield from self.wait_for_daemon(encoder)
+            with Logger.span("batch", layers=len(self.playblasts)):
+                for i, p in enumerate(self.order, start=1):
+                    if self.cancelled.is_set():
+                        break
+                    state = self.layer_state(p)
+                    if state and state.done:
+                        Logger.info(f"Skipping finished layer {p.name}")
+                        self.advance(self.estimates[p.id].total_s)
+                        continue
 
-        if pb.delete_images:
-            for i in all_files:
-                video.write(cv2.imread(str(i)))
-                i.unlink()
+                    start = time.perf_counter()
+                    Logger.info(f"Starting Playblast for {p.name}")
+                    with Logger.span("layer", layer=p.name, index=i) as span:
+                        span.set(
+                            frames=frame_count(p),
+                            width=p.width,
+                            height=p.height,
+                            scratch=p.scratch,
+                        )
+                        target = yield from self.capture_layer(p)
+                        capture = time.perf_counter() - start
+                        self.advance(self.estimates[p.id].capture_s)
+
+                        context = contextvars.copy_context()
+                        finish = self.finish_layer
+                        if self.profiler:
+                            finish = partial(self.profiler.run, finish)
+                        pending.append(
+                            encoder.submit(
+                                context.run,
+                                finish,
+                                p,
+                                target,
+                                start,
+                                capture,
+                            )
+                        )
+                    yield
+
+                while pending:
+                    done, _ = wait(pending, self.POLL_INTERVAL)
+                    for future in done:
+                        pending.remove(future)
+                        future.result()
+                    yield
+
+                while self.transfers and self.transfers.pending():
+                    time.sleep(self.POLL_INTERVAL)
+                    yield
+                if self.transfers:
+                    self.report_transfers()
+
+                if self.cancelled.is_set():
+                    Logger.warning("Batch cancelled")
+                elif self.mosaic and len(self.playblasts) > 1:
+                    self.mosaic_render(self.playblasts)
+        except Cancelled:
+            Logger.warning("Batch cancelled")
+        finally:
+            if pending:
+                self.cancelled.set()
+            encoder.shutdown(wait=True)
+            for stream in self.streams.values():
+                stream.close()
+            self.streams.clear()
+            if self.history and self.metrics:
+                self.history.record(self.metrics)
+            if self.transfers:
+                if self.transfers.pending():
+                    # cancelled or failed, don't hold maya up for the network
+                    dropped = self.transfers.cancel()
+                    Logger.warning(
+                        f"Stopped transfers, {dropped} queued files were kept in "
+                        f"{self.scratch_dir or default_scratch_dir()}"
+                    )
+                else:
+                    self.transfers.stop()
+                self.transfers = None
+            # after the transfers, they finish scratch layers
+            if self.journal:
+                self.close_journal()
+            if self.actions:
+                # actions keep running in the background, never block on them
+                self.actions.shutdown(wait=False)
+                self.actions = None
+
+    def open_journal(self) -> Optional[BatchJournal]:
+        from ghettoblaster.controller.journal import BatchJournal, layer_key
+
+        # unsaved scenes have nothing to resume from
+        scene = maya_cmds.get_scene_path()
+        if not self.journal_dir or not scene:
+            return None
+
+        journal = BatchJournal.open(
+            self.journal_dir, scene, maya_cmds.is_scene_modified()
+        )
+        self.keys = {p.id: layer_key(p) for p in self.order}
+        if journal.resumed:
+            Logger.info(f"Resuming interrupted batch from {journal.path}")
+        for p in self.order:
+            key = self.keys[p.id]
+            if key in self.reuse and key not in journal.layers:
+                self.reuse_outputs(journal, p, self.reuse[key])
+        return journal
+
+    def reuse_outputs(
+        self, journal: BatchJournal, p: Playblast, frames: list[int]
+    ) -> None:
+        from ghettoblaster.controller.journal import frame_ranges
+
+        # journaled like an interrupted batch, so only the frames that changed
+        # are captured again and the layer is encoded from the whole sequence
+        key = self.keys[p.id]
+        video = Path(f"{p.filename}.mp4")
+        if len(frames) == frame_count(p) and (video.exists() or not p.create_video):
+            Logger.info(f"Reusing {p.name}, nothing changed")
+            journal.started(key, p.filename)
+            journal.done(key)
+            return
+        # scratch layers capture somewhere else every time
+        if p.scratch or not frames:
+            return
+
+        changed = set(range(p.start_frame, p.end_frame + 1)).difference(frames)
+        if p.frame_store and store_path(p.filename).exists():
+            try:
+                store = FrameStore.open(store_path(p.filename), "r+")
+            except FrameStoreError:
+                return
+            for frame in changed:
+                store.discard(frame)
+            store.close()
         else:
-            for i in all_files:
-                video.write(cv2.imread(str(i)))
+            for file in find_frames(p):
+                if frame_number(file) in changed:
+                    file.unlink()
 
-        cv2.destroyAllWindows()
-        video.release()
+        Logger.info(f"Reusing {len(frames)} unchanged frames of {p.name}")
+        journal.started(key, p.filename)
+        for start, end in frame_ranges(frames, len(frames)):
+            journal.captured(key, start, end)
+
+    def close_journal(self) -> None:
+        # kept until every layer is done, the next batch resumes from it
+        if self.journal.complete([self.keys[p.id] for p in self.order]):
+            self.journal.finish()
+        else:
+            self.journal.close()
+        self.journal = None
+
+    def layer_state(self, pb: Playblast) -> Optional[LayerState]:
+        if not self.journal:
+            return None
+        return self.journal.layer(self.keys[pb.id])
+
+    def capture_layer(self, p: Playblast) -> Generator[None, None, Playblast]:
+        # scratch layers capture and encode locally, the outputs are copied
+        # to the real output folder in the background
+        state = self.layer_state(p)
+        if state and p.scratch and state.target and Path(state.target).parent.is_dir():
+            target = p.replace(filename=state.target)
+        else:
+            target = self.scratch_playblast(p) if p.scratch else p
+
+        resume = False
+        if state:
+            # frames on disk only count if this batch started writing them
+            resume = state.target == target.filename
+            if state.encoded is not None or (resume and state.captured):
+                self.partial.add(p.id)
+            self.journal.started(self.keys[p.id], target.filename)
+            if state.encoded is not None:
+                Logger.info(f"{p.name} was encoded before the batch stopped")
+                return target
+
+        destination = Path(p.filename).parent
+        yield from self.iter_maya_render(
+            target, preflight=destination if p.scratch else None, resume=resume
+        )
+        return target
+
+    def finish_layer(
+        self, p: Playblast, target: Playblast, start: float, capture: float
+    ) -> None:
+        from ghettoblaster.controller.actions import LayerResult
+        from ghettoblaster.controller.history import LayerMetrics
+        from ghettoblaster.controller.transfer import TransferWorker
+
+        frames = frame_count(p)
+        state = self.layer_state(p)
+        encode_start = time.perf_counter()
+        with Logger.span("layer_encode", layer=p.name):
+            if state and state.encoded is not None:
+                encoded = state.encoded
+            else:
+                encoded = self.encode(target) if p.create_video or p.outputs else 0
+                if self.journal:
+                    self.journal.encoded(self.keys[p.id], encoded)
+        encode = time.perf_counter() - encode_start
+        self.advance(max(0, frames - encoded) * self.encode_step(p))
+
+        destination = Path(p.filename).parent
+        result = LayerResult(
+            p, destination, destination / f"{Path(p.filename).name}.mp4"
+        )
+        if p.scratch:
+            if not self.transfers:
+                self.transfers = TransferWorker()
+            # post actions wait for the outputs to arrive at the destination
+            scratch = Path(target.filename)
+            self.transfers.submit_outputs(
+                scratch.parent,
+                scratch.stem,
+                destination,
+                lambda: self.finish_post(result),
+            )
+        else:
+            self.finish_post(result)
+
+        stop = time.perf_counter()
+        Logger.info(f"Finished Playblast for {p.name} in {stop - start:.2f}s")
+        if p.id in self.partial:
+            # would teach the cost model that whole layers are that fast
+            return
+        self.metrics.append(
+            LayerMetrics.from_playblast(
+                p,
+                self.scene,
+                self.scene_mb,
+                capture,
+                encode,
+                stop - start,
+            )
+        )
+
+    def encode(self, pb: Playblast) -> int:
+        from ghettoblaster.controller.daemon import DaemonError
+
+        stream = self.streams.pop(pb.id, None)
+        if stream:
+            return stream.wait(self.cancelled)
+        if self.daemon:
+            try:
+                return self.remote_render(pb, self.daemon)
+            except DaemonError as e:
+                Logger.warning(f"Encode daemon failed, encoding {pb.name} here: {e}")
+        if self.encoder:
+            # no fallback, whatever crashed the encoder would crash maya
+            return self.remote_render(pb, self.encoder)
+        return self.video_render(pb)
+
+    def remote_render(
+        self, pb: Playblast, service: DaemonClient | EncoderClient
+    ) -> int:
+        return service.encode(pb, self.remote_progress(pb), self.cancelled)
+
+    def remote_progress(self, pb: Playblast) -> Callable[[int], None]:
+        # remote encodes report percent of the layer
+        work = self.encode_step(pb) * frame_count(pb)
+        reported = 0
+
+        def on_progress(percent: int) -> None:
+            nonlocal reported
+            self.advance((percent - reported) * work / 100)
+            reported = percent
+
+        return on_progress
+
+    def finish_post(self, result: LayerResult) -> None:
+        # a layer is done once its outputs are in the output folder
+        if self.journal:
+            self.journal.done(self.keys[result.pb.id])
+        self.run_post_actions(result)
+
+    def run_post_actions(self, result: LayerResult) -> None:
+        from ghettoblaster.controller.actions import ActionRunner, OpenFolderAction
+
+        names = result.pb.post_actions
+        if result.pb.open_explorer and OpenFolderAction.name not in names:
+            names = names + (OpenFolderAction.name,)
+        if not names:
+            return
+
+        if not self.actions:
+            self.actions = ActionRunner()
+        self.actions.submit(names, result)
+
+    def scratch_playblast(self, pb: Playblast) -> Playblast:
+        from ghettoblaster.controller.transfer import default_scratch_dir
+
+        root = self.scratch_dir or default_scratch_dir()
+        root.mkdir(parents=True, exist_ok=True)
+        folder = Path(tempfile.mkdtemp(prefix=f"layer{pb.id}_", dir=root))
+        return pb.replace(filename=str(folder / Path(pb.filename).name))
+
+    def report_transfers(self) -> None:
+        from ghettoblaster.controller.transfer import default_scratch_dir
+
+        failed = self.transfers.failed
+        if failed:
+            Logger.error(
+                f"{len(failed)} transfers failed, outputs were kept in "
+                f"{self.scratch_dir or default_scratch_dir()}"
+            )
+        else:
+            Logger.info(f"Transferred {self.transfers.transferred} files")
+
+    def maya_render(
+        self, pb: Playblast, preflight: Optional[Path] = None, resume: bool = False
+    ):
+        for _ in self.iter_maya_render(pb, preflight, resume):
+            pass
+
+    def iter_maya_render(
+        self, pb: Playblast, preflight: Optional[Path] = None, resume: bool = False
+    ) -> Iterator[None]:
+        # yields between captured chunks, like iter_batch
+        view = maya_cmds.save_view_state([pb.camera]) if self.keep_view else None
+        try:
+            yield from self.capture_view(pb, preflight, resume)
+        finally:
+            if view:
+                maya_cmds.restore_view_state(view)
+
+    def capture_view(
+        self, pb: Playblast, preflight: Optional[Path], resume: bool
+    ) -> Iterator[None]:
+        with Logger.span("camera_switch", camera=pb.camera):
+            maya_cmds.set_active_camera(pb.camera)
+        with Logger.span("render_layer_switch", render_layer=pb.render_layer):
+            maya_cmds.set_render_layer(pb.render_layer)
+        with Logger.span("viewport_setup"):
+            maya_cmds.set_camera_overscan(pb.camera, pb.overscan)
+            panel = maya_cmds.isolate_viewport()
+        try:
+            with Logger.span("capture"):
+                if pb.frame_store:
+                    if preflight:
+                        self.preflight(pb, pb.width * pb.height * 3, preflight)
+                    if self.streams_to_encoder(pb):
+                        yield from self.capture_to_ring(pb)
+                    else:
+                        yield from self.capture_to_store(pb, resume)
+                elif self.journal:
+                    yield from self.capture_checkpointed(pb, preflight, resume)
+                elif preflight:
+                    self.capture_with_preflight(pb, preflight)
+                else:
+                    maya_cmds.capture_playblast(pb)
+        finally:
+            maya_cmds.restore_viewport(panel)
+
+    def capture_with_preflight(self, pb: Playblast, destination: Path) -> None:
+        # capture a few frames first to measure the real bytes per frame
+        first_end = min(pb.start_frame + self.PREFLIGHT_FRAMES - 1, pb.end_frame)
+        maya_cmds.capture_playblast(pb.replace(end_frame=first_end))
+        self.measured_preflight(pb, destination)
+
+        if first_end < pb.end_frame:
+            maya_cmds.capture_playblast(pb.replace(start_frame=first_end + 1))
+
+    def capture_checkpointed(
+        self, pb: Playblast, preflight: Optional[Path], resume: bool
+    ) -> Iterator[None]:
+        from ghettoblaster.controller.journal import frame_ranges
+
+        # captures the frames that are not on disk yet and journals each chunk
+        key = self.keys[pb.id]
+        missing = list(range(pb.start_frame, pb.end_frame + 1))
+        if resume:
+            missing = self.missing_frames(pb, key)
+        if len(missing) < frame_count(pb):
+            Logger.info(
+                f"Resuming {pb.name}, {frame_count(pb) - len(missing)} frames "
+                f"on disk, capturing {len(missing)}"
+            )
+
+        measured = preflight is None
+        for start, end in frame_ranges(missing, self.CHECKPOINT_FRAMES):
+            if self.cancelled.is_set():
+                raise Cancelled()
+            if not measured:
+                measured = self.measured_preflight(pb, preflight)
+            maya_cmds.capture_playblast(pb.replace(start_frame=start, end_frame=end))
+            self.journal.captured(key, start, end)
+            yield
+
+        if not measured:
+            self.measured_preflight(pb, preflight)
+
+    def missing_frames(self, pb: Playblast, key: str) -> list[int]:
+        # the existing sequence decides, the journal only vouches for frames
+        captured = self.journal.layer(key).captured
+        on_disk = {frame_number(f) for f in find_frames(pb) if f.stat().st_size > 0}
+        # the newest frame the journal does not know about may be cut off
+        unjournaled = on_disk - captured
+        if unjournaled:
+            on_disk.discard(max(unjournaled))
+        return [f for f in range(pb.start_frame, pb.end_frame + 1) if f not in on_disk]
+
+    def measured_preflight(self, pb: Playblast, destination: Path) -> bool:
+        # False until there are captured frames to measure
+        files = find_frames(pb)
+        if not files:
+            return False
+        per_frame = sum(f.stat().st_size for f in files) // len(files)
+        self.preflight(pb, per_frame, destination)
+        return True
+
+    def preflight(self, pb: Playblast, bytes_per_frame: int, destination: Path):
+        from ghettoblaster.controller.transfer import check_space
+
+        frames = pb.end_frame - pb.start_frame + 1
+        sequence = bytes_per_frame * frames
+        video = int(sequence * self.VIDEO_SIZE_RATIO) if pb.create_video else 0
+
+        Logger.info(
+            f"Preflight for {pb.name}: {bytes_per_frame / 1024**2:.2f} MB per frame, "
+            f"{(sequence + video) / 1024**3:.2f} GB on scratch"
+        )
+        check_space(Path(pb.filename).parent, sequence + video)
+        check_space(destination, video + (0 if pb.delete_images else sequence))
+
+    def open_store(self, pb: Playblast, resume: bool) -> FrameStore:
+        path = store_path(pb.filename)
+        if resume and path.exists():
+            try:
+                store = FrameStore.open(path, "r+")
+            except FrameStoreError as e:
+                Logger.warning(f"Capturing {pb.name} again, {e}")
+            else:
+                Logger.info(
+                    f"Resuming {pb.name}, {len(store.frames())} frames in {path}"
+                )
+                return store
+
+        return FrameStore.create(
+            path, pb.width, pb.height, pb.start_frame, pb.end_frame
+        )
+
+    def capture_to_store(
+        self, pb: Playblast, resume: bool = False
+    ) -> Generator[None, None, FrameStore]:
+        from ghettoblaster.controller.journal import frame_ranges
+
+        # maya can only write loose files, so capture in chunks to local temp
+        # and pack each chunk into the store before capturing the next one
+        store = self.open_store(pb, resume)
+        tmp = Path(tempfile.mkdtemp(prefix="ghettoblaster_"))
+        try:
+            for start, end in frame_ranges(store.missing(), self.STORE_CHUNK):
+                if self.cancelled.is_set():
+                    raise Cancelled()
+                chunk = pb.replace(
+                    start_frame=start, end_frame=end, filename=str(tmp / "chunk")
+                )
+                maya_cmds.capture_playblast(chunk)
+                ingest_frames(store, find_frames(chunk))
+                if self.journal:
+                    # the index is only trusted once the frames are on disk
+                    store.flush()
+                    self.journal.captured(self.keys[pb.id], start, end)
+                yield
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+            store.flush()
+
+        missing = store.missing()
+        if missing:
+            Logger.warning(f"{len(missing)} frames missing from {store.path}")
+        return store
+
+    def streams_to_encoder(self, pb: Playblast) -> bool:
+        # a store that is deleted after encoding is skipped, frames go straight
+        # to the encoder process through shared memory instead
+        return bool(
+            self.encoder
+            and not self.daemon
+            and pb.delete_images
+            and (pb.create_video or pb.outputs)
+        )
+
+    def capture_to_ring(self, pb: Playblast) -> Iterator[None]:
+        # like capture_to_store, the encoder works on a chunk while the next
+        # one captures and at most RING_SLOTS frames are held in memory. the
+        # encoder opens its writers as soon as the stream starts
+        Path(pb.filename).parent.mkdir(parents=True, exist_ok=True)
+        stream = self.encoder.stream(pb, self.remote_progress(pb), self.RING_SLOTS)
+        self.streams[pb.id] = stream
+        tmp = Path(tempfile.mkdtemp(prefix="ghettoblaster_"))
+        try:
+            for start in range(pb.start_frame, pb.end_frame + 1, self.STORE_CHUNK):
+                end = min(start + self.STORE_CHUNK - 1, pb.end_frame)
+                chunk = pb.replace(
+                    start_frame=start, end_frame=end, filename=str(tmp / "chunk")
+                )
+                maya_cmds.capture_playblast(chunk)
+                for file in find_frames(chunk):
+                    frame = read_frame(file)
+                    if frame is not None:
+                        stream.put(frame_number(file), frame, self.cancelled)
+                    file.unlink()
+                yield
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+            stream.end()
+
+    def video_render(
+        self, pb: Playblast, on_frame: Optional[Callable[[Any], None]] = None
+    ):
+        store_file = store_path(pb.filename)
+        if pb.frame_store and store_file.exists():
+            store = FrameStore.open(store_file)
+            return self.store_video_render(pb, store, on_frame=on_frame)
+
+        with Logger.span("frame_discovery") as span:
+            all_files = find_frames(pb)
+            span.set(frames=len(all_files))
+
+        pipeline = self.build_pipeline(pb)
+        pipeline.run(all_files, on_frame or self.frame_progress(pb))
+        self.finish_encode(pb, pipeline)
+
+        if pb.delete_images:
+            with Logger.span("cleanup", frames=len(all_files)):
+                for file in all_files:
+                    file.unlink()
+
+        return pipeline.frames
+
+    def store_video_render(
+        self,
+        pb: Playblast,
+        store: FrameStore,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        on_frame: Optional[Callable[[Any], None]] = None,
+    ):
+        # start/end allow re-encoding part of a layer from the store
+        with Logger.span("frame_discovery") as span:
+            first = store.first_frame if start is None else start
+            last = store.last_frame if end is None else end
+            span.set(frames=sum(first <= n <= last for n in store.frames()))
+
+        # no view into the mapping may outlive the store, windows can't delete
+        # a mapped file
+        frames = ((n, f, n) for n, f in store.iter_frames(start, end, copy=True))
+        pipeline = self.build_pipeline(pb)
+        try:
+            pipeline.run_frames(frames, on_frame or self.frame_progress(pb))
+        finally:
+            frames.close()
+            store.close()
+        self.finish_encode(pb, pipeline)
+
+        if pb.delete_images and start is None and end is None:
+            with Logger.span("cleanup"):
+                store.path.unlink()
+
+        return pipeline.frames
+
+    def stream_video_render(
+        self,
+        pb: Playblast,
+        frames: Iterable[tuple[int, np.ndarray, Any]],
+        on_frame: Optional[Callable[[Any], None]] = None,
+    ):
+        # frames that arrive while the layer is still capturing
+        pipeline = self.build_pipeline(pb)
+        pipeline.run_frames(frames, on_frame or self.frame_progress(pb))
+        self.finish_encode(pb, pipeline)
+        return pipeline.frames
+
+    def build_pipeline(self, pb: Playblast) -> FanoutPipeline:
+        from ghettoblaster.controller.burnin import BurnIn
+
+        burn_in = BurnIn.from_playblast(pb)
+        sinks = build_sinks(pb)
+        if self.on_preview:
+            sinks.append(PreviewSink(pb, self.on_preview))
+
+        return FanoutPipeline(
+            sinks,
+            [burn_in] if burn_in else None,
+            size=(pb.width, pb.height),
+            size_mismatch=pb.size_mismatch,
+            cancel=self.cancelled,
+        )
+
+    def finish_encode(self, pb: Playblast, pipeline: FanoutPipeline) -> None:
+        pipeline.record_spans()
+        if pipeline.mismatched:
+            Logger.warning(
+                f"Resized {pipeline.mismatched} frames of {pb.name} to "
+                f"{pb.width}x{pb.height}"
+            )
+
+        if pb.verify_output:
+            with Logger.span("verify"):
+                ok = self.verify_outputs(pb, pipeline)
+            # fails the layer, it is neither journaled as encoded nor post processed
+            if not ok:
+                raise VerificationError(f"Verification failed for {pb.name}")
+
+    def verify_outputs(self, pb: Playblast, pipeline: FanoutPipeline) -> bool:
+        videos = [s for s in pipeline.sinks if isinstance(s, VideoSink)]
+        if not videos:
+            return True
+
+        fps = pb.frame_rate
+        manifest: dict[Path, dict] = {}
+        ok = True
+        for sink in videos:
+            info, problems = verify_video(sink.path, pipeline.frames, sink.size, fps)
+            if problems:
+                ok = False
+                Logger.error(
+                    f"Verification failed for {sink.path}: {'; '.join(problems)}"
+                )
+            if info:
+                manifest[sink.path] = info._asdict()
+
+        manifest_path = videos[0].folder / f"{videos[0].stem}_manifest.json"
+        write_manifest(manifest_path, manifest)
+        return ok
+
+    def mosaic_render(
+        self, playblasts: list[Playblast], output: Optional[Path] = None
+    ) -> Path:
+        from ghettoblaster.controller.mosaic import Mosaic
+
+        if output is None:
+            first = Path(playblasts[0].filename)
+            output = first.parent / f"{first.stem}_mosaic.mp4"
+
+        Mosaic(playblasts, output).render()
+        return output
 
     def open_folder(self, folder: Path) -> None:
-        if sys.platform == "darwin":
-            with Popen(["open", folder]):
-                pass
-        elif sys.platform == "win32":
-            with Popen(["explorer", folder]):
-                pass
+        from ghettoblaster.controller.actions import open_folder
+
+        open_folder(folder)
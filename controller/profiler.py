@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import json
+import pstats
+import sys
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from ghettoblaster.controller.logger import Logger, Span
+
+
+class PhaseMemory:
+    __slots__ = ("name", "count", "duration", "peak")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.count = 0
+        self.duration = 0.0
+        self.peak = 0
+
+
+class BatchProfiler:
+    TOP_HOTSPOTS = 20
+    # before 3.12 cProfile only sees the thread that enabled it, so work on
+    # other threads gets a profile of its own that is merged into the batch
+    # profile. from 3.12 on a single profile sees every thread
+    PER_THREAD = sys.version_info < (3, 12)
+
+    def __init__(self, folder: Path, name: str = "batch") -> None:
+        stamp = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+        self.folder = Path(folder)
+        self.stats_path = self.folder / f"{stamp}_{name}.pstats"
+        self.memory_path = self.folder / f"{stamp}_{name}.memory.json"
+        self.phases: dict[str, PhaseMemory] = {}
+        self._open: dict[str, int] = {}
+        # spans start and end on the main and the encode thread
+        self._lock = threading.Lock()
+        self.profiler = cProfile.Profile()
+        self.thread_profiles: list[cProfile.Profile] = []
+
+    @contextmanager
+    def profile(self) -> Iterator[BatchProfiler]:
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+
+        Logger.add_span_observer(self.on_span)
+        if not self.PER_THREAD:
+            self.profiler.enable()
+        try:
+            yield self
+        finally:
+            if not self.PER_THREAD:
+                self.profiler.disable()
+            Logger.remove_span_observer(self.on_span)
+            if started_tracing:
+                tracemalloc.stop()
+
+            self.write()
+
+    @contextmanager
+    def step(self) -> Iterator[None]:
+        # one step of the batch on the main thread, whatever the ui does
+        # between steps stays out of the profile
+        if self.PER_THREAD:
+            self.profiler.enable()
+        try:
+            yield
+        finally:
+            if self.PER_THREAD:
+                self.profiler.disable()
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        # runs fn on a worker thread with the work showing up in the profile
+        if not self.PER_THREAD:
+            return fn(*args)
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return fn(*args)
+        finally:
+            profiler.disable()
+            with self._lock:
+                self.thread_profiles.append(profiler)
+
+    def on_span(self, event: str, span: Span) -> None:
+        with self._lock:
+            # tracemalloc has a single peak counter, fold it into every open
+            # span before resetting so nested phases don't hide their parents'
+            _, peak = tracemalloc.get_traced_memory()
+            for span_id in self._open:
+                self._open[span_id] = max(self._open[span_id], peak)
+
+            if event == "start":
+                self._open[span.id] = 0
+            else:
+                phase = self.phases.setdefault(span.name, PhaseMemory(span.name))
+                phase.count += 1
+                phase.duration += span.duration
+                phase.peak = max(phase.peak, self._open.pop(span.id, peak))
+
+            tracemalloc.reset_peak()
+
+    def stats(self) -> pstats.Stats | None:
+        merged = None
+        for profiler in [self.profiler, *self.thread_profiles]:
+            try:
+                if merged is None:
+                    merged = pstats.Stats(profiler)
+                else:
+                    merged.add(profiler)
+            except TypeError:
+                # nothing was profiled
+                continue
+        return merged
+
+    def write(self) -> None:
+        self.folder.mkdir(parents=True, exist_ok=True)
+        stats = self.stats()
+        if stats is None:
+            return
+        stats.dump_stats(str(self.stats_path))
+
+        summary = {
+            name: {
+                "count": p.count,
+                "duration": round(p.duration, 6),
+                "peak_mb": round(p.peak / (1024 * 1024), 3),
+            }
+            for name, p in self.phases.items()
+        }
+        with open(self.memory_path, "w") as f:
+            json.dump(summary, f, indent=2)
+
+        lines = [f"{'phase':<22}{'count':>7}{'seconds':>11}{'peak MB':>10}"]
+        for name, p in summary.items():
+            lines.append(
+                f"{name:<22}{p['count']:>7}{p['duration']:>11.3f}{p['peak_mb']:>10.2f}"
+            )
+        Logger.info("Peak memory per phase:\n" + "\n".join(lines))
+
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.TOP_HOTSPOTS)
+        Logger.info(f"Top hotspots:\n{out.getvalue()}")
+        Logger.info(f"Profile written to {self.stats_path}")
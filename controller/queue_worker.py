@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from ghettoblaster.controller import maya_cmds
+from ghettoblaster.controller.history import HistoryStore
+from ghettoblaster.controller.job_queue import Job, JobQueue
+from ghettoblaster.controller.journal import default_journal_dir
+from ghettoblaster.controller.logger import Logger
+from ghettoblaster.controller.playblast import (
+    Playblast,
+    PlayblastRenderer,
+    frame_count,
+)
+
+ROOT_PATH = Path(__file__).parent.parent
+
+
+def default_mayapy() -> str:
+    # inside a maya session sys.executable is maya itself, mayapy sits next to it
+    suffix = ".exe" if sys.platform == "win32" else ""
+    sibling = Path(sys.executable).with_name(f"mayapy{suffix}")
+    return (
+        os.environ.get("MAYAPY")
+        or (str(sibling) if sibling.is_file() else None)
+        or shutil.which("mayapy")
+        or sys.executable
+    )
+
+
+def worker_env() -> dict[str, str]:
+    # the checkout is imported as the ghettoblaster package
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [str(ROOT_PATH.parent), env.get("PYTHONPATH")])
+    )
+    return env
+
+
+def render_scene(
+    scene: str, playblasts: list[Playblast], history: Optional[HistoryStore] = None
+) -> int:
+    # the scene is opened once, every layer of the config renders from it
+    with Logger.span("scene", scene=scene) as span:
+        maya_cmds.open_scene(scene)
+        playblasts = [p.for_current_scene() for p in playblasts]
+        frames = sum(frame_count(p) for p in playblasts)
+        span.set(layers=len(playblasts), frames=frames)
+
+        # a retried job resumes where the crashed attempt stopped
+        renderer = PlayblastRenderer(
+            playblasts,
+            lambda _: None,
+            history=history,
+            journal_dir=default_journal_dir(),
+        )
+        renderer.batch_maya_render()
+    return frames
+
+
+def process_job(
+    queue: JobQueue, job: Job, history: Optional[HistoryStore] = None
+) -> bool:
+    start = time.perf_counter()
+    Logger.info(f"Job {job.id}: opening {job.scene}")
+    try:
+        with Logger.span("job", job=job.id):
+            frames = render_scene(job.scene, job.playblasts(), history)
+    except Exception as e:
+        Logger.exception(f"Job {job.id} failed: {e}")
+        state = queue.fail(job.id, f"{type(e).__name__}: {e}")
+        Logger.info(f"Job {job.id}: {state}")
+        return False
+
+    queue.complete(job.id, frames)
+    Logger.info(f"Job {job.id}: {frames} frames in {time.perf_counter() - start:.1f}s")
+    return True
+
+
+def run_worker(queue: JobQueue, name: str, workers: int = 1) -> int:
+    # keeps claiming until the queue is empty, a crash only loses the current job
+    history = HistoryStore()
+    processed = 0
+    while True:
+        job = queue.claim(name, workers)
+        if job is None:
+            return processed
+
+        process_job(queue, job, history)
+        processed += 1
+
+
+class WorkerPool:
+    POLL_INTERVAL = 1.0
+
+    def __init__(
+        self, db: Path, workers: int = 2, mayapy: Optional[str] = None
+    ) -> None:
+        self.db = Path(db)
+        self.workers = max(1, workers)
+        self.mayapy = mayapy or default_mayapy()
+        self.procs: dict[str, subprocess.Popen] = {}
+        self._spawned = 0
+
+    def spawn(self) -> None:
+        self._spawned += 1
+        name = f"{socket.gethostname()}-{os.getpid()}-{self._spawned}"
+        self.procs[name] = subprocess.Popen(
+            [
+                self.mayapy,
+                "-m",
+                "ghettoblaster.controller.queue_worker",
+                "--db",
+                str(self.db),
+                "--name",
+                name,
+                "--workers",
+                str(self.workers),
+            ],
+            env=worker_env(),
+        )
+        Logger.info(f"Started worker {name}")
+
+    def reap(self, queue: JobQueue) -> None:
+        for name, proc in list(self.procs.items()):
+            code = proc.poll()
+            if code is None:
+                continue
+
+            del self.procs[name]
+            # a worker that died mid job leaves it running, put it back
+            released = queue.release(name)
+            if code or released:
+                Logger.warning(
+                    f"Worker {name} exited with {code}, released {released} job(s)"
+                )
+
+    def run(self) -> dict[str, Any]:
+        queue = JobQueue(self.db)
+        start = time.time()
+        # nothing else works this queue, running jobs are from a previous crash
+        stale = queue.release()
+        if stale:
+            Logger.warning(f"Released {stale} job(s) left running by a crash")
+
+        try:
+            while True:
+                self.reap(queue)
+                queued = queue.counts()["queued"]
+                if not queued and not self.procs:
+                    break
+
+                idle = len(self.procs) - self.busy(queue)
+                while len(self.procs) < self.workers and queued > idle:
+                    self.spawn()
+                    idle += 1
+
+                time.sleep(self.POLL_INTERVAL)
+        finally:
+            for proc in self.procs.values():
+                proc.terminate()
+
+        report = queue.report(since=start)
+        Logger.info(
+            f"{report['shots']} shot(s), {report['failed']} failed, "
+            f"{report['frames']} frames in {report['wall_s']:.1f}s: "
+            f"{report['shots_per_min']:.2f} shots/min, "
+            f"{report['frames_per_s']:.1f} frames/s"
+        )
+        queue.close()
+        return report
+
+    def busy(self, queue: JobQueue) -> int:
+        return sum(1 for j in queue.jobs("running") if j.worker in self.procs)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="ghettoblaster.controller.queue_worker")
+    parser.add_argument("--db", type=Path, required=True)
+    parser.add_argument("--name", default=f"{socket.gethostname()}-{os.getpid()}")
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    import maya.standalone
+
+    maya.standalone.initialize(name="python")
+    queue = JobQueue(args.db)
+    try:
+        processed = run_worker(queue, args.name, args.workers)
+        Logger.info(f"Worker {args.name} processed {processed} job(s)")
+    finally:
+        queue.close()
+        maya.standalone.uninitialize()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
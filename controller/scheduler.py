@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from ghettoblaster.controller.history import CostModel, Estimate
+    from ghettoblaster.controller.job_queue import Job
+    from ghettoblaster.controller.playblast import Playblast
+
+
+def order_layers(
+    playblasts: list[Playblast], estimates: dict[int, Estimate]
+) -> list[Playblast]:
+    # higher priority first, shortest predicted layer first within a priority
+    # so a quick review proxy is not stuck behind a long master. sorted is
+    # stable, equal layers keep their ui order
+    return sorted(playblasts, key=lambda p: (-p.priority, estimates[p.id].total_s))
+
+
+def predict_job(model: CostModel, scene: str, playblasts: list[Playblast]) -> float:
+    # frame ranges come from the saved config, the scene is not open yet
+    scene_mb = os.path.getsize(scene) / 1024**2 if os.path.isfile(scene) else 0.0
+    return sum(model.predict(p, scene_mb).total_s for p in playblasts)
+
+
+def slack(job: Job, now: float) -> Optional[float]:
+    if job.deadline is None:
+        return None
+    return job.deadline - now - job.predicted
+
+
+def pick_job(jobs: list[Job], workers: int, now: float) -> Job:
+    # only the highest priority competes
+    top = max(j.priority for j in jobs)
+    candidates = [j for j in jobs if j.priority == top]
+    share = sum(j.predicted for j in candidates) / max(1, workers)
+
+    # a deadline that would be missed after waiting for a fair share of the
+    # queue goes first, earliest deadline first
+    urgent = [j for j in candidates if j.deadline is not None and slack(j, now) < share]
+    if urgent:
+        return min(urgent, key=lambda j: (j.deadline, j.id))
+
+    # a job longer than everyone's share of the rest is the critical path,
+    # starting it last would leave one worker running long after the others
+    longest = max(candidates, key=lambda j: (j.predicted, -j.id))
+    if len(candidates) > 1 and longest.predicted >= share:
+        return longest
+
+    return min(candidates, key=lambda j: (j.predicted, j.id))
@@ -0,0 +1,331 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, NamedTuple, Optional
+
+from ghettoblaster.controller.logger import Logger
+
+SPOOL_STATES = ("incoming", "claimed", "done", "failed")
+
+
+class SpoolJob(NamedTuple):
+    path: Path
+    data: dict[str, Any]
+
+    @property
+    def name(self) -> str:
+        return job_name(self.path)
+
+
+def job_name(path: Path) -> str:
+    # claimed files are <job>.<worker>.json
+    return path.name.split(".", 1)[0]
+
+
+def write_atomic(path: Path, data: dict[str, Any]) -> None:
+    # readers on other nodes only ever see complete files
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def read_job(path: Path) -> Optional[dict[str, Any]]:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class Spool:
+    # a job lives in exactly one state folder, it moves between them by rename,
+    # which is atomic on a single (network) filesystem. whoever renames first
+    # owns the job, everyone else gets FileNotFoundError
+    HEARTBEAT = 10.0
+    # generous, maya can hold the GIL for a whole capture and stall the heartbeat
+    STALE_AFTER = 600.0
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+        for state in SPOOL_STATES:
+            (self.root / state).mkdir(parents=True, exist_ok=True)
+
+    def folder(self, state: str) -> Path:
+        return self.root / state
+
+    def now(self) -> float:
+        # the file server's clock, node clocks can drift apart
+        clock = self.root / ".clock"
+        clock.touch()
+        return clock.stat().st_mtime
+
+    def submit(
+        self,
+        scene: str,
+        config: dict[str, Any],
+        priority: int = 0,
+        max_attempts: int = 3,
+    ) -> str:
+        # config is the layout written by MainWindow.save
+        submitted = time.time()
+        # incoming files sort by priority (higher first), then submission time
+        rank = 99 - max(-99, min(99, priority))
+        name = f"p{rank:03d}-{int(submitted * 1000):013d}-{uuid.uuid4().hex[:8]}"
+        write_atomic(
+            self.folder("incoming") / f"{name}.json",
+            {
+                "scene": str(scene),
+                "config": config,
+                "priority": priority,
+                "attempts": 0,
+                "max_attempts": max_attempts,
+                "submitted": submitted,
+                "submitter": socket.gethostname(),
+                "log": [],
+            },
+        )
+        return name
+
+    def jobs(self, state: str) -> list[Path]:
+        return sorted(
+            p
+            for p in self.folder(state).iterdir()
+            if p.suffix == ".json" and not p.name.startswith(".")
+        )
+
+    def claim(self, worker: str) -> Optional[SpoolJob]:
+        for path in self.jobs("incoming"):
+            claimed = self.folder("claimed") / f"{job_name(path)}.{worker}.json"
+            try:
+                # rename keeps the mtime, touch first so the claim never shows
+                # up with the age of the queued file to release_stale
+                os.utime(path)
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                # another worker was faster
+                continue
+
+            data = read_job(claimed) or {}
+            data["attempts"] = data.get("attempts", 0) + 1
+            data["worker"] = worker
+            data.setdefault("log", []).append(
+                {"event": "claimed", "worker": worker, "time": time.time()}
+            )
+            write_atomic(claimed, data)
+            return SpoolJob(claimed, data)
+
+        return None
+
+    def heartbeat(self, job: SpoolJob) -> bool:
+        try:
+            os.utime(job.path)
+        except FileNotFoundError:
+            # released as stale, someone else may pick it up
+            return False
+        return True
+
+    def finish(self, job: SpoolJob, state: str, **result: Any) -> bool:
+        data = dict(job.data)
+        data.update(result)
+        data["log"] = data.get("log", []) + [
+            {"event": state, "worker": data.get("worker"), "time": time.time()}
+        ]
+        # update the claim while it is still ours, then move it. once it is in
+        # incoming another worker may claim it right away
+        if not self.heartbeat(job):
+            Logger.warning(f"Spool job {job.name} was released while it ran")
+            return False
+        write_atomic(job.path, data)
+        try:
+            os.rename(job.path, self.folder(state) / f"{job.name}.json")
+        except FileNotFoundError:
+            Logger.warning(f"Spool job {job.name} was released while it ran")
+            return False
+        return True
+
+    def fail(self, job: SpoolJob, error: str) -> str:
+        # back to incoming until the job runs out of attempts
+        state = "failed"
+        if job.data.get("attempts", 0) < job.data.get("max_attempts", 3):
+            state = "incoming"
+        self.finish(job, state, error=error)
+        return state
+
+    def release_stale(self, stale_after: Optional[float] = None) -> int:
+        # claims whose worker stopped heartbeating, safe to run from every node
+        stale_after = stale_after or self.STALE_AFTER
+        now = self.now()
+        released = 0
+        for path in self.jobs("claimed"):
+            try:
+                age = now - path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if age < stale_after:
+                continue
+
+            data = read_job(path) or {}
+            # the worker logs when it claimed the job, a claim between the
+            # stat and the read is not stale
+            claimed = [
+                e["time"] for e in data.get("log", []) if e["event"] == "claimed"
+            ]
+            if claimed and now - max(claimed) < stale_after:
+                continue
+            state = "incoming"
+            if data.get("attempts", 0) >= data.get("max_attempts", 3):
+                state = "failed"
+            try:
+                os.rename(path, self.folder(state) / f"{job_name(path)}.json")
+            except FileNotFoundError:
+                continue
+
+            Logger.warning(
+                f"Released stale spool job {job_name(path)} from "
+                f"{data.get('worker')} ({age:.0f}s without heartbeat) to {state}"
+            )
+            released += 1
+        return released
+
+    def counts(self) -> dict[str, int]:
+        return {state: len(self.jobs(state)) for state in SPOOL_STATES}
+
+
+class Heartbeat:
+    def __init__(self, spool: Spool, job: SpoolJob) -> None:
+        self.spool = spool
+        self.job = job
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="ghettoblaster-heartbeat", daemon=True
+        )
+
+    def __enter__(self) -> Heartbeat:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.spool.HEARTBEAT):
+            if not self.spool.heartbeat(self.job):
+                return
+
+
+def run_spool_worker(
+    spool: Spool,
+    name: str,
+    handler: Callable[[SpoolJob], int],
+    poll: float = 5.0,
+    exit_when_idle: bool = False,
+) -> int:
+    # handler renders a job and returns the frame count
+    processed = 0
+    while True:
+        spool.release_stale()
+        job = spool.claim(name)
+        if job is None:
+            if exit_when_idle:
+                return processed
+            time.sleep(poll)
+            continue
+
+        scene = job.data.get("scene")
+        Logger.info(f"Spool job {job.name}: {scene} on {name}")
+        start = time.perf_counter()
+        try:
+            with Heartbeat(spool, job):
+                frames = handler(job)
+        except Exception as e:
+            Logger.exception(f"Spool job {job.name} failed: {e}")
+            state = spool.fail(job, f"{type(e).__name__}: {e}")
+            Logger.info(f"Spool job {job.name}: {state}")
+        else:
+            duration = time.perf_counter() - start
+            spool.finish(job, "done", frames=frames, duration=duration)
+            Logger.info(f"Spool job {job.name}: {frames} frames in {duration:.1f}s")
+        processed += 1
+
+
+def render_job(job: SpoolJob) -> int:
+    from ghettoblaster.controller.history import HistoryStore
+    from ghettoblaster.controller.playblast import Playblast
+    from ghettoblaster.controller.queue_worker import render_scene
+
+    playblasts = [Playblast.deserialize(p) for p in job.data["config"]["playblasts"]]
+    return render_scene(job.data["scene"], playblasts, HistoryStore())
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="ghettoblaster.controller.spool")
+    parser.add_argument("--root", type=Path, required=True)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit = commands.add_parser("submit", help="spool a saved config for scenes")
+    submit.add_argument("--config", type=Path, required=True)
+    submit.add_argument("--priority", type=int, default=0)
+    submit.add_argument("--max-attempts", type=int, default=3)
+    submit.add_argument("scenes", nargs="+")
+
+    work = commands.add_parser("work", help="claim and render jobs (mayapy)")
+    work.add_argument("--name", default=f"{socket.gethostname()}-{os.getpid()}")
+    work.add_argument("--poll", type=float, default=5.0)
+    work.add_argument("--exit-when-idle", action="store_true")
+
+    commands.add_parser("status")
+    commands.add_parser("reap", help="release stale claims")
+    parser.add_argument("--stale-after", type=float, default=Spool.STALE_AFTER)
+    args = parser.parse_args()
+
+    spool = Spool(args.root)
+    spool.STALE_AFTER = args.stale_after
+    if args.command == "submit":
+        with open(args.config, "r") as f:
+            config = json.load(f)
+        for scene in args.scenes:
+            name = spool.submit(scene, config, args.priority, args.max_attempts)
+            Logger.info(f"Spooled {scene} as {name}")
+
+    elif args.command == "work":
+        import maya.standalone
+
+        maya.standalone.initialize(name="python")
+        try:
+            processed = run_spool_worker(
+                spool, args.name, render_job, args.poll, args.exit_when_idle
+            )
+            Logger.info(f"Worker {args.name} processed {processed} job(s)")
+        finally:
+            maya.standalone.uninitialize()
+        return 0
+
+    elif args.command == "reap":
+        Logger.info(f"Released {spool.release_stale()} stale job(s)")
+
+    for state in SPOOL_STATES:
+        for path in spool.jobs(state):
+            data = read_job(path) or {}
+            print(
+                f"{state:<9} {job_name(path)}  {data.get('attempts', 0)}/"
+                f"{data.get('max_attempts', 3)}  {data.get('worker') or '-'}  "
+                f"{data.get('scene')}  {data.get('error') or ''}"
+            )
+    print(", ".join(f"{k}: {v}" for k, v in spool.counts().items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from queue import Empty, Queue
+from typing import Callable, NamedTuple, Optional
+
+from ghettoblaster.controller.logger import Logger
+from ghettoblaster.controller.pipeline import Cancelled
+
+
+class InsufficientSpaceError(Exception):
+    pass
+
+
+class TransferJob(NamedTuple):
+    src: Path
+    dst: Path
+    cleanup: Optional[Path]
+    on_done: Optional[Callable[[], None]] = None
+
+
+def default_scratch_dir() -> Path:
+    env = os.environ.get("GHETTOBLASTER_SCRATCH")
+    if env:
+        return Path(env)
+
+    shm = Path("/dev/shm")
+    if sys.platform.startswith("linux") and shm.is_dir():
+        return shm / "ghettoblaster"
+
+    return Path(tempfile.gettempdir()) / "ghettoblaster"
+
+
+def check_space(folder: Path, required: int, reserve: float = 0.05) -> None:
+    folder = Path(folder)
+    while not folder.exists() and folder != folder.parent:
+        folder = folder.parent
+
+    usage = shutil.disk_usage(folder)
+    # keep a small part of the volume free for everything else
+    available = usage.free - usage.total * reserve
+    if required > available:
+        raise InsufficientSpaceError(
+            f"{folder} needs {required / 1024**3:.2f} GB but only "
+            f"{max(available, 0) / 1024**3:.2f} GB are available"
+        )
+
+
+def copy_with_checksum(
+    src: Path,
+    dst: Path,
+    chunk_size: int = 4 * 1024 * 1024,
+    cancelled: Optional[threading.Event] = None,
+) -> str:
+    # hashes the source while copying, the temp file is renamed into place
+    digest = hashlib.sha256()
+    part = dst.with_name(f"{dst.name}.part")
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    with open(src, "rb") as fsrc, open(part, "wb") as fdst:
+        while chunk := fsrc.read(chunk_size):
+            if cancelled and cancelled.is_set():
+                break
+            digest.update(chunk)
+            fdst.write(chunk)
+    if cancelled and cancelled.is_set():
+        part.unlink()
+        raise Cancelled(f"Transfer of {src} cancelled")
+
+    checksum = digest.hexdigest()
+    digest = hashlib.sha256()
+    with open(part, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    if digest.hexdigest() != checksum:
+        part.unlink()
+        raise OSError(f"Checksum mismatch copying {src} to {dst}")
+
+    shutil.copystat(src, part)
+    os.replace(part, dst)
+    return checksum
+
+
+class TransferWorker:
+    RETRIES = 3
+    RETRY_DELAY = 2.0
+
+    def __init__(self) -> None:
+        self.queue: Queue[Optional[TransferJob]] = Queue()
+        self.failed: list[TransferJob] = []
+        self.transferred = 0
+        self.cancelled = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="ghettoblaster-transfer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(
+        self,
+        src: Path,
+        dst: Path,
+        cleanup: Optional[Path] = None,
+        on_done: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.queue.put(TransferJob(Path(src), Path(dst), cleanup, on_done))
+
+    def submit_outputs(
+        self,
+        folder: Path,
+        stem: str,
+        dst_folder: Path,
+        on_done: Optional[Callable[[], None]] = None,
+    ) -> int:
+        # everything the layer left in its scratch folder, files and sink folders
+        files = [
+            f
+            for entry in sorted(Path(folder).glob(f"{stem}*"))
+            for f in ([entry] if entry.is_file() else sorted(entry.rglob("*")))
+            if f.is_file()
+        ]
+        for i, file in enumerate(files):
+            last = i == len(files) - 1
+            self.submit(
+                file,
+                dst_folder / file.relative_to(folder),
+                folder if last else None,
+                on_done if last else None,
+            )
+        return len(files)
+
+    def pending(self) -> int:
+        return self.queue.unfinished_tasks
+
+    def wait(self) -> list[TransferJob]:
+        self.queue.join()
+        return self.failed
+
+    def stop(self) -> None:
+        self.queue.put(None)
+        self._thread.join()
+
+    def cancel(self) -> int:
+        # never waits for the network, the running copy stops at its next chunk
+        # and whatever was queued stays in the scratch folder
+        self.cancelled.set()
+        dropped = 0
+        while True:
+            try:
+                job = self.queue.get_nowait()
+            except Empty:
+                break
+            dropped += job is not None
+            self.queue.task_done()
+        self.queue.put(None)
+        return dropped
+
+    def _run(self) -> None:
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None:
+                    return
+                self._transfer(job)
+            finally:
+                self.queue.task_done()
+
+    def _transfer(self, job: TransferJob) -> None:
+        start = time.perf_counter()
+        for attempt in range(1, self.RETRIES + 1):
+            try:
+                copy_with_checksum(job.src, job.dst, cancelled=self.cancelled)
+                job.src.unlink()
+                break
+            except Cancelled:
+                return
+            except OSError as e:
+                Logger.warning(
+                    f"Transfer of {job.src.name} failed ({attempt}/{self.RETRIES}): {e}"
+                )
+                if attempt == self.RETRIES:
+                    self.failed.append(job)
+                    Logger.error(f"Giving up on transfer of {job.src} to {job.dst}")
+                    return
+                if self.cancelled.wait(self.RETRY_DELAY * attempt):
+                    return
+
+        self.transferred += 1
+        Logger.record_span(
+            "transfer",
+            time.perf_counter() - start,
+            file=job.dst.name,
+            bytes=job.dst.stat().st_size,
+        )
+        if self.cancelled.is_set():
+            return
+        if job.cleanup:
+            # a file of the folder that failed to transfer only exists there,
+            # the outputs also didn't all arrive for the post actions
+            if any(f.src.is_relative_to(job.cleanup) for f in self.failed):
+                Logger.warning(f"Kept {job.cleanup}, not every file was transferred")
+                return
+            shutil.rmtree(job.cleanup, ignore_errors=True)
+        if job.on_done:
+            job.on_done()
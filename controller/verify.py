@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from ghettoblaster.controller.lazy import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+SIZE_MISMATCH_POLICIES = ("resize", "fail")
+
+
+class VerificationError(Exception):
+    pass
+
+
+class FrameSizeError(VerificationError):
+    pass
+
+
+class VideoInfo(NamedTuple):
+    frames: int
+    width: int
+    height: int
+    fps: float
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.fps if self.fps else 0.0
+
+
+def conform_frame(
+    frame: np.ndarray, size: tuple[int, int], frame_number: int, policy: str
+) -> np.ndarray:
+    # cv2.VideoWriter silently drops frames that don't match its size
+    height, width = frame.shape[:2]
+    if (width, height) == size:
+        return frame
+
+    if policy == "fail":
+        raise FrameSizeError(
+            f"Frame {frame_number} is {width}x{height}, expected {size[0]}x{size[1]}"
+        )
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+
+def probe_video(path: Path) -> Optional[VideoInfo]:
+    # container metadata only, no frames are decoded
+    capture = cv2.VideoCapture(str(path))
+    try:
+        if not capture.isOpened():
+            return None
+        return VideoInfo(
+            int(capture.get(cv2.CAP_PROP_FRAME_COUNT)),
+            int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            float(capture.get(cv2.CAP_PROP_FPS)),
+        )
+    finally:
+        capture.release()
+
+
+def verify_video(
+    path: Path, frames: int, size: tuple[int, int], fps: float
+) -> tuple[Optional[VideoInfo], list[str]]:
+    info = probe_video(path)
+    if info is None:
+        return None, [f"{path} could not be opened"]
+
+    problems = []
+    if info.frames != frames:
+        problems.append(f"{info.frames} frames, expected {frames}")
+    if (info.width, info.height) != size:
+        problems.append(f"{info.width}x{info.height}, expected {size[0]}x{size[1]}")
+    if abs(info.fps - fps) > 0.01:
+        problems.append(f"{info.fps:g} fps, expected {fps:g}")
+    expected_duration = frames / fps if fps else 0.0
+    if abs(info.duration - expected_duration) > 1 / max(fps, 1):
+        problems.append(f"{info.duration:.3f}s long, expected {expected_duration:.3f}s")
+
+    return info, problems
+
+
+def sha256(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_manifest(manifest: Path, files: dict[Path, dict]) -> dict:
+    entries = []
+    for path, extra in files.items():
+        path = Path(path)
+        if not path.exists():
+            continue
+        entry = {
+            "file": path.name,
+            "bytes": path.stat().st_size,
+            "sha256": sha256(path),
+        }
+        entry.update(extra)
+        entries.append(entry)
+
+    data = {"created": datetime.now().isoformat(timespec="seconds"), "files": entries}
+    with open(manifest, "w") as f:
+        json.dump(data, f, indent=2)
+
+    return data
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterator, NamedTuple, Optional
+
+from ghettoblaster.controller import maya_cmds
+from ghettoblaster.controller.logger import Logger
+
+# time based curves, driven keys (animCurveU*) count as scene changes
+ANIM_CURVE = re.compile(r'createNode animCurveT[ALTU] .*?-n "([^"]+)"')
+REFERENCE = re.compile(r'"([^"]+\.m[ab])"')
+# statements maya rewrites on every save without changing what a playblast shows
+VOLATILE = ("//", "fileInfo", "select -ne :time1;")
+
+
+class AnimCurve(NamedTuple):
+    keys: tuple[tuple[float, float], ...]
+    # cycling curves repeat every key over the whole timeline
+    cyclic: bool
+
+
+class ScenePrint(NamedTuple):
+    # digest of everything but the keys of time based anim curves
+    static: str
+    curves: dict[str, AnimCurve]
+
+
+def iter_blocks(path: str) -> Iterator[str]:
+    # top level statements with their indented lines, a node and its setAttrs
+    block: list[str] = []
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if block and line[:1] in ("\t", " "):
+                block.append(line)
+                continue
+            if block:
+                yield "".join(block)
+            block = [line]
+    if block:
+        yield "".join(block)
+
+
+def split_keys(block: str) -> tuple[AnimCurve, str]:
+    keys: list[tuple[float, float]] = []
+    statements = []
+    for statement in block.split(";"):
+        if '".ktv[' not in statement:
+            statements.append(statement)
+            continue
+        values = statement.split('"', 2)[2].split()
+        keys.extend(zip(map(float, values[0::2]), map(float, values[1::2])))
+
+    rest = ";".join(statements)
+    cyclic = '".pre"' in rest or '".pst"' in rest
+    return AnimCurve(tuple(keys), cyclic), rest
+
+
+def read_scene_print(path: str) -> Optional[ScenePrint]:
+    # maya binary scenes can't be compared, None means everything changed
+    if Path(path).suffix.lower() != ".ma" or not os.path.isfile(path):
+        return None
+
+    digest = hashlib.sha1()
+    curves: dict[str, AnimCurve] = {}
+    for block in iter_blocks(path):
+        if block.startswith(VOLATILE):
+            continue
+        if block.startswith("file "):
+            # referenced scenes change without touching this one
+            for reference in REFERENCE.findall(block):
+                if os.path.isfile(reference):
+                    digest.update(str(os.path.getmtime(reference)).encode())
+
+        match = ANIM_CURVE.match(block)
+        if match:
+            curves[match.group(1)], block = split_keys(block)
+        digest.update(block.encode())
+
+    return ScenePrint(digest.hexdigest(), curves)
+
+
+def changed_range(before: AnimCurve, after: AnimCurve) -> tuple[float, float]:
+    changed = set(before.keys) ^ set(after.keys)
+    if not changed or after.cyclic:
+        return -math.inf, math.inf
+
+    # a key bends the curve up to two keys either side of it through the
+    # auto tangents, the first and last keys also hold the curve beyond them
+    times = sorted({t for t, _ in before.keys} | {t for t, _ in after.keys})
+    first = times.index(min(t for t, _ in changed))
+    last = times.index(max(t for t, _ in changed))
+    start = times[first - 2] if first >= 2 else -math.inf
+    end = times[last + 2] if last + 2 < len(times) else math.inf
+    return start, end
+
+
+def changed_ranges(
+    before: ScenePrint, after: ScenePrint
+) -> Optional[list[tuple[float, float]]]:
+    # frame ranges that look different in after, None when every frame does
+    if before.static != after.static:
+        return None
+    return [
+        changed_range(before.curves[name], curve)
+        for name, curve in after.curves.items()
+        if curve != before.curves.get(name)
+    ]
+
+
+def unchanged_frames(
+    start: int, end: int, changed: list[tuple[float, float]]
+) -> list[int]:
+    return [
+        frame
+        for frame in range(start, end + 1)
+        if not any(lo <= frame <= hi for lo, hi in changed)
+    ]
+
+
+class SceneWatcher:
+    # saves within DEBOUNCE seconds of each other trigger a single playblast
+    DEBOUNCE = 2.0
+
+    def __init__(self, on_save: Callable[[], None]) -> None:
+        self.on_save = on_save
+        self.callback: Optional[int] = None
+        # the scene as of the last watch playblast and the layers it rendered,
+        # by layer key with their frame ranges
+        self.scene = ""
+        self.last: Optional[ScenePrint] = None
+        self.layers: dict[str, tuple[int, int]] = {}
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="ghettoblaster-watch")
+
+    @property
+    def watching(self) -> bool:
+        return self.callback is not None
+
+    def start(self) -> None:
+        if not self.watching:
+            self.callback = maya_cmds.add_after_save_callback(self.on_save)
+            Logger.info("Watching for scene saves")
+
+    def stop(self) -> None:
+        if self.watching:
+            maya_cmds.remove_callback(self.callback)
+            self.callback = None
+            Logger.info("Stopped watching for scene saves")
+
+    def fingerprint(self, scene: str) -> Future:
+        # large ascii scenes take a while to read, keep maya responsive
+        return self._executor.submit(read_scene_print, scene)
+
+    def reuse(
+        self, scene: str, scene_print: Optional[ScenePrint]
+    ) -> dict[str, list[int]]:
+        # frames of the last playblast that still look the same, by layer key
+        if scene != self.scene or self.last is None or scene_print is None:
+            return {}
+
+        changed = changed_ranges(self.last, scene_print)
+        if changed is None:
+            Logger.info("Scene changed beyond animation keys, playblasting all frames")
+            return {}
+        return {
+            key: unchanged_frames(start, end, changed)
+            for key, (start, end) in self.layers.items()
+        }
+
+    def rendered(
+        self,
+        scene: str,
+        scene_print: Optional[ScenePrint],
+        layers: dict[str, tuple[int, int]],
+    ) -> None:
+        self.scene = scene
+        self.last = scene_print
+        self.layers = layers
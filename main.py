@@ -1,5 +1,5 @@
 from ghettoblaster.ui.main_window import MainWindow
-import ghettoblaster.resources.resources
+
 
 def main():
     global view
@@ -1,6 +1,7 @@
 from Qt.QtWidgets import QPushButton, QApplication
 from Qt.QtCore import Signal, Qt, QSize
 from Qt.QtGui import QIcon
+from ghettoblaster.ui.icons import get_icon
 
 
 class IconButton(QPushButton):
@@ -15,7 +16,7 @@ class IconButton(QPushButton):
     def set_icon(self, icon_path: str, icon_size: tuple[int, int]) -> None:
         width, height = icon_size
         self.icon_path = icon_path
-        icon = QIcon(icon_path)
+        icon = get_icon(icon_path)
         available_sizes = icon.availableSizes()
         if available_sizes and available_sizes[0].width() < width:
             pixmap = icon.pixmap(available_sizes[0])
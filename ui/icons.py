@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from pathlib import Path
+
+from Qt.QtCore import QResource
+from Qt.QtGui import QIcon
+
+RESOURCES = Path(__file__).parent.parent / "resources"
+# build with: rcc --binary resources/resources.qrc -o resources/resources.rcc
+RCC = RESOURCES / "resources.rcc"
+
+
+@lru_cache(maxsize=None)
+def load_resources() -> bool:
+    # registered on first icon lookup instead of at import time
+    return RCC.exists() and QResource.registerResource(str(RCC))
+
+
+@lru_cache(maxsize=None)
+def get_icon(path: str) -> QIcon:
+    # ":icons/<name>" paths fall back to the png files next to the qrc
+    if path.startswith(":") and not load_resources():
+        path = str(RESOURCES / path.lstrip(":/"))
+    return QIcon(path)
@@ -1,33 +1,48 @@
 from __future__ import annotations
 
 import json
+import os
+from concurrent.futures import Future
 from datetime import datetime
 from pathlib import Path
-from typing import NamedTuple
+from typing import TYPE_CHECKING, NamedTuple, Optional
 
 from ghettoblaster.controller.logger import Logger
-from ghettoblaster.controller.maya_cmds import get_project_dir
+from ghettoblaster.controller.maya_cmds import get_project_dir, get_scene_path
 from ghettoblaster.controller.playblast import Playblast, PlayblastRenderer
 from ghettoblaster.ui.playblast_widget import PlayblastWidget
+from ghettoblaster.ui.render_worker import BatchRunner, preview_image
 from ghettoblaster.ui.settings_widget import SettingsWidget
 from ghettoblaster.ui.toolbar import Toolbar
 from ghettoblaster.ui.version import get_version
 from maya import OpenMayaUI
 from maya.app.general.mayaMixin import MayaQWidgetDockableMixin
 from Qt.QtCompat import wrapInstance
-from Qt.QtCore import Qt
+from Qt.QtCore import Qt, QTimer, Signal
+from Qt.QtGui import QPixmap
 from Qt.QtWidgets import (
+    QCheckBox,
     QFileDialog,
+    QHBoxLayout,
+    QLabel,
     QMainWindow,
+    QMessageBox,
     QProgressBar,
     QPushButton,
     QScrollArea,
+    QSpinBox,
     QSplitter,
     QStackedWidget,
     QVBoxLayout,
     QWidget,
 )
 
+# the batch and watch modules are imported on first use, the window opens
+# before any of them is needed
+if TYPE_CHECKING:
+    from ghettoblaster.controller.history import HistoryStore
+    from ghettoblaster.controller.watch import ScenePrint, SceneWatcher
+
 
 def get_maya_main_window():
     main_window_ptr = OpenMayaUI.MQtUtil.mainWindow()
@@ -41,20 +56,32 @@ class PlayblastWidgets(NamedTuple):
 
 class MainWindow(MayaQWidgetDockableMixin, QWidget):
     win_instance = None
+    # emitted from the watcher thread once a saved scene was read
+    scene_read = Signal(object)
 
     ROOT_PATH = Path(__file__).parent.parent
     LOGS = ROOT_PATH / "logs"
     LOGGING_PATH = LOGS / f"{datetime.now().date()}.log"
 
+    # set GHETTOBLASTER_PROFILE=1 to profile batches into LOGS
+    PROFILE = bool(os.environ.get("GHETTOBLASTER_PROFILE"))
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self._widgets: list[PlayblastWidgets] = []
+        self.runner: Optional[BatchRunner] = None
+        # the scene a watch batch renders, set while one runs
+        self.watch_run: Optional[tuple[str, Optional[ScenePrint]]] = None
+        self.watch_pending = False
+        self.watcher: Optional[SceneWatcher] = None
+        # opened by the first batch and kept, the cost model is fitted once
+        self.history: Optional[HistoryStore] = None
 
         self.setWindowTitle(f"Ghettoblaster - {get_version()}")
         self.setWindowFlag(Qt.WindowType.Window)
 
         MainWindow.LOGS.mkdir(exist_ok=True)
-        Logger.write_to_file(MainWindow.LOGGING_PATH)
+        Logger.write_to_folder(MainWindow.LOGS)
         Logger.set_propagate(False)
         Logger.info("starting Ghettoblaster...")
 
@@ -80,6 +107,19 @@ class MainWindow(MayaQWidgetDockableMixin, QWidget):
 
     def init_widgets(self):
         self.playblast_btn = QPushButton("Playblast")
+        self.mosaic_box = QCheckBox("Combine checked layers into a mosaic video")
+        self.budget = QSpinBox()
+        self.budget.setRange(0, 24 * 60)
+        self.budget.setSuffix(" min")
+        self.budget.setSpecialValueText("No time budget")
+        self.budget.setToolTip("Warn before a batch that is predicted to take longer")
+        self.watch_box = QCheckBox("Playblast after every save")
+        self.watch_box.setToolTip(
+            "Playblast the checked layers in the background whenever the scene is "
+            "saved, reusing layers and frames that did not change"
+        )
+        self.watch_timer = QTimer(self)
+        self.watch_timer.setSingleShot(True)
         self.toolbar = Toolbar(40)
 
         self.pb_scroll_widget = QWidget()
@@ -104,6 +144,13 @@ class MainWindow(MayaQWidgetDockableMixin, QWidget):
         self.progress.setRange(0, 100)
         self.progress.setValue(0)
 
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setEnabled(False)
+        self.status = QLabel()
+        self.preview = QLabel()
+        self.preview.setAlignment(Qt.AlignCenter)
+        self.preview.hide()
+
     def init_layouts(self):
         self.playblast_layout = QVBoxLayout(self.pb_scroll_widget)
         self.playblast_layout.setAlignment(Qt.AlignTop)
@@ -116,8 +163,20 @@ class MainWindow(MayaQWidgetDockableMixin, QWidget):
 
         self.main_layout = QVBoxLayout(self)
         self.main_layout.addWidget(self.splitter)
+        self.options_layout = QHBoxLayout()
+        self.options_layout.addWidget(self.mosaic_box)
+        self.options_layout.addWidget(self.watch_box)
+        self.options_layout.addStretch()
+        self.options_layout.addWidget(self.budget)
+        self.main_layout.addLayout(self.options_layout)
         self.main_layout.addWidget(self.playblast_btn)
-        self.main_layout.addWidget(self.progress)
+        self.main_layout.addWidget(self.preview)
+
+        self.progress_layout = QHBoxLayout()
+        self.progress_layout.addWidget(self.progress)
+        self.progress_layout.addWidget(self.cancel_btn)
+        self.main_layout.addLayout(self.progress_layout)
+        self.main_layout.addWidget(self.status)
 
     def init_signals(self):
         self.toolbar.add_btn.clicked.connect(self.add_playblast)
@@ -128,10 +187,17 @@ class MainWindow(MayaQWidgetDockableMixin, QWidget):
         self.toolbar.save_btn.clicked.connect(self.save)
         self.toolbar.load_btn.clicked.connect(self.load)
         self.playblast_btn.clicked.connect(self.render_playblast)
+        self.cancel_btn.clicked.connect(self.cancel_playblast)
+        self.watch_box.toggled.connect(self.toggle_watch)
+        self.watch_timer.timeout.connect(self.watch_saved)
+        self.scene_read.connect(self.watch_playblast)
 
     def add_playblast(self, playblast=None) -> PlayblastWidgets:
         if not playblast:
-            playblast = Playblast(id=len(self._widgets))
+            playblast = Playblast(id=self.next_id())
+        elif any(w.settings.playblast.id == playblast.id for w in self._widgets):
+            # duplicated and loaded layers keep the id they were saved with
+            playblast.id = self.next_id()
 
         pw = PlayblastWidget(playblast)
         sw = SettingsWidget(playblast)
@@ -158,15 +224,155 @@ class MainWindow(MayaQWidgetDockableMixin, QWidget):
 
         pw.toggle_checked(toggle=True)
 
-    def render_playblast(self):
-        pb: list[Playblast] = [
+    def checked_playblasts(self) -> list[Playblast]:
+        return [
             i.playblast.playblast
             for i in self._widgets
             if i.playblast.checkbox.isChecked()
         ]
 
-        renderer = PlayblastRenderer(pb, lambda u: self.progress.setValue(u))
-        renderer.batch_maya_render()
+    def render_playblast(self):
+        if self.runner and self.runner.running:
+            return
+
+        renderer = self.create_renderer(self.checked_playblasts())
+        if renderer.over_budget() and not self.confirm_over_budget(renderer):
+            return
+        self.start_batch(renderer)
+
+    def create_renderer(
+        self,
+        pb: list[Playblast],
+        reuse: Optional[dict[str, list[int]]] = None,
+        keep_view: bool = False,
+    ) -> PlayblastRenderer:
+        from ghettoblaster.controller.encoder import EncoderClient
+        from ghettoblaster.controller.history import HistoryStore
+        from ghettoblaster.controller.journal import default_journal_dir
+
+        if self.history is None:
+            self.history = HistoryStore()
+        return PlayblastRenderer(
+            pb,
+            lambda u: self.progress.setValue(u),
+            profile=MainWindow.PROFILE,
+            profile_dir=MainWindow.LOGS,
+            mosaic=self.mosaic_box.isChecked(),
+            history=self.history,
+            budget=self.budget.value() * 60 or None,
+            find_daemon=True,
+            encoder=EncoderClient.shared(),
+            journal_dir=default_journal_dir(),
+            reuse=reuse,
+            keep_view=keep_view,
+        )
+
+    def start_batch(self, renderer: PlayblastRenderer) -> None:
+        self.runner = BatchRunner(renderer, self)
+        self.runner.progress.connect(self.progress.setValue)
+        self.runner.preview.connect(self.show_preview)
+        self.runner.status.connect(self.status.setText)
+        self.runner.finished.connect(self.playblast_finished)
+
+        self.progress.setValue(0)
+        self.playblast_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.runner.start()
+
+    def confirm_over_budget(self, renderer: PlayblastRenderer) -> bool:
+        answer = QMessageBox.question(
+            self,
+            "Over Time Budget",
+            f"This batch is predicted to take {renderer.predicted / 60:.1f} min, "
+            f"the budget is {self.budget.value()} min. Playblast anyway?",
+        )
+        return answer == QMessageBox.Yes
+
+    def cancel_playblast(self):
+        if self.runner:
+            self.runner.cancel()
+
+    def playblast_finished(self, success: bool):
+        self.playblast_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        self.preview.hide()
+
+        if self.watch_run and success:
+            # the next save only captures what changed since this batch
+            renderer = self.runner.renderer
+            self.watcher.rendered(
+                *self.watch_run,
+                {
+                    renderer.keys[p.id]: (p.start_frame, p.end_frame)
+                    for p in renderer.order
+                    if p.id in renderer.keys
+                },
+            )
+        self.watch_run = None
+        if self.watch_pending and self.watcher and self.watcher.watching:
+            self.watch_pending = False
+            self.watch_timer.start()
+
+    def toggle_watch(self, enabled: bool):
+        if enabled:
+            if self.watcher is None:
+                from ghettoblaster.controller.watch import SceneWatcher
+
+                self.watch_timer.setInterval(int(SceneWatcher.DEBOUNCE * 1000))
+                self.watcher = SceneWatcher(self.watch_timer.start)
+            self.watcher.start()
+        elif self.watcher:
+            self.watcher.stop()
+            self.watch_timer.stop()
+            self.watch_pending = False
+
+    def closeEvent(self, event):
+        # the after save callback outlives the window otherwise, unchecking
+        # the box stops the watcher and removes it
+        self.watch_box.setChecked(False)
+        super().closeEvent(event)
+
+    def dockCloseEventTriggered(self):
+        # docked windows close through their workspace control instead
+        self.watch_box.setChecked(False)
+
+    def watch_saved(self):
+        # saves during a batch are picked up once it finished
+        if self.runner and self.runner.running:
+            self.watch_pending = True
+            return
+
+        scene = get_scene_path()
+        if not scene or not self.checked_playblasts():
+            return
+        self.watcher.fingerprint(scene).add_done_callback(
+            lambda future: self.scene_read.emit((scene, future))
+        )
+
+    def watch_playblast(self, read: tuple[str, Future]):
+        scene, future = read
+        if self.runner and self.runner.running:
+            self.watch_pending = True
+            return
+
+        try:
+            scene_print = future.result()
+        except OSError as e:
+            Logger.warning(f"Could not read {scene}, playblasting all frames: {e}")
+            scene_print = None
+
+        # background batches don't pop up explorer windows on every save
+        pb = [p.replace(open_explorer=False) for p in self.checked_playblasts()]
+        renderer = self.create_renderer(
+            pb, self.watcher.reuse(scene, scene_print), keep_view=True
+        )
+        Logger.info(f"{Path(scene).name} saved, playblasting {len(pb)} layers")
+        self.watch_run = (scene, scene_print)
+        self.start_batch(renderer)
+
+    def show_preview(self, frame):
+        self.preview.setPixmap(QPixmap.fromImage(preview_image(frame)))
+        self.preview.show()
 
     def remove_playblast(self, pbw: PlayblastWidget):
         for i in self._widgets:
@@ -193,6 +399,9 @@ class MainWindow(MayaQWidgetDockableMixin, QWidget):
         for i in self._widgets:
             i.playblast.checkbox.setChecked(False)
 
+    def next_id(self) -> int:
+        return max((w.settings.playblast.id for w in self._widgets), default=-1) + 1
+
     def duplicate_playblast(self):
         playblast = [
             p.settings.playblast for p in self._widgets if p.playblast.is_clicked
@@ -232,6 +441,11 @@ class MainWindow(MayaQWidgetDockableMixin, QWidget):
         with open(file, "r") as f:
             data = json.load(f)
 
-        playblasts = [Playblast.deserialize(p) for _, v in data.items() for p in v]
+        try:
+            playblasts = [Playblast.deserialize(p) for _, v in data.items() for p in v]
+        except ValueError as e:
+            Logger.error(f"Failed to load Ghettoblaster config {file}: {e}")
+            return
+
         for p in playblasts:
             self.add_playblast(p)
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import time
+from typing import Iterator, Optional
+
+from ghettoblaster.controller.lazy import lazy_import
+from ghettoblaster.controller.logger import Logger
+from ghettoblaster.controller.playblast import PlayblastRenderer
+from Qt.QtCore import QObject, QTimer, Signal
+from Qt.QtGui import QImage
+
+np = lazy_import("numpy")
+
+
+def preview_image(frame: np.ndarray) -> QImage:
+    frame = np.ascontiguousarray(frame[..., ::-1])
+    height, width = frame.shape[:2]
+    # copy so the image does not reference the numpy buffer
+    return QImage(
+        frame.data, width, height, frame.strides[0], QImage.Format_RGB888
+    ).copy()
+
+
+# steps a batch from the qt event loop so the window stays responsive
+class BatchRunner(QObject):
+    # progress and preview are emitted from the encode thread as well,
+    # qt queues them onto the ui thread
+    progress = Signal(int)
+    preview = Signal(object)
+    status = Signal(str)
+    finished = Signal(bool)
+
+    def __init__(self, renderer: PlayblastRenderer, parent=None) -> None:
+        super().__init__(parent)
+        self.renderer = renderer
+        self.renderer.update_progress = self.progress.emit
+        self.renderer.on_preview = self.preview.emit
+        self.progress.connect(self.update_status)
+
+        self._batch: Optional[Iterator[None]] = None
+        self._start = 0.0
+        self._timer = QTimer(self)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self.step)
+
+    @property
+    def running(self) -> bool:
+        return self._batch is not None
+
+    def start(self) -> None:
+        self._start = time.perf_counter()
+        self._batch = self.renderer.iter_batch()
+        self.status.emit("Starting...")
+        self._timer.start()
+
+    def cancel(self) -> None:
+        if not self.running:
+            return
+        self.status.emit("Cancelling...")
+        self.renderer.cancel()
+
+    def step(self) -> None:
+        try:
+            next(self._batch)
+        except StopIteration:
+            self.stop(not self.renderer.cancelled.is_set())
+        except Exception as e:
+            Logger.exception(f"Playblast batch failed: {e}")
+            self.stop(False)
+
+    def stop(self, success: bool) -> None:
+        self._timer.stop()
+        self._batch = None
+
+        elapsed = time.perf_counter() - self._start
+        if success:
+            self.status.emit(f"Finished in {elapsed:.0f}s")
+        elif self.renderer.cancelled.is_set():
+            self.status.emit("Cancelled")
+        else:
+            self.status.emit("Failed, see log for details")
+        self.finished.emit(success)
+
+    def update_status(self, percent: int) -> None:
+        if not self.running:
+            return
+
+        # starts from the cost model prediction and shifts towards the measured
+        # rate as the batch progresses
+        predicted = self.renderer.predicted * (100 - percent) / 100
+        remaining = predicted
+        if percent > 0:
+            elapsed = time.perf_counter() - self._start
+            measured = elapsed * (100 - percent) / percent
+            weight = percent / 100
+            remaining = (1 - weight) * predicted + weight * measured
+        self.status.emit(f"{percent}% - {remaining:.0f}s remaining")
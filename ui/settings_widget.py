@@ -1,4 +1,7 @@
 from ghettoblaster.controller import maya_cmds
+from ghettoblaster.controller.burnin import BURN_INS
+from ghettoblaster.controller.frame_io import FRAME_FORMATS
+from ghettoblaster.controller.pipeline import SINKS
 from ghettoblaster.controller.playblast import Playblast
 from ghettoblaster.ui.buttons import IconButton
 from ghettoblaster.ui.keyword_linedit import KeywordLineedit
@@ -36,6 +39,11 @@ class SettingsWidget(QWidget):
     def init_widgets(self):
         # Widget Settings
         self.playblast_name = QLineEdit()
+        self.priority = QSpinBox()
+        self.priority.setRange(-10, 10)
+        self.priority.setToolTip(
+            "Higher priority layers render first, equal priorities by predicted time"
+        )
 
         # Output Settings
         self.file_preview = QLineEdit()
@@ -52,9 +60,25 @@ class SettingsWidget(QWidget):
         self.quality = QComboBox()
         self.quality.addItems(self.playblast.qualities)
 
+        self.image_format = QComboBox()
+        for key, fmt in FRAME_FORMATS.items():
+            self.image_format.addItem(fmt.name, key)
+        self.image_quality = QSpinBox()
+        self.image_quality.setRange(1, 100)
+
         self.delete_images = QCheckBox()
         self.create_video = QCheckBox()
         self.open_explorer = QCheckBox()
+        self.scratch = QCheckBox()
+        self.scratch.setToolTip(
+            "Capture and encode on local disk, then copy the results to the output path"
+        )
+        self.frame_store = QCheckBox()
+        self.frame_store.setToolTip(
+            "Pack captured frames into one memory-mapped file instead of an image sequence"
+        )
+        self.outputs = {name: QCheckBox(name.capitalize()) for name in SINKS}
+        self.burn_ins = {name: QCheckBox(name.capitalize()) for name in BURN_INS}
 
         # Playblast Settings
         self.camera = QComboBox()
@@ -108,6 +132,20 @@ class SettingsWidget(QWidget):
         self.res_layout.addWidget(self.res_x)
         self.res_layout.addWidget(self.res_y)
 
+        self.image_format_layout = QHBoxLayout()
+        self.image_format_layout.addWidget(self.image_format)
+        self.image_format_layout.addWidget(self.image_quality)
+
+        self.outputs_layout = QHBoxLayout()
+        for checkbox in self.outputs.values():
+            self.outputs_layout.addWidget(checkbox)
+        self.outputs_layout.addStretch()
+
+        self.burn_ins_layout = QHBoxLayout()
+        for checkbox in self.burn_ins.values():
+            self.burn_ins_layout.addWidget(checkbox)
+        self.burn_ins_layout.addStretch()
+
         self.frame_layout = QHBoxLayout()
         self.frame_layout.addWidget(self.frame_range_box)
         self.frame_layout.addWidget(self.frame_start)
@@ -117,9 +155,14 @@ class SettingsWidget(QWidget):
         self.output_form_layout.addRow("File Name", self.file_name)
         self.output_form_layout.addRow("Output Path", self.output_layout)
         self.output_form_layout.addRow("Quality", self.quality)
+        self.output_form_layout.addRow("Image Format", self.image_format_layout)
         self.output_form_layout.addRow("Create Video", self.create_video)
         self.output_form_layout.addRow("Delete Image Sequence", self.delete_images)
+        self.output_form_layout.addRow("Single File Frame Store", self.frame_store)
+        self.output_form_layout.addRow("Capture To Scratch", self.scratch)
         self.output_form_layout.addRow("Open Explorer", self.open_explorer)
+        self.output_form_layout.addRow("Extra Outputs", self.outputs_layout)
+        self.output_form_layout.addRow("Burn-ins", self.burn_ins_layout)
 
         self.settings_form_layout.addRow("Camera", self.camera)
         self.settings_form_layout.addRow("Render Layer", self.render_layer)
@@ -130,6 +173,7 @@ class SettingsWidget(QWidget):
         self.settings_form_layout.addRow("Overscan", self.overscan)
 
         self.playblast_form_layout.addRow("Name", self.playblast_name)
+        self.playblast_form_layout.addRow("Priority", self.priority)
 
         self.main_layout.addWidget(self.playblast_box)
         self.main_layout.addWidget(self.output_box)
@@ -139,6 +183,7 @@ class SettingsWidget(QWidget):
     def init_signals(self):
         self.browser.clicked.connect(self.browse_folder)
         self.playblast_name.textChanged.connect(self.set_playblast_name)
+        self.priority.valueChanged.connect(self.set_priority)
         self.resolution_box.currentTextChanged.connect(self.set_resolution_value)
         self.res_x.valueChanged.connect(self.set_resolution_name)
         self.res_y.valueChanged.connect(self.set_resolution_name)
@@ -152,14 +197,28 @@ class SettingsWidget(QWidget):
         self.camera.currentTextChanged.connect(self.set_camera)
         self.output_path.textChanged.connect(self.change_output_path)
         self.quality.currentTextChanged.connect(self.set_quality)
+        self.image_format.currentIndexChanged.connect(self.set_image_format)
+        self.image_quality.valueChanged.connect(self.set_image_quality)
         self.render_layer.currentTextChanged.connect(self.set_render_layer)
         self.delete_images.toggled.connect(self.set_delete_images)
         self.create_video.toggled.connect(self.set_create_video)
         self.open_explorer.toggled.connect(self.set_open_explorer)
+        self.frame_store.toggled.connect(self.set_frame_store)
+        self.scratch.toggled.connect(self.set_scratch)
+        for checkbox in self.outputs.values():
+            checkbox.toggled.connect(self.set_outputs)
+        for checkbox in self.burn_ins.values():
+            checkbox.toggled.connect(self.set_burn_ins)
 
     def init_state(self):
         self.playblast_name.setText(self.playblast.name)
+        self.priority.setValue(self.playblast.priority)
         self.quality.setCurrentText(self.playblast.quality)
+        self.image_format.setCurrentIndex(
+            max(0, self.image_format.findData(self.playblast.image_format))
+        )
+        self.image_quality.setValue(self.playblast.image_quality)
+        self.image_quality.setEnabled(FRAME_FORMATS[self.playblast.image_format].lossy)
         self.render_layer.setCurrentText(self.playblast.render_layer)
 
         self.output_path.setText(self.playblast.output_field)
@@ -179,6 +238,12 @@ class SettingsWidget(QWidget):
         self.overscan.setChecked(self.playblast.overscan)
         self.delete_images.setChecked(self.playblast.delete_images)
         self.create_video.setChecked(self.playblast.create_video)
+        self.frame_store.setChecked(self.playblast.frame_store)
+        self.scratch.setChecked(self.playblast.scratch)
+        for name, checkbox in self.outputs.items():
+            checkbox.setChecked(name in self.playblast.outputs)
+        for name, checkbox in self.burn_ins.items():
+            checkbox.setChecked(name in self.playblast.burn_ins)
 
     def set_create_video(self, value: bool) -> None:
         self.playblast.create_video = value
@@ -186,6 +251,25 @@ class SettingsWidget(QWidget):
     def set_open_explorer(self, value: bool) -> None:
         self.playblast.open_explorer = value
 
+    def set_outputs(self, *args) -> None:
+        self.playblast.outputs = tuple(
+            name for name, checkbox in self.outputs.items() if checkbox.isChecked()
+        )
+
+    def set_burn_ins(self, *args) -> None:
+        self.playblast.burn_ins = tuple(
+            name for name, checkbox in self.burn_ins.items() if checkbox.isChecked()
+        )
+
+    def set_priority(self, value: int) -> None:
+        self.playblast.priority = value
+
+    def set_scratch(self, value: bool) -> None:
+        self.playblast.scratch = value
+
+    def set_frame_store(self, value: bool) -> None:
+        self.playblast.frame_store = value
+
     def set_delete_images(self, value: bool) -> None:
         self.playblast.delete_images = value
 
@@ -196,6 +280,14 @@ class SettingsWidget(QWidget):
     def set_quality(self, quality: str) -> None:
         self.playblast.quality = quality
 
+    def set_image_format(self, index: int) -> None:
+        key = self.image_format.itemData(index)
+        self.playblast.image_format = key
+        self.image_quality.setEnabled(FRAME_FORMATS[key].lossy)
+
+    def set_image_quality(self, value: int) -> None:
+        self.playblast.image_quality = value
+
     def set_playblast_name(self, name: str):
         self.name_changed.emit(name)
         self.playblast.name = name